@@ -0,0 +1,162 @@
+# arena.py
+'''
+AST en forma de estructura de arreglos (arena).
+
+Cada nodo del AST ocupa una posición i de la arena:
+
+  kinds[i]  código de la clase del nodo (índice en NODE_KINDS)
+  first[i]  posición en slots del primer campo del nodo
+  spans[2i], spans[2i+1]  pos y endpos del nodo en el fuente (-1: None)
+
+Los campos del nodo ocupan slots[first[i]:first[i]+n] en el orden de
+dataclasses.fields(). Cada campo se codifica como un entero cuyos dos
+bits bajos indican qué es:
+
+  NODE   índice de otro nodo de la arena
+  LIST   posición en slots de una lista: [n, e1, ..., en]
+  CONST  índice en consts (cadenas, números y DataType internados)
+  NONE   None
+
+Los enlaces entre nodos son índices enteros, no referencias a objetos.
+node(i) reconstruye el nodo i (y su subárbol) como objetos de model_ast
+cuando hace falta usar los visitors existentes.
+'''
+from array import array
+from dataclasses import fields
+
+from model_ast import *
+
+
+NODE_KINDS = (
+  Program, Function, OneStmt, DualStmt, TripleStmt, Grouping, Single,
+  Relation, Not, Binary, Unary, TypeCast, Call, Var, VectorVar, Ident,
+  Vector, Assign, Integer, Float, DataType,
+)
+KIND_CODES  = { cls: code for code, cls in enumerate(NODE_KINDS) }
+DTYPE_CODE  = KIND_CODES[DataType]
+KIND_FIELDS = tuple(tuple(f.name for f in fields(cls) if f.name not in SPAN_FIELDS)
+                    for cls in NODE_KINDS)
+
+NODE, LIST, CONST, NONE = range(4)
+
+
+class Arena:
+
+  def __init__(self):
+    self.kinds  = array('B')
+    self.first  = array('I')
+    self.slots  = array('q')
+    self.spans  = array('q')
+    self.consts = []
+    self._const_ids = {}
+    self.root = None
+
+  def __len__(self):
+    return len(self.kinds)
+
+  def nbytes(self):
+    # Memoria de los arreglos (sin la tabla de constantes)
+    return sum(a.itemsize * len(a) for a in (self.kinds, self.first, self.slots, self.spans))
+
+  @classmethod
+  def from_ast(cls, ast):
+    arena = cls()
+    arena.root = arena.add(ast)
+    return arena
+
+  def add(self, node):
+    '''
+    Agrega node y su subárbol. Devuelve el índice del nodo.
+    '''
+    code = KIND_CODES[type(node)]
+    names = KIND_FIELDS[code]
+    index = len(self.kinds)
+    offset = len(self.slots)
+    self.kinds.append(code)
+    self.first.append(offset)
+    self.spans.append(-1 if node.pos is None else node.pos)
+    self.spans.append(-1 if node.endpos is None else node.endpos)
+    self.slots.extend(0 for _ in names)
+    for k, name in enumerate(names):
+      self.slots[offset + k] = self.encode(getattr(node, name))
+    return index
+
+  def encode(self, value):
+    if value is None:
+      return NONE
+    if isinstance(value, list):
+      offset = len(self.slots)
+      self.slots.append(len(value))
+      self.slots.extend(0 for _ in value)
+      for k, item in enumerate(value):
+        self.slots[offset + 1 + k] = self.encode(item)
+      return offset << 2 | LIST
+    if isinstance(value, Node) and not isinstance(value, DataType):
+      return self.add(value) << 2 | NODE
+    key = (type(value), value)
+    ident = self._const_ids.get(key)
+    if ident is None:
+      ident = self._const_ids[key] = len(self.consts)
+      self.consts.append(value)
+    return ident << 2 | CONST
+
+  # -------------------------------------------------------------------
+  #  Acceso sin reconstruir objetos
+  # -------------------------------------------------------------------
+
+  def kind(self, index):
+    return NODE_KINDS[self.kinds[index]]
+
+  def raw(self, index, name):
+    '''
+    Valor codificado del campo name del nodo index.
+    '''
+    code = self.kinds[index]
+    return self.slots[self.first[index] + KIND_FIELDS[code].index(name)]
+
+  def field(self, index, name):
+    '''
+    Valor del campo name: índice (nodo), lista de valores, constante o None.
+    '''
+    return self.value(self.raw(index, name))
+
+  def value(self, encoded):
+    tag, ident = encoded & 3, encoded >> 2
+    if tag == NODE:
+      return ident
+    if tag == CONST:
+      return self.consts[ident]
+    if tag == LIST:
+      n = self.slots[ident]
+      return [self.value(v) for v in self.slots[ident + 1:ident + 1 + n]]
+    return None
+
+  # -------------------------------------------------------------------
+  #  Reconstrucción de objetos de model_ast
+  # -------------------------------------------------------------------
+
+  def node(self, index=None):
+    if index is None:
+      index = self.root
+    code = self.kinds[index]
+    offset = self.first[index]
+    # Por nombre: depth/slot (resolver.py) sólo se aceptan así
+    names = KIND_FIELDS[code]
+    values = { name: self.decode(self.slots[offset + k]) for k, name in enumerate(names) }
+    node = NODE_KINDS[code](**values)
+    if code != DTYPE_CODE:
+      pos, endpos = self.spans[2 * index], self.spans[2 * index + 1]
+      node.pos = None if pos < 0 else pos
+      node.endpos = None if endpos < 0 else endpos
+    return node
+
+  def decode(self, encoded):
+    tag, ident = encoded & 3, encoded >> 2
+    if tag == NODE:
+      return self.node(ident)
+    if tag == CONST:
+      return self.consts[ident]
+    if tag == LIST:
+      n = self.slots[ident]
+      return [self.decode(v) for v in self.slots[ident + 1:ident + 1 + n]]
+    return None
@@ -0,0 +1,238 @@
+# astfile.py
+'''
+AST en formato binario plano
+============================
+Guarda la arena de un AST (arena.py: kinds, first, slots, spans y la
+tabla de constantes) en un archivo que se puede abrir con mmap sin decodificarlo:
+los arreglos se leen directamente del archivo con memoryview.cast y las
+constantes se decodifican sólo cuando se usan. Así una herramienta puede
+abrir un programa enorme y reconstruir una sola Function (o leer un
+campo de un nodo) sin crear los demás objetos de model_ast.
+
+Formato (enteros en el orden de bytes de la máquina, secciones alineadas
+a 8 bytes):
+
+  cabecera   MAGIC, VERSION, orden de bytes, tamaño de los slots, root,
+             número de nodos,
+             de slots y de constantes, desplazamiento de cada sección
+  kinds      u8  por nodo: código de su clase (arena.NODE_KINDS)
+  first      u32 por nodo: primer campo en slots
+  spans      i64 pos y endpos por nodo (-1: sin posición)
+  slots      i32 (o i64 si algún valor no cabe) por campo o elemento de
+             lista, codificado como en arena
+  offsets    u64 por constante + 1: dónde empieza cada una en pool
+  tags       u8  por constante: STR, INT, BIGINT, FLOAT o DTYPE
+  pool       las constantes (utf-8, i64, f64 o el nombre del DataType;
+             los enteros que no caben en i64 como BIGINT, en complemento
+             a dos little-endian con el largo que haga falta)
+
+dump/dumps escriben un AST (o una Arena); load/loads devuelven una
+AstFile, que es una Arena de sólo lectura: node() reconstruye el AST
+completo o un subárbol y function(name) una sola función.
+'''
+from array import array
+import mmap
+import struct
+import sys
+
+from arena     import Arena, KIND_CODES
+from model_ast import *
+
+
+MAGIC   = b'PL0AST\0\0'
+VERSION = 3
+
+# magic, version, byteorder, slotsize, root, nodes, slots, consts, 7 secciones
+HEADER = struct.Struct('=8sIIIqQQQ7Q')
+SLOT_CODES = { 4: 'i', 8: 'q' }
+
+STR, INT, FLOAT, DTYPE, NONE_DTYPE, BIGINT = range(6)
+
+
+class AstFileError(Exception):
+  '''
+  El archivo no es un AST en este formato (o es de otra versión o de
+  una máquina con otro orden de bytes).
+  '''
+  pass
+
+
+def _align(n):
+  return (n + 7) & ~7
+
+
+def _encode_const(value):
+  if isinstance(value, DataType):
+    if value.type is None:
+      return NONE_DTYPE, b''
+    return DTYPE, value.type.encode('utf-8')
+  if isinstance(value, str):
+    return STR, value.encode('utf-8')
+  if isinstance(value, bool) or not isinstance(value, (int, float)):
+    raise AstFileError(f'Unsupported constant {value!r}')
+  if isinstance(value, int):
+    if -2**63 <= value < 2**63:
+      return INT, struct.pack('=q', value)
+    return BIGINT, value.to_bytes(value.bit_length() // 8 + 1, 'little', signed=True)
+  return FLOAT, struct.pack('=d', value)
+
+
+def dumps(ast):
+  '''
+  Bytes del AST (un nodo de model_ast o una Arena).
+  '''
+  arena = ast if isinstance(ast, Arena) else Arena.from_ast(ast)
+  tags = array('B')
+  offsets = array('Q', [0])
+  pool = bytearray()
+  for value in arena.consts:
+    tag, data = _encode_const(value)
+    tags.append(tag)
+    pool += data
+    offsets.append(len(pool))
+
+  slots = array('q', arena.slots)
+  if not slots or -2**31 <= min(slots) and max(slots) < 2**31:
+    slots = array('i', slots)
+  sections = [bytes(arena.kinds), array('I', arena.first).tobytes(),
+              array('q', arena.spans).tobytes(), slots.tobytes(), offsets.tobytes(),
+              tags.tobytes(), bytes(pool)]
+  starts = []
+  pos = _align(HEADER.size)
+  for data in sections:
+    starts.append(pos)
+    pos = _align(pos + len(data))
+
+  out = bytearray(pos)
+  byteorder = 1 if sys.byteorder == 'little' else 2
+  HEADER.pack_into(out, 0, MAGIC, VERSION, byteorder, slots.itemsize, arena.root,
+                   len(arena.kinds), len(arena.slots), len(arena.consts), *starts)
+  for start, data in zip(starts, sections):
+    out[start:start + len(data)] = data
+  return bytes(out)
+
+
+def dump(ast, filename):
+  # Los bytes antes de abrir el archivo: si falla no queda uno vacío
+  data = dumps(ast)
+  with open(filename, 'wb') as f:
+    f.write(data)
+
+
+def loads(data):
+  return AstFile(memoryview(data))
+
+
+def load(filename):
+  '''
+  AstFile sobre el archivo mapeado en memoria (sin leerlo completo).
+  '''
+  with open(filename, 'rb') as f:
+    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+  return AstFile(memoryview(mapped), mapped)
+
+
+class ConstPool:
+  '''
+  Constantes de un AstFile, decodificadas la primera vez que se piden.
+  '''
+  def __init__(self, offsets, tags, pool):
+    self.offsets = offsets
+    self.tags = tags
+    self.pool = pool
+    self.cache = {}
+
+  def __len__(self):
+    return len(self.tags)
+
+  def __getitem__(self, ident):
+    value = self.cache.get(ident, self)
+    if value is self:
+      start, end = self.offsets[ident], self.offsets[ident + 1]
+      tag = self.tags[ident]
+      # Los números del pool pueden no estar alineados: struct, no cast
+      if tag == STR:
+        value = str(self.pool[start:end], 'utf-8')
+      elif tag == INT:
+        value = struct.unpack_from('=q', self.pool, start)[0]
+      elif tag == BIGINT:
+        value = int.from_bytes(self.pool[start:end], 'little', signed=True)
+      elif tag == FLOAT:
+        value = struct.unpack_from('=d', self.pool, start)[0]
+      elif tag == DTYPE:
+        value = DataType(str(self.pool[start:end], 'utf-8'))
+      else:
+        value = DataType(None)
+      self.cache[ident] = value
+    return value
+
+  def release(self):
+    for view in (self.offsets, self.tags, self.pool):
+      view.release()
+
+
+class AstFile(Arena):
+  '''
+  Arena de sólo lectura sobre un buffer en formato astfile. Los
+  arreglos son memoryviews del buffer: abrirla no crea ningún nodo.
+  '''
+
+  def __init__(self, buffer, mapped=None):
+    if len(buffer) < HEADER.size:
+      raise AstFileError('File too short')
+    (magic, version, byteorder, slotsize, root, nnodes, nslots, nconsts,
+     *starts) = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+      raise AstFileError('Not a PL0 AST file')
+    if version != VERSION:
+      raise AstFileError(f'Unsupported AST file version {version}')
+    if byteorder != (1 if sys.byteorder == 'little' else 2):
+      raise AstFileError('AST file written with another byte order')
+    if slotsize not in SLOT_CODES:
+      raise AstFileError(f'Unsupported slot size {slotsize}')
+    kinds, first, spans, slots, offsets, tags, pool = starts
+    self.buffer = buffer
+    self.mapped = mapped
+    self.kinds  = buffer[kinds:kinds + nnodes]
+    self.first  = buffer[first:first + 4 * nnodes].cast('I')
+    self.spans  = buffer[spans:spans + 16 * nnodes].cast('q')
+    self.slots  = buffer[slots:slots + slotsize * nslots].cast(SLOT_CODES[slotsize])
+    offsets = buffer[offsets:offsets + 8 * (nconsts + 1)].cast('Q')
+    self.consts = ConstPool(offsets, buffer[tags:tags + nconsts],
+                            buffer[pool:pool + offsets[nconsts]])
+    self._const_ids = None
+    self.root = root
+
+  def add(self, node):
+    raise TypeError('AstFile is read-only')
+
+  def functions(self):
+    '''
+    {nombre: índice} de las funciones del programa, leyendo sólo sus
+    nombres.
+    '''
+    code = KIND_CODES[Function]
+    return { self.field(index, 'id'): index for index in self.field(self.root, 'functions')
+             if self.kinds[index] == code }
+
+  def function(self, name):
+    '''
+    La función name como objeto de model_ast (sólo su subárbol).
+    '''
+    index = self.functions().get(name)
+    if index is None:
+      raise KeyError(name)
+    return self.node(index)
+
+  def close(self):
+    self.consts.release()
+    for view in (self.kinds, self.first, self.spans, self.slots, self.buffer):
+      view.release()
+    if self.mapped is not None:
+      self.mapped.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
@@ -0,0 +1,196 @@
+# batch.py
+'''
+Compilación de muchos programas en paralelo
+===========================================
+compile_batch reparte los archivos entre un grupo de procesos. Cada
+proceso construye (o lee del disco) las tablas del parser una sola vez,
+en su inicializador, y después analiza, revisa y opcionalmente genera
+el bytecode de la VM de cada archivo que le toca. Los mensajes (errores
+del lexer y del parser, excepciones del checker) y el tiempo de CPU de
+cada fase (que no se infla si hay más procesos que núcleos) vuelven
+como un FileResult; el informe los presenta en el orden de los
+archivos de entrada, así que es el mismo que el de una ejecución en
+serie (jobs=1), salvo por los tiempos.
+
+expand acepta archivos, directorios (se buscan los *.pl0 dentro) y
+patrones de glob (de los que sólo se toman los archivos *.pl0); las
+entradas que no corresponden a ningún programa (p. ej. un nombre mal
+escrito) aparecen en el informe como fallidas.
+'''
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout, redirect_stderr
+from dataclasses import dataclass, field
+import glob
+import io
+import os
+import time
+
+from context    import Context
+from diskcache  import DiskCache
+from memstats   import MemoryTracker, MemoryBudgetError
+from parser_pl0 import ParserForPL0
+
+
+def expand(paths, missing=None):
+  '''
+  Lista ordenada (sin repetidos) de los programas en paths. Las
+  entradas de paths que no dan ningún programa se agregan a missing.
+  '''
+  found = []
+  for path in paths:
+    before = len(found)
+    if os.path.isdir(path):
+      for root, dirs, files in os.walk(path):
+        dirs.sort()
+        found.extend(os.path.join(root, name) for name in sorted(files) if name.endswith('.pl0'))
+    elif os.path.exists(path):
+      found.append(path)
+    else:
+      found.extend(name for name in sorted(glob.glob(path, recursive=True))
+                   if name.endswith('.pl0') and os.path.isfile(name))
+    if len(found) == before and missing is not None:
+      missing.append(path)
+  return list(dict.fromkeys(found))
+
+
+@dataclass(slots=True)
+class FileResult:
+  filename    : str
+  ok          : bool = True
+  cached      : bool = False
+  diagnostics : list = field(default_factory=list)
+  timings     : dict = field(default_factory=dict)   # fase -> segundos de CPU
+
+  @property
+  def elapsed(self):
+    return sum(self.timings.values())
+
+
+# Estado de cada proceso del grupo
+_worker = None
+
+
+class Worker:
+
+  def __init__(self, opt_level=None, codegen=False, cache_dir=None, mem_budget=None):
+    ParserForPL0.build_tables()
+    self.opt_level = opt_level
+    self.codegen = codegen
+    self.cache = DiskCache(cache_dir) if cache_dir else None
+    self.mem_budget = mem_budget
+
+  def compile(self, filename):
+    result = FileResult(filename)
+    output = io.StringIO()
+    context = Context()
+    if self.mem_budget is not None:
+      context.memory = MemoryTracker(self.mem_budget)
+      context.memory.start()
+    try:
+      with redirect_stdout(output), redirect_stderr(output):
+        t0 = time.process_time()
+        with open(filename, encoding='utf-8') as f:
+          source = f.read()
+        if self.cache is not None:
+          result.cached = context.parse_cached(source, self.cache, ('O', self.opt_level))
+        else:
+          context.parse(source)
+        t1 = time.process_time()
+        result.timings['parse'] = t1 - t0
+        if context.ast is None:
+          context.have_errors = True
+        context.run(opt_level=self.opt_level)
+        t2 = time.process_time()
+        result.timings['check'] = t2 - t1
+        if self.codegen and not context.have_errors:
+          context.compile(self.opt_level)
+          result.timings['codegen'] = time.process_time() - t2
+        if self.cache is not None:
+          context.save(self.cache)
+    except MemoryBudgetError as e:
+      result.diagnostics.append(str(e))
+      result.diagnostics.extend(e.report.splitlines())
+      result.ok = False
+    except Exception as e:
+      result.diagnostics.append(f'{type(e).__name__}: {e}')
+      result.ok = False
+    finally:
+      if context.memory is not None:
+        context.memory.stop()
+    messages = output.getvalue().splitlines()
+    if context.diagnostics:
+      messages[:0] = context.report('short').splitlines()
+    if messages or context.have_errors:
+      result.ok = False
+    result.diagnostics[:0] = messages
+    return result
+
+
+def _init(opt_level, codegen, cache_dir, mem_budget):
+  global _worker
+  _worker = Worker(opt_level, codegen, cache_dir, mem_budget)
+
+
+def _compile(filename):
+  return _worker.compile(filename)
+
+
+def compile_batch(files, jobs=None, opt_level=None, codegen=False, cache_dir=None, mem_budget=None):
+  '''
+  FileResult de cada archivo, en el orden de files. Con jobs=1 se
+  compila en este proceso. Con mem_budget (bytes) la compilación de un
+  archivo que pasa de ese límite falla con el informe de memoria.
+  '''
+  jobs = jobs or os.cpu_count() or 1
+  if jobs == 1 or len(files) < 2:
+    worker = Worker(opt_level, codegen, cache_dir, mem_budget)
+    return [worker.compile(filename) for filename in files]
+  # Trozos grandes para archivos pequeños, pero varios por proceso para
+  # repartir bien la carga
+  chunksize = max(1, min(64, len(files) // (jobs * 8)))
+  with ProcessPoolExecutor(jobs, initializer=_init, initargs=(opt_level, codegen, cache_dir, mem_budget)) as pool:
+    return list(pool.map(_compile, files, chunksize=chunksize))
+
+
+class BatchReport:
+
+  def __init__(self, results, wall, jobs):
+    self.results = results
+    self.wall = wall
+    self.jobs = jobs
+
+  @property
+  def failed(self):
+    return sum(not res.ok for res in self.results)
+
+  def format(self, verbose=False):
+    lines = []
+    for res in self.results:
+      if verbose or not res.ok:
+        status = 'ok  ' if res.ok else 'FAIL'
+        mark = ' (cached)' if res.cached else ''
+        lines.append(f'{status} {res.elapsed * 1e3:9.2f} ms  {res.filename}{mark}')
+        lines.extend(f'       {message}' for message in res.diagnostics)
+    failed = self.failed
+    work = sum(res.elapsed for res in self.results)
+    phases = {}
+    for res in self.results:
+      for phase, elapsed in res.timings.items():
+        phases[phase] = phases.get(phase, 0.0) + elapsed
+    lines.append(f'{len(self.results)} files, {failed} failed, {self.jobs} jobs')
+    if phases:
+      lines.append('  ' + ', '.join(f'{phase} {elapsed:.2f} s' for phase, elapsed in phases.items()))
+    speedup = work / self.wall if self.wall else 0.0
+    lines.append(f'  wall {self.wall:.2f} s, cpu {work:.2f} s (x{speedup:.1f})')
+    return '\n'.join(lines)
+
+
+def run_batch(paths, jobs=None, opt_level=None, codegen=False, cache_dir=None, mem_budget=None):
+  missing = []
+  files = expand(paths, missing)
+  jobs = jobs or os.cpu_count() or 1
+  t0 = time.perf_counter()
+  results = [FileResult(path, ok=False, diagnostics=['No such file, directory or matching program'])
+             for path in missing]
+  results.extend(compile_batch(files, jobs, opt_level, codegen, cache_dir, mem_budget))
+  return BatchReport(results, time.perf_counter() - t0, jobs)
@@ -0,0 +1,84 @@
+# bench_ast_memory.py
+'''
+Bytes por nodo del AST con tres representaciones:
+
+  dict    nodos con __dict__ y un DataType(None) nuevo por nodo (la
+          representación anterior, reproducida con make_dataclass)
+  slots   nodos actuales de model_ast (__slots__, DataType internado)
+  arena   arena.Arena (estructura de arreglos con índices enteros)
+
+usage: python benchmarks/bench_ast_memory.py [file.pl0] [-r REPEAT]
+'''
+import argparse
+import copy
+import dataclasses
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from arena      import Arena, NODE_KINDS
+from model_ast  import DataType, Node
+from parser_pl0 import gen_ast
+
+
+class DictDataType:
+  def __init__(self, type):
+    self.type = type
+
+
+DICT_CLASSES = {
+  cls: dataclasses.make_dataclass(cls.__name__, [f.name for f in dataclasses.fields(cls)])
+  for cls in NODE_KINDS
+}
+
+
+def to_dict_nodes(value):
+  if isinstance(value, list):
+    return [to_dict_nodes(v) for v in value]
+  if isinstance(value, DataType):
+    return DictDataType(value.type)
+  if isinstance(value, Node):
+    return DICT_CLASSES[type(value)](*(to_dict_nodes(getattr(value, f.name))
+                                       for f in dataclasses.fields(value)))
+  return value
+
+
+def count_nodes(value):
+  if isinstance(value, list):
+    return sum(count_nodes(v) for v in value)
+  if isinstance(value, Node) and not isinstance(value, DataType):
+    return 1 + sum(count_nodes(getattr(value, f.name)) for f in dataclasses.fields(value))
+  return 0
+
+
+def retained(build):
+  tracemalloc.start()
+  obj = build()
+  size = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+  return obj, size
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('input', nargs='?', default=os.path.join(ROOT, 'Grammar', 'program.pl0'))
+  cli.add_argument('-r', '--repeat', type=int, default=200)
+  args = cli.parse_args()
+
+  with open(args.input, encoding='utf-8') as f:
+    source = f.read()
+  ast = gen_ast(source)
+  ast.functions = [copy.deepcopy(fn) for _ in range(args.repeat) for fn in ast.functions]
+  nodes = count_nodes(ast)
+
+  results = [
+    ('dict',  retained(lambda: to_dict_nodes(ast))[1]),
+    ('slots', retained(lambda: copy.deepcopy(ast))[1]),
+    ('arena', retained(lambda: Arena.from_ast(ast))[1]),
+  ]
+  print(f'{nodes} nodes')
+  for label, size in results:
+    print(f'{label:6} {size / 2**20:8.2f} MB {size / nodes:8.1f} bytes/node')
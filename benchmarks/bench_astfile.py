@@ -0,0 +1,89 @@
+# bench_astfile.py
+'''
+AST en formato binario plano (astfile.py) frente a pickle, con un
+programa generado de N funciones:
+
+  size      bytes serializados
+  dump      tiempo de serializar el AST
+  open      tiempo hasta poder usar el AST: pickle.load lo reconstruye
+            completo; astfile.load sólo mapea el archivo
+  one       abrir y obtener una sola Function como objetos de model_ast
+  full      abrir y reconstruir el AST completo
+
+usage: python benchmarks/bench_astfile.py [--funcs N] [--repeat N]
+'''
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import astfile
+from checker    import Checker
+from parser_pl0 import gen_ast
+from bench_incremental import gen_source
+
+
+def best(func, repeat):
+  elapsed = None
+  for _ in range(repeat):
+    t0 = time.perf_counter()
+    result = func()
+    t = time.perf_counter() - t0
+    elapsed = t if elapsed is None else min(elapsed, t)
+  return elapsed, result
+
+
+def pickle_load(filename):
+  with open(filename, 'rb') as f:
+    return pickle.load(f)
+
+
+def flat_one(filename, name):
+  with astfile.load(filename) as ast:
+    return ast.function(name)
+
+
+def flat_full(filename):
+  with astfile.load(filename) as ast:
+    return ast.node()
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('--funcs', type=int, default=5000)
+  cli.add_argument('--repeat', type=int, default=3)
+  args = cli.parse_args()
+
+  ast = gen_ast(gen_source(args.funcs))
+  Checker.check(ast)
+  name = f'f{args.funcs // 2}'
+
+  with tempfile.TemporaryDirectory() as path:
+    fpickle = os.path.join(path, 'ast.pickle')
+    fflat = os.path.join(path, 'ast.bin')
+    t_pdump, data = best(lambda: pickle.dumps(ast, pickle.HIGHEST_PROTOCOL), args.repeat)
+    with open(fpickle, 'wb') as f:
+      f.write(data)
+    t_fdump, data = best(lambda: astfile.dumps(ast), args.repeat)
+    with open(fflat, 'wb') as f:
+      f.write(data)
+
+    t_popen, loaded = best(lambda: pickle_load(fpickle), args.repeat)
+    assert loaded == ast
+    t_fopen, _ = best(lambda: astfile.load(fflat).close(), args.repeat)
+    t_fone, func = best(lambda: flat_one(fflat, name), args.repeat)
+    assert func == next(f for f in ast.functions if f.id == name)
+    t_ffull, loaded = best(lambda: flat_full(fflat), args.repeat)
+    assert loaded == ast
+
+    print(f'{args.funcs} functions')
+    print(f'{"":8} {"pickle":>10} {"astfile":>10}')
+    print(f'{"size KiB":8} {os.path.getsize(fpickle) / 1024:10.1f} {os.path.getsize(fflat) / 1024:10.1f}')
+    print(f'{"dump ms":8} {t_pdump * 1e3:10.2f} {t_fdump * 1e3:10.2f}')
+    print(f'{"open ms":8} {t_popen * 1e3:10.2f} {t_fopen * 1e3:10.3f}')
+    print(f'{"one ms":8} {t_popen * 1e3:10.2f} {t_fone * 1e3:10.3f}')
+    print(f'{"full ms":8} {t_popen * 1e3:10.2f} {t_ffull * 1e3:10.2f}')
@@ -0,0 +1,55 @@
+# bench_batch.py
+'''
+Compilación en paralelo (batch.py): N programas generados, revisados
+(y con --codegen compilados a bytecode -O2) con 1, 2, 4, ... procesos
+hasta el número de núcleos. Compara el tiempo total y verifica que los
+resultados sean los mismos que en serie.
+
+usage: python benchmarks/bench_batch.py [--files N] [--codegen]
+'''
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import compile_batch, expand
+from bench_incremental import gen_source
+
+
+def outcome(results):
+  return [(os.path.basename(res.filename), res.ok, res.diagnostics) for res in results]
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('--files', type=int, default=400)
+  cli.add_argument('--codegen', action='store_true')
+  args = cli.parse_args()
+
+  random.seed(1)
+  with tempfile.TemporaryDirectory() as path:
+    for k in range(args.files):
+      with open(os.path.join(path, f'p{k:05}.pl0'), 'w', encoding='utf-8') as f:
+        f.write(gen_source(random.randint(5, 40)))
+    files = expand([path])
+    opt = 2 if args.codegen else None
+
+    serial = None
+    jobs = 1
+    print(f'{len(files)} files, {os.cpu_count()} CPUs')
+    print(f'{"jobs":>5} {"wall s":>8} {"speedup":>8}')
+    while True:
+      t0 = time.perf_counter()
+      results = compile_batch(files, jobs, opt, args.codegen)
+      elapsed = time.perf_counter() - t0
+      if serial is None:
+        serial, expected = elapsed, outcome(results)
+      same = '' if outcome(results) == expected else '  DIFFERENT RESULTS'
+      print(f'{jobs:5} {elapsed:8.2f} {serial / elapsed:8.2f}{same}')
+      if jobs >= (os.cpu_count() or 1):
+        break
+      jobs = min(jobs * 2, os.cpu_count())
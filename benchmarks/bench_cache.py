@@ -0,0 +1,54 @@
+# bench_cache.py
+'''
+Caché de compilación en disco (diskcache.py): tiempo hasta tener el
+bytecode (-O2) de un programa generado con N funciones, compilando
+desde el fuente (fallo) y recuperándolo del caché (acierto).
+
+usage: python benchmarks/bench_cache.py [--funcs N] [--repeat N]
+'''
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context    import Context
+from diskcache  import DiskCache
+from bench_incremental import gen_source
+
+
+def compile_once(source, cache):
+  context = Context()
+  hit = context.parse_cached(source, cache, ('O', 2))
+  context.run(opt_level=2)
+  context.compile(2)
+  context.save(cache)
+  return hit
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('--funcs', type=int, default=1000)
+  cli.add_argument('--repeat', type=int, default=5)
+  args = cli.parse_args()
+
+  source = gen_source(args.funcs)
+  with tempfile.TemporaryDirectory() as path:
+    cache = DiskCache(path)
+    cold = warm = None
+    for k in range(args.repeat):
+      cache.clear()
+      t0 = time.perf_counter()
+      assert not compile_once(source, cache)
+      elapsed = time.perf_counter() - t0
+      cold = elapsed if cold is None else min(cold, elapsed)
+      t0 = time.perf_counter()
+      assert compile_once(source, cache)
+      elapsed = time.perf_counter() - t0
+      warm = elapsed if warm is None else min(warm, elapsed)
+    print(f'{args.funcs} functions, {len(source)} bytes')
+    print(f'miss {cold * 1e3:9.2f} ms')
+    print(f'hit  {warm * 1e3:9.2f} ms  x{cold / warm:.1f}')
+    print(cache.report())
@@ -0,0 +1,75 @@
+# bench_closures.py
+'''
+Motor de closures (closures.py) contra el intérprete directo del AST
+(interp.py) y la VM de registros con -O2, sobre los programas de
+benchmarks/programs y sobre test.pl0 y Grammar/program.pl0 repetidos:
+tiempo de compilación a closures y tiempo de ejecución de cada motor.
+
+usage: python benchmarks/bench_closures.py [--fib N] [--sort N] [--scan N] [--matrix N] [--repeat N]
+'''
+import argparse
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from checker    import Checker
+from closures   import compile_closures
+from interp     import Interpreter
+from ircode     import generate_ir
+from optimizer  import optimize
+from parser_pl0 import gen_ast
+from vm         import Lowering, VM
+
+
+def source(path):
+  with open(os.path.join(ROOT, path), encoding='utf-8') as f:
+    return f.read()
+
+
+def timed(run, stdin, repeat):
+  # (tiempo total de repeat ejecuciones, salida de la última)
+  t0 = time.perf_counter()
+  for _ in range(repeat):
+    out = io.StringIO()
+    run(io.StringIO(stdin), out)
+  return time.perf_counter() - t0, out.getvalue().strip()
+
+
+def run_vm(ast):
+  ir = generate_ir(ast)
+  optimize(ir, 2)
+  bytecode = Lowering.lower(ir)
+  return lambda stdin, stdout: VM(bytecode, stdin, stdout).run()
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('--fib', type=int, default=20)
+  cli.add_argument('--sort', type=int, default=300)
+  cli.add_argument('--scan', type=int, default=10_000)
+  cli.add_argument('--matrix', type=int, default=20)
+  cli.add_argument('--repeat', type=int, default=200, help='runs of test.pl0 and program.pl0')
+  args = cli.parse_args()
+
+  cases = [(f'benchmarks/programs/{name}.pl0', str(getattr(args, name)), 1)
+           for name in ('fib', 'sort', 'scan', 'matrix')]
+  cases += [('test.pl0', '5 3 1 4 2 9', args.repeat),
+            ('Grammar/program.pl0', '8 5 3 9 1 7 2 8 6', args.repeat)]
+
+  for path, stdin, repeat in cases:
+    ast = gen_ast(source(path))
+    Checker.check(ast)
+    t0 = time.perf_counter()
+    program = compile_closures(ast)
+    build = time.perf_counter() - t0
+    closure_time, output = timed(program.run, stdin, repeat)
+    ast_time, ast_output = timed(lambda i, o: Interpreter.interpret(ast, i, o), stdin, repeat)
+    vm_time, vm_output = timed(run_vm(ast), stdin, repeat)
+    same = 'ok' if output == ast_output == vm_output else 'DIFFERENT OUTPUT'
+    name = os.path.basename(path)
+    print(f'{name:12} x{repeat:<4} compile {build * 1e3:6.2f} ms  ast {ast_time:7.3f} s  '
+          f'closure {closure_time:6.3f} s  x{ast_time / closure_time:5.1f}  vm {vm_time:6.3f} s  {same}')
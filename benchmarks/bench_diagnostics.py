@@ -0,0 +1,47 @@
+# bench_diagnostics.py
+'''
+Informe de errores (sourcemap.py): un programa generado con N funciones
+en el que cada función tiene un error de sintaxis. Mide el parse (que
+guarda los errores) y el formato de todos los errores como texto y como
+JSON, por error, para varios N: el costo por error no debe crecer con el
+tamaño del fuente.
+
+usage: python benchmarks/bench_diagnostics.py [--max N]
+'''
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context import Context
+from bench_incremental import gen_source
+
+
+def broken(nfuncs):
+  # Un ';' de más en la primera asignación de cada función
+  return gen_source(nfuncs).replace(':= ', ':= ;', nfuncs)
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('--max', type=int, default=8000)
+  args = cli.parse_args()
+
+  print(f'{"funcs":>7} {"errors":>7} {"parse ms":>10} {"text us/err":>12} {"json us/err":>12}')
+  nfuncs = 500
+  while nfuncs <= args.max:
+    source = broken(nfuncs)
+    context = Context()
+    t0 = time.perf_counter()
+    context.parse(source)
+    t1 = time.perf_counter()
+    text = context.report('text')
+    t2 = time.perf_counter()
+    context.report('json')
+    t3 = time.perf_counter()
+    errors = len(context.diagnostics)
+    print(f'{nfuncs:7} {errors:7} {(t1 - t0) * 1e3:10.1f} '
+          f'{(t2 - t1) * 1e6 / errors:12.2f} {(t3 - t2) * 1e6 / errors:12.2f}')
+    nfuncs *= 2
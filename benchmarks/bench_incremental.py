@@ -0,0 +1,67 @@
+# bench_incremental.py
+'''
+Latencia de Context.parse + Context.run (revisión) tras editar una línea
+de un programa con N funciones: análisis completo frente a incremental
+(incremental.py). Con el análisis incremental el tiempo por edición no
+debe crecer con N más allá de la división del fuente (una expresión
+regular) y el hash de cada función.
+
+usage: python benchmarks/bench_incremental.py [--max N] [--edits N]
+'''
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from checker    import Checker
+from context    import Context
+
+
+def gen_source(nfuncs):
+  funcs = []
+  for k in range(nfuncs):
+    call = f'f{k - 1}(x + 1)' if k else 'x'
+    funcs.append(f'fun f{k}(x: int)\n  y: int;\nbegin\n  y := {call};\n  return y * 2\nend\n')
+  funcs.append(f'fun main()\n  a: int;\nbegin\n  a := f{nfuncs - 1}(1);\n  write(a)\nend\n')
+  return '\n'.join(funcs)
+
+
+def edit(source, nfuncs, k):
+  # Cambia una línea en medio del programa (sin cambiar firmas)
+  target = f'fun f{nfuncs // 2}(x: int)\n  y: int;\nbegin\n  y := '
+  return source.replace(target, target + f'{k} + ', 1)
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('--max', type=int, default=4000)
+  cli.add_argument('--edits', type=int, default=5)
+  args = cli.parse_args()
+
+  print(f'{"funcs":>7} {"full ms":>9} {"incr ms":>9} {"parsed":>7} {"checked":>8}')
+  n = 250
+  while n <= args.max:
+    base = gen_source(n)
+    sources = [edit(base, n, k) for k in range(args.edits)]
+
+    full = Context()
+    t0 = time.perf_counter()
+    for source in sources:
+      full.ast = full.parser.parse(full.lexer.tokenize(source))
+      Checker.check(full.ast)
+    t_full = (time.perf_counter() - t0) / args.edits
+
+    incr = Context()
+    incr.parse(base)
+    incr.run()
+    t0 = time.perf_counter()
+    for source in sources:
+      incr.parse(source)
+      incr.run()
+    t_incr = (time.perf_counter() - t0) / args.edits
+    assert incr.incremental
+
+    print(f'{n:7} {t_full * 1e3:9.2f} {t_incr * 1e3:9.2f} {incr.units.parsed:7} {incr.units.checked:8}')
+    n *= 2
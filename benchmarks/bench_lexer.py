@@ -0,0 +1,58 @@
+# bench_lexer.py
+'''
+Tokens por segundo y memoria por token: LexerForPL0 (SLY) frente al
+lexer columnar de fastlex.
+
+usage: python benchmarks/bench_lexer.py [file.pl0] [-r REPEAT]
+'''
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fastlex
+from lexer_pl0 import LexerForPL0
+
+
+def bench(label, func, source, runs=3):
+  elapsed = float('inf')
+  for _ in range(runs):
+    t0 = time.perf_counter()
+    ntokens = func(source)
+    elapsed = min(elapsed, time.perf_counter() - t0)
+  tracemalloc.start()
+  kept = KEEP[label](source)
+  size = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+  del kept
+  print(f'{label:10} {ntokens:10} tokens {ntokens / elapsed:12.0f} tok/s'
+        f'   {size / ntokens:7.1f} bytes/token')
+
+
+KEEP = {
+  'sly':     lambda s: list(LexerForPL0().tokenize(s)),
+  'fastlex': lambda s: fastlex.tokenize(s),
+}
+
+RUN = {
+  'sly':     lambda s: sum(1 for _ in LexerForPL0().tokenize(s)),
+  'fastlex': lambda s: len(fastlex.tokenize(s)),
+}
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('input', nargs='?', default=os.path.join(ROOT, 'Grammar', 'program.pl0'))
+  cli.add_argument('-r', '--repeat', type=int, default=2000,
+                   help='number of copies of the input to lex')
+  args = cli.parse_args()
+
+  with open(args.input, encoding='utf-8') as f:
+    source = (f.read() + '\n') * args.repeat
+
+  for label in ('sly', 'fastlex'):
+    bench(label, RUN[label], source)
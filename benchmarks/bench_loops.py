@@ -0,0 +1,70 @@
+# bench_loops.py
+'''
+Efecto de las optimizaciones de ciclos (loops.py: licm y strength) en
+los programas de benchmarks/programs con ciclos de recorrido de
+vectores: instrucciones ejecutadas en la VM y tiempo con -O2 sin las
+pasadas de ciclos y con -O2 completo.
+
+usage: python benchmarks/bench_loops.py [--sort N] [--scan N] [--matrix N]
+'''
+import argparse
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from checker    import Checker
+from ircode     import generate_ir
+from loops      import find_loops, induction_variables
+from optimizer  import LEVELS, optimize
+from parser_pl0 import gen_ast
+from vm         import Lowering, VM
+
+SCALAR = tuple(name for name in LEVELS[2] if name not in ('licm', 'strength'))
+
+
+def program(name):
+  with open(os.path.join(ROOT, 'benchmarks', 'programs', name + '.pl0'), encoding='utf-8') as f:
+    return f.read()
+
+
+def build(source, passes):
+  ast = gen_ast(source)
+  Checker.check(ast)
+  ir = generate_ir(ast)
+  report = optimize(ir, 2, passes)
+  return ir, report
+
+
+def execute(ir, stdin):
+  vm = VM(Lowering.lower(ir), io.StringIO(stdin), io.StringIO())
+  t0 = time.perf_counter()
+  vm.run()
+  return time.perf_counter() - t0, vm.steps, vm.stdout.getvalue().strip()
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('--sort', type=int, default=800)
+  cli.add_argument('--scan', type=int, default=40_000)
+  cli.add_argument('--matrix', type=int, default=40)
+  args = cli.parse_args()
+
+  for name, n in (('sort', args.sort), ('scan', args.scan), ('matrix', args.matrix)):
+    source = program(name)
+    results = []
+    for label, passes in (('-O2 scalar', SCALAR), ('-O2 loops', None)):
+      ir, report = build(source, passes)
+      elapsed, steps, output = execute(ir, str(n))
+      results.append((label, steps, elapsed, output, report))
+    base = results[0][1]
+    ir, report = build(source, None)
+    loops = [loop for func in ir.functions for loop in find_loops(func)]
+    ivs = sum(len(induction_variables(func, loop)) for func in ir.functions for loop in find_loops(func))
+    print(f'{name} n={n}  ({len(loops)} loops, {ivs} basic induction variables, '
+          f'licm moved {report.changed["licm"]}, strength reduced {report.changed["strength"]})')
+    for label, steps, elapsed, output, _ in results:
+      print(f'  {label:10} {steps:10} executed ({steps / base:6.1%})  {elapsed:7.3f} s  -> {output}')
@@ -0,0 +1,76 @@
+# bench_native.py
+'''
+Código nativo (cgen.py, a través del compilador de C del sistema)
+contra la VM de registros con el bytecode de -O2, sobre los programas
+de benchmarks/programs: tiempo de generación y compilación, tiempo de
+ejecución (el del ejecutable incluye el arranque del proceso) y
+aceleración.
+
+usage: python benchmarks/bench_native.py [--fib N] [--sort N] [--matrix N] [-O {0,1,2}]
+'''
+import argparse
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cgen       import build, generate_c
+from checker    import Checker
+from ircode     import generate_ir
+from optimizer  import optimize
+from parser_pl0 import gen_ast
+from vm         import Lowering, VM
+
+
+def program(name):
+  with open(os.path.join(ROOT, 'benchmarks', 'programs', name + '.pl0'), encoding='utf-8') as f:
+    return f.read()
+
+
+def ircode(source, level):
+  ast = gen_ast(source)
+  Checker.check(ast)
+  ir = generate_ir(ast)
+  optimize(ir, level)
+  return ir
+
+
+def run_vm(source, stdin):
+  bytecode = Lowering.lower(ircode(source, 2))
+  vm = VM(bytecode, io.StringIO(stdin), io.StringIO())
+  t0 = time.perf_counter()
+  vm.run()
+  return time.perf_counter() - t0, vm.stdout.getvalue().strip()
+
+
+def run_native(source, stdin, level, tmp):
+  exe = os.path.join(tmp, 'a.out')
+  t0 = time.perf_counter()
+  build(generate_c(ircode(source, level)), exe)
+  t1 = time.perf_counter()
+  proc = subprocess.run([exe], input=stdin, capture_output=True, text=True, check=True)
+  t2 = time.perf_counter()
+  return t1 - t0, t2 - t1, proc.stdout.strip()
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('--fib', type=int, default=22)
+  cli.add_argument('--sort', type=int, default=1000)
+  cli.add_argument('--matrix', type=int, default=30)
+  cli.add_argument('-O', dest='opt', type=int, choices=(0, 1, 2), default=2)
+  args = cli.parse_args()
+
+  with tempfile.TemporaryDirectory(prefix='pl0-bench-') as tmp:
+    for name, n in (('fib', args.fib), ('sort', args.sort), ('matrix', args.matrix)):
+      source = program(name)
+      vm_time, vm_output = run_vm(source, str(n))
+      build_time, native_time, output = run_native(source, str(n), args.opt, tmp)
+      same = 'ok' if output == vm_output else 'DIFFERENT OUTPUT'
+      print(f'{name:6} n={n:<6} vm {vm_time:7.3f} s  native build {build_time:6.3f} s  '
+            f'run {native_time:7.4f} s  x{vm_time / native_time:7.1f}  {same}  -> {output}')
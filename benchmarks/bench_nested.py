@@ -0,0 +1,83 @@
+# bench_nested.py
+'''
+Funciones anidadas: benchmarks/programs/nested.pl0 (un ayudante
+recursivo anidado en main y dos funciones anidadas que usan variables
+de main) en la VM con -O2 (display), en closures (enlace estático) y en
+código de CPython, con y sin lambda lifting (lifting.py).
+
+usage: python benchmarks/bench_nested.py [--n N] [--repeat N]
+'''
+import argparse
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pycompile
+from checker    import Checker
+from closures   import compile_closures
+from ircode     import generate_ir
+from lifting    import lift
+from optimizer  import optimize
+from parser_pl0 import gen_ast
+from resolver   import resolve
+from vm         import Lowering, VM
+
+
+def prepare(source, lifted):
+  ast = gen_ast(source)
+  Checker.check(ast)
+  frames = resolve(ast)
+  names = []
+  if lifted:
+    names = lift(ast, frames)
+    frames = resolve(ast)
+  return ast, frames, names
+
+
+def engines(ast, frames, source):
+  ir = generate_ir(ast)
+  optimize(ir, 2)
+  bytecode = Lowering.lower(ir)
+  closures = compile_closures(ast, frames)
+  pycompile._cache.clear()
+  python = pycompile.compile_python(ast, source)
+  return {
+    'vm':      lambda i, o: VM(bytecode, i, o).run(),
+    'closure': closures.run,
+    'py':      lambda i, o: python.load(i, o).main(),
+  }
+
+
+def timed(run, stdin, repeat):
+  best = None
+  for _ in range(repeat):
+    out = io.StringIO()
+    t0 = time.perf_counter()
+    run(io.StringIO(stdin), out)
+    elapsed = time.perf_counter() - t0
+    best = elapsed if best is None else min(best, elapsed)
+  return best, out.getvalue().strip()
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('--n', type=int, default=12)
+  cli.add_argument('--repeat', type=int, default=3)
+  args = cli.parse_args()
+
+  with open(os.path.join(ROOT, 'benchmarks', 'programs', 'nested.pl0'), encoding='utf-8') as f:
+    source = f.read()
+  stdin = str(args.n)
+  nested = engines(*prepare(source, False)[:2], source)
+  ast, frames, names = prepare(source, True)
+  flat = engines(ast, frames, source)
+  print(f'lifted: {", ".join(names) or "-"}')
+  for name in nested:
+    t0, out0 = timed(nested[name], stdin, args.repeat)
+    t1, out1 = timed(flat[name], stdin, args.repeat)
+    same = 'ok' if out0 == out1 else 'DIFFERENT OUTPUT'
+    print(f'{name:8} nested {t0:7.3f} s  lifted {t1:7.3f} s  x{t0 / t1:5.2f}  {same}  -> {out1}')
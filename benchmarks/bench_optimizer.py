@@ -0,0 +1,68 @@
+# bench_optimizer.py
+'''
+Efecto de los niveles de optimización (optimizer.py) al ejecutar los
+programas de benchmarks/programs en la VM: instrucciones del IR,
+instrucciones ejecutadas y tiempo, para el bytecode compilado
+directamente desde el AST y para -O0, -O1 y -O2.
+
+usage: python benchmarks/bench_optimizer.py [--fib N] [--sort N] [--scan N] [--report]
+'''
+import argparse
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from checker    import Checker
+from ircode     import generate_ir
+from optimizer  import optimize
+from parser_pl0 import gen_ast
+from vm         import Compiler, Lowering, VM
+
+
+def program(name):
+  with open(os.path.join(ROOT, 'benchmarks', 'programs', name + '.pl0'), encoding='utf-8') as f:
+    return f.read()
+
+
+def build(source, level):
+  ast = gen_ast(source)
+  Checker.check(ast)
+  if level is None:
+    return Compiler.compile(ast), None
+  ir = generate_ir(ast)
+  report = optimize(ir, level)
+  return Lowering.lower(ir), report
+
+
+def execute(bytecode, stdin):
+  vm = VM(bytecode, io.StringIO(stdin), io.StringIO())
+  t0 = time.perf_counter()
+  vm.run()
+  return time.perf_counter() - t0, vm.steps, vm.stdout.getvalue().strip()
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('--fib', type=int, default=20)
+  cli.add_argument('--sort', type=int, default=800)
+  cli.add_argument('--scan', type=int, default=40_000)
+  cli.add_argument('--report', action='store_true', help='show the per-pass report of -O2')
+  args = cli.parse_args()
+
+  for name, n in (('fib', args.fib), ('sort', args.sort), ('scan', args.scan)):
+    source = program(name)
+    print(f'{name} n={n}')
+    base = None
+    for level in (None, 0, 1, 2):
+      bytecode, report = build(source, level)
+      elapsed, steps, output = execute(bytecode, str(n))
+      base = base or steps
+      label = 'ast' if level is None else f'-O{level}'
+      size = f'{report.after:4} IR instr' if report else ' ' * 13
+      print(f'  {label:4} {size}  {steps:10} executed ({steps / base:5.1%})  {elapsed:7.3f} s  -> {output}')
+    if args.report:
+      print('\n'.join('    ' + line for line in report.format().splitlines()))
@@ -0,0 +1,87 @@
+# bench_parcheck.py
+'''
+Revisión de tipos en paralelo (parcheck.py): un programa generado con N
+funciones compilado con Context en serie y con context.check_jobs = 2,
+4, ... procesos hasta el número de núcleos. Mide el parse y la revisión
+(Context.run hasta el checker) y verifica que la revisión pasó por
+check_parallel sin volver a la revisión en serie y que las anotaciones
+del AST sean las mismas que en serie.
+
+usage: python benchmarks/bench_parcheck.py [--funcs N] [--repeat N]
+'''
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from arena   import Arena
+from context import Context
+import context as context_module
+import parcheck
+from bench_incremental import gen_source
+
+calls = fallbacks = 0
+_check_parallel = context_module.check_parallel
+_serial = parcheck.serial
+
+
+def counted(ast, jobs):
+  global calls
+  calls += 1
+  return _check_parallel(ast, jobs)
+
+
+def fallback(ast, initial):
+  global fallbacks
+  fallbacks += 1
+  return _serial(ast, initial)
+
+context_module.check_parallel = counted
+parcheck.serial = fallback
+
+
+def snapshot(ast):
+  arena = Arena.from_ast(ast)
+  return list(arena.kinds), list(arena.slots), arena.consts
+
+
+def best(jobs, source, repeat):
+  elapsed = None
+  for k in range(repeat):
+    context = Context()
+    context.check_jobs = jobs
+    t0 = time.perf_counter()
+    context.parse(source)
+    context.run()
+    t = time.perf_counter() - t0
+    assert not context.have_errors
+    elapsed = t if elapsed is None else min(elapsed, t)
+  return elapsed, context.ast
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('--funcs', type=int, default=4000)
+  cli.add_argument('--repeat', type=int, default=3)
+  args = cli.parse_args()
+
+  source = gen_source(args.funcs)
+  cpus = os.cpu_count() or 1
+  serial, ast = best(None, source, args.repeat)
+  assert calls == 0
+  expected = snapshot(ast)
+  print(f'{args.funcs} functions, {cpus} CPUs')
+  print(f'serial    {serial * 1e3:9.2f} ms')
+  jobs = 2
+  while True:
+    before = calls
+    elapsed, ast = best(jobs, source, args.repeat)
+    assert calls == before + args.repeat
+    assert fallbacks == 0
+    assert snapshot(ast) == expected
+    print(f'{jobs:2} jobs   {elapsed * 1e3:9.2f} ms  x{serial / elapsed:.2f}')
+    if jobs >= cpus:
+      break
+    jobs *= 2
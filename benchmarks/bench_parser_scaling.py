@@ -0,0 +1,45 @@
+# bench_parser_scaling.py
+'''
+Escalamiento del parser con el número de sentencias en un único bloque
+begin ... end. Con listas lineales el tiempo por sentencia debe
+mantenerse constante.
+
+usage: python benchmarks/bench_parser_scaling.py [--max N]
+'''
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer_pl0  import LexerForPL0
+from parser_pl0 import ParserForPL0
+
+
+def gen_source(nstmts):
+  body = ';\n'.join('  i := i + %d' % (k % 10) for k in range(nstmts))
+  return 'fun main()\n  i:int;\nbegin\n%s\nend\n' % body
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('--max', type=int, default=100_000,
+                   help='largest program size (up to 1000000)')
+  args = cli.parse_args()
+
+  lexer = LexerForPL0()
+  ParserForPL0.build_tables()
+
+  n = 1000
+  print(f'{"stmts":>9} {"parse s":>9} {"us/stmt":>9}')
+  while n <= args.max:
+    source = gen_source(n)
+    parser = ParserForPL0()
+    t0 = time.perf_counter()
+    ast = parser.parse(lexer.tokenize(source))
+    elapsed = time.perf_counter() - t0
+    assert len(ast.functions[0].statements) == n
+    print(f'{n:9} {elapsed:9.3f} {elapsed / n * 1e6:9.2f}')
+    del ast, parser
+    n *= 10
@@ -0,0 +1,56 @@
+# bench_parser_tables.py
+'''
+Tiempo de arranque de gen_ast en frío (sin tablas LALR en disco) y en
+caliente (tablas ya guardadas en ParserForPL0.tabfile).
+
+usage: python benchmarks/bench_parser_tables.py [file.pl0] [-n RUNS]
+'''
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from parser_pl0 import ParserForPL0
+
+SCRIPT = '''
+import sys, time
+t0 = time.perf_counter()
+from parser_pl0 import gen_ast
+t1 = time.perf_counter()
+gen_ast(open(sys.argv[1], encoding='utf-8').read())
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t1)
+'''
+
+
+def run_once(fname):
+  out = subprocess.run([sys.executable, '-c', SCRIPT, fname], cwd=ROOT,
+                       capture_output=True, text=True, check=True).stdout
+  imp, first = map(float, out.split())
+  return imp, first
+
+
+def measure(fname, runs, cold):
+  results = []
+  for _ in range(runs):
+    if cold and os.path.exists(ParserForPL0.tabfile):
+      os.remove(ParserForPL0.tabfile)
+    results.append(run_once(fname))
+  results.sort(key=sum)
+  return results[len(results) // 2]
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('input', nargs='?', default=os.path.join(ROOT, 'test.pl0'))
+  cli.add_argument('-n', '--runs', type=int, default=5)
+  args = cli.parse_args()
+
+  for label, cold in (('cold', True), ('warm', False)):
+    imp, first = measure(args.input, args.runs, cold)
+    print(f'{label:5} import {imp*1e3:8.2f} ms   first gen_ast {first*1e3:8.2f} ms'
+          f'   total {(imp+first)*1e3:8.2f} ms')
@@ -0,0 +1,70 @@
+# bench_pycompile.py
+'''
+Programas de benchmarks/programs compilados a objetos código de CPython
+(pycompile.py) contra la VM de registros con -O2: tiempo de traducción
+(sin caché y con caché) y tiempo de ejecución.
+
+usage: python benchmarks/bench_pycompile.py [--fib N] [--sort N] [--scan N] [--matrix N]
+'''
+import argparse
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pycompile
+from checker    import Checker
+from ircode     import generate_ir
+from optimizer  import optimize
+from parser_pl0 import gen_ast
+from vm         import Lowering, VM
+
+
+def program(name):
+  with open(os.path.join(ROOT, 'benchmarks', 'programs', name + '.pl0'), encoding='utf-8') as f:
+    return f.read()
+
+
+def run_vm(ast, stdin):
+  ir = generate_ir(ast)
+  optimize(ir, 2)
+  vm = VM(Lowering.lower(ir), io.StringIO(stdin), io.StringIO())
+  t0 = time.perf_counter()
+  vm.run()
+  return time.perf_counter() - t0, vm.stdout.getvalue().strip()
+
+
+def run_python(ast, source, stdin):
+  pycompile._cache.clear()
+  t0 = time.perf_counter()
+  prog = pycompile.compile_python(ast, source)
+  t1 = time.perf_counter()
+  pycompile.compile_python(ast, source)
+  t2 = time.perf_counter()
+  out = io.StringIO()
+  prog.load(io.StringIO(stdin), out).main()
+  t3 = time.perf_counter()
+  return t1 - t0, t2 - t1, t3 - t2, out.getvalue().strip()
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('--fib', type=int, default=22)
+  cli.add_argument('--sort', type=int, default=1000)
+  cli.add_argument('--scan', type=int, default=50_000)
+  cli.add_argument('--matrix', type=int, default=30)
+  args = cli.parse_args()
+
+  for name in ('fib', 'sort', 'scan', 'matrix'):
+    n = getattr(args, name)
+    source = program(name)
+    ast = gen_ast(source)
+    Checker.check(ast)
+    vm_time, vm_output = run_vm(ast, str(n))
+    translate, cached, run_time, output = run_python(ast, source, str(n))
+    same = 'ok' if output == vm_output else 'DIFFERENT OUTPUT'
+    print(f'{name:6} n={n:<6} translate {translate * 1e3:6.2f} ms (cached {cached * 1e6:5.1f} us)  '
+          f'vm {vm_time:6.3f} s  python {run_time:6.3f} s  x{vm_time / run_time:5.1f}  {same}  -> {output}')
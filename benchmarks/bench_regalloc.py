@@ -0,0 +1,67 @@
+# bench_regalloc.py
+'''
+Asignación de registros por barrido lineal (regalloc.py) sobre los
+programas de benchmarks/programs con -O2: registros virtuales del IR
+contra registros del marco de la VM, y desalojos en x86-64 y en
+máquinas con menos registros enteros (para ver cómo crecen con la
+presión).
+
+usage: python benchmarks/bench_regalloc.py [--regs 12 8 4] [--time]
+'''
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from checker    import Checker
+from ircode     import generate_ir
+from optimizer  import optimize
+from parser_pl0 import gen_ast
+from regalloc   import Machine, VM_MACHINE, X86_64, allocate
+
+
+def program(name):
+  with open(os.path.join(ROOT, 'benchmarks', 'programs', name + '.pl0'), encoding='utf-8') as f:
+    return f.read()
+
+
+def ircode(source):
+  ast = gen_ast(source)
+  Checker.check(ast)
+  ir = generate_ir(ast)
+  optimize(ir, 2)
+  return ir
+
+
+def machine(nregs):
+  # x86-64 con sólo nregs registros enteros (los primeros, que incluyen
+  # los que se preservan en las llamadas)
+  return Machine(f'x86-64/{nregs}', X86_64.int_regs[:nregs], X86_64.float_regs[:nregs], X86_64.callee_saved)
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('--regs', type=int, nargs='+', default=[12, 8, 4])
+  cli.add_argument('--time', action='store_true', help='time the allocation of each function')
+  args = cli.parse_args()
+
+  machines = [machine(n) for n in args.regs]
+  print(f'{"function":18} {"vregs":>5} {"vm":>4}  ' + '  '.join(f'{m.name:>14}' for m in machines))
+  for name in ('fib', 'sort', 'scan', 'matrix'):
+    ir = ircode(program(name))
+    for func in ir.functions:
+      vm = allocate(func, VM_MACHINE)
+      cols = []
+      for m in machines:
+        stats = allocate(func, m).stats
+        cols.append(f'{stats.spilled:3} sp {stats.loads:3}/{stats.stores:<3}')
+      line = f'{name + "." + func.qualname:18} {func.nregs:5} {vm.nphys:4}  ' + '  '.join(f'{c:>14}' for c in cols)
+      if args.time:
+        t0 = time.perf_counter()
+        for _ in range(100):
+          allocate(func, X86_64)
+        line += f'  {(time.perf_counter() - t0) * 1e4:7.1f} us'
+      print(line)
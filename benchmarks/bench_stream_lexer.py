@@ -0,0 +1,62 @@
+# bench_stream_lexer.py
+'''
+Memoria pico del análisis léxico por trozos (fastlex.tokenize_file)
+frente a leer el archivo completo, para fuentes de tamaño creciente.
+
+usage: python benchmarks/bench_stream_lexer.py [--max-mb N]
+'''
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fastlex
+
+
+def write_source(fname, size):
+  with open(os.path.join(ROOT, 'Grammar', 'program.pl0'), encoding='utf-8') as f:
+    unit = f.read() + '\n'
+  with open(fname, 'w', encoding='utf-8') as f:
+    for _ in range(size // len(unit) + 1):
+      f.write(unit)
+
+
+def measure(func):
+  tracemalloc.start()
+  t0 = time.perf_counter()
+  ntokens = func()
+  elapsed = time.perf_counter() - t0
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  return ntokens, elapsed, peak
+
+
+def whole(fname):
+  with open(fname, encoding='utf-8') as f:
+    return sum(1 for _ in fastlex.tokenize(f.read()).tokens())
+
+
+def streamed(fname):
+  return sum(1 for _ in fastlex.tokenize_file(fname))
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('--max-mb', type=int, default=16)
+  args = cli.parse_args()
+
+  size = 1 << 20
+  print(f'{"MB":>5} {"mode":>8} {"tokens":>10} {"s":>7} {"peak MB":>9}')
+  with tempfile.TemporaryDirectory() as tmp:
+    fname = os.path.join(tmp, 'big.pl0')
+    while size <= args.max_mb << 20:
+      write_source(fname, size)
+      for label, func in (('whole', whole), ('stream', streamed)):
+        ntokens, elapsed, peak = measure(lambda: func(fname))
+        print(f'{size >> 20:5} {label:>8} {ntokens:10} {elapsed:7.2f} {peak / 2**20:9.2f}')
+      size *= 4
@@ -0,0 +1,93 @@
+# bench_visitor.py
+'''
+Despacho de Visitor con tablas por clase (model_ast.VisitorMeta) frente
+al despacho de multimethod (multimeta), sobre los mismos métodos visit
+de Checker.
+
+  micro   llamadas a visit sobre nodos sueltos
+  macro   Checker.check sobre un programa generado con N funciones
+
+usage: python benchmarks/bench_visitor.py [-n FUNCS]
+'''
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multimethod import multimethod
+
+from checker    import Checker, Symtab
+from model_ast  import *
+from parser_pl0 import gen_ast
+
+
+def multimethod_checker():
+  # Mismos métodos visit de Checker, despachados con multimethod
+  visit = None
+  for func in Checker._visit_overloads.values():
+    visit = multimethod(func) if visit is None else visit.register(func)
+  return type('MultimethodChecker', (Checker,), {}), visit
+
+
+def gen_program(nfuncs):
+  funcs = []
+  for k in range(nfuncs):
+    funcs.append(f'''fun f{k}(a:int, b:float)
+  i:int;
+  s:float;
+begin
+  i := 0;
+  s := b;
+  while i < a do
+  begin
+    s := s + float(i) * 2.0 - b / 3.0;
+    i := i + 1
+  end;
+  if s > b then
+    i := int(s)
+  else
+    i := -i;
+  return i * 2 + a
+end
+''')
+  funcs.append('fun main()\n  x:int;\nbegin\n  x := f0(3, 1.5)\nend\n')
+  return '\n'.join(funcs)
+
+
+def timeit(func, repeat=5):
+  best = float('inf')
+  for _ in range(repeat):
+    t0 = time.perf_counter()
+    func()
+    best = min(best, time.perf_counter() - t0)
+  return best
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('-n', '--funcs', type=int, default=500)
+  args = cli.parse_args()
+
+  MultimethodChecker, visit = multimethod_checker()
+  MultimethodChecker.visit = visit
+
+  # micro: un Integer, un TypeCast (subclase de Unary) y un Vector (subclase de Ident)
+  env = Symtab()
+  env.add('v', VectorVar('v', DataType('int'), Integer(8, DataType('int'))))
+  nodes = [Integer(1, DataType('int')),
+           TypeCast('float', Integer(1, DataType('int'))),
+           Binary('+', Integer(1, DataType('int')), Integer(2, DataType('int')))]
+  calls = 100_000
+  for label, cls in (('multimethod', MultimethodChecker), ('table', Checker)):
+    checker = cls(None)
+    elapsed = timeit(lambda: [n.accept(checker, env) for _ in range(calls) for n in nodes])
+    print(f'micro {label:12} {elapsed / (calls * len(nodes)) * 1e9:8.1f} ns per top-level accept')
+
+  # macro: Checker.check completo
+  source = gen_program(args.funcs)
+  for label, cls in (('multimethod', MultimethodChecker), ('table', Checker)):
+    asts = [gen_ast(source) for _ in range(3)]
+    elapsed = timeit(lambda: cls.check(asts.pop()), repeat=3)
+    print(f'macro {label:12} {elapsed * 1e3:8.1f} ms  ({args.funcs} functions)')
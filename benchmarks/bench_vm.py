@@ -0,0 +1,50 @@
+# bench_vm.py
+'''
+Ejecución de los programas de benchmarks/programs en la VM de registros
+(vm.py): tiempo de compilación a bytecode, tiempo de ejecución,
+instrucciones ejecutadas y nanosegundos por instrucción.
+
+usage: python benchmarks/bench_vm.py [--fib N] [--sort N] [--scan N]
+'''
+import argparse
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from checker    import Checker
+from parser_pl0 import gen_ast
+from vm         import Compiler, VM
+
+
+def program(name):
+  with open(os.path.join(ROOT, 'benchmarks', 'programs', name + '.pl0'), encoding='utf-8') as f:
+    return f.read()
+
+
+def run(name, stdin):
+  ast = gen_ast(program(name))
+  Checker.check(ast)
+  t0 = time.perf_counter()
+  bytecode = Compiler.compile(ast)
+  t1 = time.perf_counter()
+  vm = VM(bytecode, io.StringIO(stdin), io.StringIO())
+  vm.run()
+  t2 = time.perf_counter()
+  return t1 - t0, t2 - t1, vm.steps, vm.stdout.getvalue().strip()
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser()
+  cli.add_argument('--fib', type=int, default=22)
+  cli.add_argument('--sort', type=int, default=1000)
+  cli.add_argument('--scan', type=int, default=50_000)
+  args = cli.parse_args()
+
+  for name, n in (('fib', args.fib), ('sort', args.sort), ('scan', args.scan)):
+    compile_time, run_time, steps, output = run(name, str(n))
+    print(f'{name:5} n={n:<7} compile {compile_time * 1e3:6.2f} ms  run {run_time:6.3f} s  '
+          f'{steps:10} instr  {run_time / steps * 1e9:6.1f} ns/instr  -> {output}')
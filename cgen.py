@@ -0,0 +1,394 @@
+# cgen.py
+'''
+Generación de código nativo a través de C
+=========================================
+CGenerator traduce el código intermedio (ircode.IRProgram, optimizado
+o no) a un programa C portable que luego se compila con el compilador
+del sistema (cc, o el de la variable de entorno CC) para obtener el
+ensamblador (-S) o un ejecutable (-o).
+
+Cada IRFunction se vuelve una función C:
+
+  - los registros se asignan a los de x86-64 por barrido lineal
+    (regalloc.py) y cada registro de la máquina o celda de desalojo es
+    una variable local (int64_t, double, o un puntero a
+    pl0_veci/pl0_vecf para los vectores); todas empiezan en cero. El
+    compilador de C hace la asignación final, pero las variables que
+    recibe son pocas y se reutilizan, y la asignación informa la presión
+    de registros y los desalojos de cada función
+  - cada bloque básico es una etiqueta y los saltos son goto
+  - la aritmética entera da la vuelta en 64 bits (como en la mayoría de
+    las máquinas) en lugar de ser comportamiento indefinido
+
+Funciones anidadas: las variables de una función que usan sus funciones
+anidadas (IRFunction.captured) viven en un registro de activación
+(struct pl0_frame_<f>) en lugar de una variable local. Las funciones
+anidadas reciben como primer parámetro un puntero (enlace estático) al
+registro de activación de la función que las contiene, y éste guarda a
+su vez el enlace de su propia función contenedora en el campo up.
+UPLOAD/UPSTORE siguen el enlace tantos niveles como indica la
+instrucción.
+
+El runtime (read/write/print, vectores con revisión de límites y
+división con revisión de cero) va al principio del archivo. Los errores
+en tiempo de ejecución se informan en stderr y terminan el programa con
+código 1.
+'''
+import os
+import shutil
+import subprocess
+import tempfile
+
+from ircode   import Op, is_const
+from regalloc import AllocReport, X86_64, allocate
+
+
+class NativeError(Exception):
+  '''
+  No se pudo compilar el código C generado.
+  '''
+  pass
+
+
+RUNTIME = r'''#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+
+typedef struct { int64_t n; int64_t *data; } pl0_veci;
+typedef struct { int64_t n; double *data; } pl0_vecf;
+
+static void pl0_error(const char *message)
+{
+  fflush(stdout);
+  fprintf(stderr, "Runtime error: %s\n", message);
+  exit(1);
+}
+
+#define PL0_ADD(a, b) ((int64_t)((uint64_t)(a) + (uint64_t)(b)))
+#define PL0_SUB(a, b) ((int64_t)((uint64_t)(a) - (uint64_t)(b)))
+#define PL0_MUL(a, b) ((int64_t)((uint64_t)(a) * (uint64_t)(b)))
+#define PL0_NEG(a)    ((int64_t)(0 - (uint64_t)(a)))
+
+static inline int64_t pl0_divi(int64_t a, int64_t b)
+{
+  if (b == 0) pl0_error("integer division by zero");
+  if (b == -1) return PL0_NEG(a);
+  return a / b;
+}
+
+static inline double pl0_divf(double a, double b)
+{
+  if (b == 0.0) pl0_error("float division by zero");
+  return a / b;
+}
+
+static inline int64_t pl0_ftoi(double x)
+{
+  if (!(x > -9223372036854775808.0 && x < 9223372036854775808.0))
+    pl0_error("float value out of the int range");
+  return (int64_t)x;
+}
+
+#define PL0_NEWVEC(T, V, size) \
+  do { \
+    int64_t n_ = (size); \
+    if (n_ < 0) pl0_error("negative vector size"); \
+    V = malloc(sizeof(T)); \
+    if (V) V->data = calloc(n_ ? n_ : 1, sizeof(*V->data)); \
+    if (!V || !V->data) pl0_error("out of memory"); \
+    V->n = n_; \
+  } while (0)
+
+#define PL0_FREEVEC(V) do { if (V) { free(V->data); free(V); } } while (0)
+
+#define PL0_AT(V, i) \
+  (*((uint64_t)(i) < (uint64_t)(V)->n ? &(V)->data[i] : (pl0_error("vector index out of range"), (V)->data)))
+
+static int64_t pl0_readi(void)
+{
+  long long x;
+  if (scanf("%lld", &x) != 1) pl0_error("read: expected an int");
+  return x;
+}
+
+static double pl0_readf(void)
+{
+  double x;
+  if (scanf("%lf", &x) != 1) pl0_error("read: expected a float");
+  return x;
+}
+
+static void pl0_writei(int64_t x) { printf("%lld", (long long)x); }
+static void pl0_writef(double x) { printf("%.15g", x); }
+'''
+
+CTYPES = {
+  'int': 'int64_t', 'float': 'double', 'int[]': 'pl0_veci *', 'float[]': 'pl0_vecf *',
+}
+
+PREFIXES = { 'int': 'x', 'float': 'd', 'int[]': 'vi', 'float[]': 'vf' }
+
+BINARY = {
+  Op.ADDI: 'PL0_ADD({0}, {1})', Op.SUBI: 'PL0_SUB({0}, {1})',
+  Op.MULI: 'PL0_MUL({0}, {1})', Op.DIVI: 'pl0_divi({0}, {1})',
+  Op.ADDF: '{0} + {1}', Op.SUBF: '{0} - {1}', Op.MULF: '{0} * {1}',
+  Op.DIVF: 'pl0_divf({0}, {1})',
+  Op.LT: '{0} < {1}', Op.LE: '{0} <= {1}', Op.GT: '{0} > {1}',
+  Op.GE: '{0} >= {1}', Op.EQ: '{0} == {1}', Op.NE: '{0} != {1}',
+}
+
+UNARY = {
+  Op.MOV: '{0}', Op.NEGI: 'PL0_NEG({0})', Op.NEGF: '-{0}',
+  Op.ITOF: '(double){0}', Op.FTOI: 'pl0_ftoi({0})',
+}
+
+
+def c_string(text):
+  # Literal de C con los bytes UTF-8 de text
+  out = []
+  for byte in text.encode('utf-8'):
+    ch = chr(byte)
+    if ch in '"\\?':
+      out.append('\\' + ch)
+    elif 32 <= byte < 127:
+      out.append(ch)
+    else:
+      out.append(f'\\{byte:03o}')
+  return '"' + ''.join(out) + '"'
+
+
+def c_float(value):
+  if value != value:
+    return '(0.0 / 0.0)'
+  if value in (float('inf'), float('-inf')):
+    return '(1.0 / 0.0)' if value > 0 else '(-1.0 / 0.0)'
+  text = repr(value)
+  if not any(ch in text for ch in '.en'):
+    text += '.0'
+  return f'({text})' if text.startswith('-') else text
+
+
+def c_int(value):
+  if value == -(1 << 63):
+    return 'INT64_MIN'
+  return f'INT64_C({value})' if value >= 0 else f'(-INT64_C({-value}))'
+
+
+class CGenerator:
+  '''
+  Traduce un IRProgram a C. Con debug=True cada instrucción C lleva
+  como comentario la instrucción del IR de la que viene.
+  '''
+  def __init__(self, program, debug=False):
+    self.program = program
+    self.debug = debug
+    self.report = AllocReport(X86_64)
+    self.children = { func.index: [] for func in program.functions }
+    for func in program.functions:
+      if func.parent is not None:
+        self.children[func.parent.index].append(func)
+
+  @classmethod
+  def generate(cls, program, debug=False):
+    return cls(program, debug).source()
+
+  def source(self):
+    lines = [RUNTIME]
+    functions = self.program.functions
+    framed = [f for f in functions if self.has_frame(f)]
+    for func in framed:
+      lines.append(f'struct {self.frame(func)};')
+    for func in framed:
+      lines.append(f'struct {self.frame(func)} {{')
+      if func.parent is not None:
+        lines.append(f'  struct {self.frame(func.parent)} *up;')
+      for reg in sorted(func.captured):
+        lines.append(f'  {self.decl(func.regtypes[reg], f"r{reg}")};')
+      if func.parent is None and not func.captured:
+        lines.append('  char unused;')
+      lines.append('};')
+    lines.append('')
+    for func in functions:
+      lines.append(self.signature(func) + ';')
+    for func in functions:
+      lines.append('')
+      lines.extend(self.function(func))
+    main = functions[self.program.main]
+    lines.append('')
+    lines.append('int main(void)')
+    lines.append('{')
+    lines.append(f'  {self.cname(main)}({", ".join("0" for _ in range(main.nparams))});')
+    lines.append('  fflush(stdout);')
+    lines.append('  return 0;')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+  # Nombres
+
+  def has_frame(self, func):
+    return bool(func.captured or self.children[func.index])
+
+  def cname(self, func):
+    return 'pl0_' + func.qualname.replace('.', '__')
+
+  def frame(self, func):
+    return 'pl0_frame_' + func.qualname.replace('.', '__')
+
+  def decl(self, dtype, name):
+    ctype = CTYPES[dtype]
+    sep = '' if ctype.endswith('*') else ' '
+    return f'{ctype}{sep}{name}'
+
+  def signature(self, func):
+    params = [f'{CTYPES[func.ptypes[k]]} a{k}' for k in range(func.nparams)]
+    if func.parent is not None:
+      params.insert(0, f'struct {self.frame(func.parent)} *up')
+    return f'static {CTYPES[func.rtype]} {self.cname(func)}({", ".join(params) or "void"})'
+
+  def link(self, levels):
+    # Registro de activación de la función levels niveles afuera
+    if levels == 0:
+      return '(&fr)'
+    return 'up' + '->up' * (levels - 1)
+
+  # Funciones
+
+  def function(self, func):
+    self.func = func
+    self.args = []
+    lines = [self.signature(func), '{']
+    if self.has_frame(func):
+      lines.append(f'  struct {self.frame(func)} fr = {{0}};')
+      if func.parent is not None:
+        lines.append('  fr.up = up;')
+    # Los vectores de la función se liberan al retornar, así que cada uno
+    # conserva su propia variable
+    self.vectors = [i.a for i in func.instructions() if i.op is Op.NEWVEC]
+    self.alloc = allocate(func, X86_64, exclude=self.vectors)
+    self.report.add(self.alloc.stats)
+    names = { self.reg(reg): func.regtypes[reg] for reg in self.alloc.intervals }
+    names.update((self.reg(reg), func.regtypes[reg]) for reg in self.vectors if reg not in func.captured)
+    for name, dtype in names.items():
+      lines.append(f'  {self.decl(dtype, name)} = {"NULL" if dtype.endswith("[]") else "0"};')
+    if self.debug:
+      for reg in sorted(self.alloc.intervals):
+        lines.append(f'  /* r{reg} -> {self.alloc.name(reg)} */')
+    for k in range(func.nparams):
+      lines.append(f'  {self.reg(k)} = a{k};')
+    for n, block in enumerate(func.blocks):
+      following = func.blocks[n + 1].label if n + 1 < len(func.blocks) else None
+      lines.append(f' B{block.label}:;')
+      for instr in block.instrs:
+        if self.debug:
+          lines.append(f'  /* {func.format_instr(instr, self.program)} */')
+        lines.extend('  ' + stmt for stmt in self.instr(instr, following))
+    lines.append('}')
+    return lines
+
+  def reg(self, reg):
+    # Variable C de un registro: la de su registro de la máquina o su
+    # celda de desalojo, con un prefijo según el tipo
+    if reg in self.func.captured:
+      return f'fr.r{reg}'
+    iv = self.alloc.intervals.get(reg)
+    if iv is None:
+      return f'r{reg}'
+    prefix = PREFIXES[self.func.regtypes[reg]]
+    return f's{prefix}{iv.slot}' if iv.slot is not None else f'{prefix}{iv.phys}'
+
+  def value(self, operand):
+    if not is_const(operand):
+      return self.reg(operand)
+    value = self.func.value(operand)
+    return c_float(value) if isinstance(value, float) else c_int(value)
+
+  def instr(self, instr, following):
+    op, a, b, c = instr.op, instr.a, instr.b, instr.c
+    if op in UNARY:
+      return [f'{self.reg(a)} = {UNARY[op].format(self.value(b))};']
+    if op in BINARY:
+      return [f'{self.reg(a)} = {BINARY[op].format(self.value(b), self.value(c))};']
+    if op is Op.LOADV:
+      return [f'{self.reg(a)} = PL0_AT({self.reg(b)}, {self.value(c)});']
+    if op is Op.STOREV:
+      return [f'PL0_AT({self.reg(a)}, {self.value(b)}) = {self.value(c)};']
+    if op is Op.UPLOAD:
+      return [f'{self.reg(a)} = {self.link(b)}->r{c};']
+    if op is Op.UPSTORE:
+      return [f'{self.link(a)}->r{b} = {self.value(c)};']
+    if op is Op.ARG:
+      del self.args[a:]
+      self.args.append(self.value(b))
+      return []
+    if op is Op.CALL:
+      callee = self.program.functions[b]
+      args = self.args[:c]
+      if callee.parent is not None:
+        args.insert(0, self.link(self.func.depth - callee.parent.depth))
+      self.args = []
+      return [f'{self.reg(a)} = {self.cname(callee)}({", ".join(args)});']
+    if op is Op.NEWVEC:
+      vtype = 'pl0_vecf' if c else 'pl0_veci'
+      return [f'PL0_NEWVEC({vtype}, {self.reg(a)}, {self.value(b)});']
+    if op is Op.READI:
+      return [f'{self.reg(a)} = pl0_readi();']
+    if op is Op.READF:
+      return [f'{self.reg(a)} = pl0_readf();']
+    if op is Op.WRITEI:
+      return [f'pl0_writei({self.value(a)});']
+    if op is Op.WRITEF:
+      return [f'pl0_writef({self.value(a)});']
+    if op is Op.PRINT:
+      return [f'fputs({c_string(self.program.strings[a])}, stdout);']
+    if op is Op.JUMP:
+      return [] if a == following else [f'goto B{a};']
+    if op is Op.BR:
+      if c == following:
+        return [f'if ({self.value(a)}) goto B{b};']
+      if b == following:
+        return [f'if (!{self.value(a)}) goto B{c};']
+      return [f'if ({self.value(a)}) goto B{b};', f'goto B{c};']
+    if op is Op.RET:
+      if not self.vectors:
+        return [f'return {self.value(a)};']
+      # El valor se guarda antes de liberar los vectores de la función
+      rtype = CTYPES[self.func.rtype]
+      stmts = [f'{{ {rtype} ret_ = {self.value(a)};']
+      stmts.extend(f'  PL0_FREEVEC({self.reg(v)});' for v in self.vectors)
+      stmts.append('  return ret_; }')
+      return stmts
+    raise NativeError(f'Unsupported instruction {op.name}')
+
+
+def generate_c(program, debug=False):
+  '''
+  Código C de un IRProgram.
+  '''
+  return CGenerator.generate(program, debug)
+
+
+def compiler():
+  cc = os.environ.get('CC') or shutil.which('cc') or shutil.which('gcc') or shutil.which('clang')
+  if not cc:
+    raise NativeError('No C compiler found (set the CC environment variable)')
+  return cc
+
+
+def build(csource, output, asm=False, debug=False, flags=('-O2',)):
+  '''
+  Compila csource con el compilador de C del sistema: ensamblador en
+  output si asm, si no un ejecutable.
+  '''
+  with tempfile.TemporaryDirectory(prefix='pl0-') as tmp:
+    cfile = os.path.join(tmp, 'program.c')
+    with open(cfile, 'w', encoding='utf-8') as f:
+      f.write(csource)
+    cmd = [compiler(), *flags, '-o', output, cfile]
+    if asm:
+      cmd.insert(1, '-S')
+    if debug:
+      cmd.insert(1, '-g')
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+      raise NativeError(f'{" ".join(cmd[:-1])} failed:\n{proc.stderr}')
+  return output
@@ -1,6 +1,8 @@
 #checker.py
 # from model_ast import 
 from model_ast import *
+from typesys   import (INT, FLOAT, BOOL, STRING, check_binary_op, check_unary_op,
+					   lookup_type, vector, function)
 
 # ---------------------------------------------------------------------
 #  Tabla de Simbolos
@@ -68,30 +70,46 @@ class Symtab:
 	def return_type(self, type):
 		if self.parent:
 			node = self.parent.get(self.name)
-			node.dtype = DataType(type)
+			node.dtype = DataType(type.name)
+
+
+def var_type(node):
+	# Tipo (de typesys) de una variable, parámetro o vector declarado
+	dtype = lookup_type(node.type.type)
+	return vector(dtype) if isinstance(node, VectorVar) else dtype
 
 
 class Checker(Visitor):
+	'''
+	Revisa los tipos del programa. Las expresiones devuelven objetos
+	Type de typesys (internados: se comparan por identidad) y los
+	operadores se buscan con check_binary_op/check_unary_op.
+	'''
 
 	def __init__(self, ast):
 		self.ast = ast
+		self.loops = 0
+		self.signatures = {}
 
 	def visit(self, n: Literal, env: Symtab):
-		return n.dtype.type
+		return INT if isinstance(n, Integer) else FLOAT
 
 	def visit(self, n: Ident, env: Symtab):
 		node = env.get(n.id)
-		if node == None:
+		if not isinstance(node, Var):
 			raise NameError("ID not found")
-		return node.type.type
+		return var_type(node)
 
 	def visit(self, n: Vector, env: Symtab):
 		node = env.get(n.id)
-		if node == None:
+		if not isinstance(node, Var):
 			raise NameError("ID not found")
+		if not isinstance(node, VectorVar):
+			raise Exception("Not a vector", n.id)
 		index = n.index.accept(self, env)
-		if index == 'int' and index >= 0 and index < node.size:
-			return node.type.type
+		if index is INT:
+			# Los límites del índice se comprueban al ejecutar
+			return lookup_type(node.type.type)
 		else:
 			raise Exception("Invalid index")
 
@@ -99,9 +117,9 @@ class Checker(Visitor):
 		# Visitar la expresion asociada
 		# Devolver datatype asociado al nodo
 		expr_data = n.expr.accept(self, env)
-		if expr_data != None:
+		if expr_data is INT or expr_data is FLOAT:
 			n.dtype = DataType(n.op)
-			return n.op
+			return lookup_type(n.op)
 		raise Exception("Expression can not be processed")
 
 	def visit(self, n: Assign, env: Symtab):
@@ -110,7 +128,7 @@ class Checker(Visitor):
 		# Comparar ambos tipo de datatype
 		ident = n.loct.accept(self, env)
 		expr = n.expr.accept(self, env)
-		if ident != expr:
+		if ident is not expr:
 			raise Exception("Invalid Datatypes")
 		return ident
 
@@ -121,54 +139,60 @@ class Checker(Visitor):
 		# Comparar cada uno de los tipos de los argumentos con los parametros
 		# Retornar el datatype de la funcion
 		func = env.get(n.id)
-		if func == None:
+		if not isinstance(func, Function):
 			raise Exception("Function not found")
-		if len(func.parameters) != len(n.expr):
+		params = self.signatures[id(func)].params
+		if len(params) != len(n.expr):
 			raise Exception("Invalid number of arguments")
-		for i in range(len(func.parameters)):
-			func_param = func.parameters[i].type.type
-			expr_param = n.expr[i].accept(self, env)
-			if func_param != expr_param:
-				raise Exception("Invalid Datatypes", func_param, expr_param)
-		return func.dtype.type
+		for func_param, arg in zip(params, n.expr):
+			expr_param = arg.accept(self, env)
+			if func_param is not expr_param:
+				raise Exception("Invalid Datatypes", func_param.name, expr_param.name)
+		# Una funcion sin return (o cuyo tipo aun no se conoce, como en
+		# una llamada recursiva) devuelve int
+		return lookup_type(func.dtype.type) or INT
 
 	def visit(self, n: Relation, env: Symtab):
 		# Visitar el hijo izquierdo (devuelve datatype)
 		# Visitar el hijo derecho (devuelve datatype)
-		# Comparar ambos tipo de datatype
+		# Buscar el resultado en la matriz de operadores: las relaciones
+		# dan bool y and/or sólo aceptan bool
 		exprl = n.left.accept(self, env)
 		exprr = n.right.accept(self, env)
-		if exprl != None and exprr != None:
-			if exprl == exprr:
-				n.dtype = DataType(exprl)
-				return n.dtype.type
-		raise Exception("Invalid Datatypes")
+		result = check_binary_op(n.rel, exprl, exprr)
+		if result is None:
+			raise Exception("Invalid Datatypes")
+		n.dtype = DataType(result.name)
+		return result
 	
 	def visit(self, n: Not, env: Symtab):
 		reld = n.rel.accept(self, env)
-		if reld != None:
-			raise NameError("ID not found")
-		return reld.type
+		result = check_unary_op('not', reld)
+		if result is None:
+			raise Exception("Invalid Datatype in not")
+		return result
 	
 	def visit(self, n: Binary, env: Symtab):
 		# Visitar el hijo izquierdo (devuelve datatype)
 		# Visitar el hijo derecho (devuelve datatype)
-		# Comparar ambos tipo de datatype
+		# Buscar el resultado en la matriz de operadores
 		left = n.left.accept(self, env)
 		right = n.right.accept(self, env)
-		if left != right or left == None or right == None:
+		result = check_binary_op(n.op, left, right)
+		if result is None:
 			raise Exception("Invalid Datatypes in Binary")
-		n.dtype = DataType(left)
-		return n.dtype.type
+		n.dtype = DataType(result.name)
+		return result
 
 	def visit(self, n: Unary, env: Symtab):
 		# Visitar la expression asociada (devuelve datatype)
-		# Comparar datatype
+		# Buscar el resultado en la matriz de operadores
 		expr_type = n.expr.accept(self, env)
-		if expr_type == None:
+		result = check_unary_op(n.op, expr_type)
+		if result is None:
 			raise Exception("Error in type")
-		n.dtype = DataType(expr_type)
-		return n.dtype.type
+		n.dtype = DataType(result.name)
+		return result
 
 	# def visit(self, n: Parameter, env: Symtab):
 		# Agregar el nombre del parametro a Symtab
@@ -176,10 +200,10 @@ class Checker(Visitor):
 	def visit(self, n: OneStmt, env: Symtab):
 		if n.key == 'print':
 			if isinstance(n.value, str):
-				return 'string'
+				return STRING
 		info_type = n.value.accept(self, env)
-		if info_type == None:
-			raise NameError("Variable not found")
+		if info_type is not INT and info_type is not FLOAT:
+			raise Exception(f"Invalid Datatype in {n.key}")
 		if n.key == 'return':
 			# Actualizar el datatype de la funcion
 			env.return_type(info_type)
@@ -190,12 +214,13 @@ class Checker(Visitor):
 		# Visitar la condicion del While (Comprobar tipo bool)
 		# Visitar las Stmts
 		bool_type = n.left.accept(self, env)
-		if bool_type == None:
+		if bool_type is not BOOL:
 			raise Exception("Invalid Datatype in condition")
+		if n.keyLeft == 'while':
+			self.loops += 1
 		expr_type = n.right.accept(self, env)
-		if expr_type == 'break' or expr_type == 'skip' :
-				if n.key != 'while':
-					raise Exception("Invalid Break or Skip")
+		if n.keyLeft == 'while':
+			self.loops -= 1
 		if expr_type == None:
 			raise Exception("Invalid Datatype in statements")
 		return bool_type
@@ -204,7 +229,7 @@ class Checker(Visitor):
 		# Visitar la condicion del IfStmt (Comprobar tipo bool)
 		# Visitar las Stmts del then y else
 		bool_type = n.left.accept(self, env)
-		if bool_type == None:
+		if bool_type is not BOOL:
 			raise Exception("Invalid Datatype in condition")
 		expr1_type = n.middle.accept(self, env)
 		expr2_type = n.right.accept(self, env)
@@ -213,6 +238,8 @@ class Checker(Visitor):
 		return bool_type
 
 	def visit(self, n: Single, env: Symtab):
+		if n.key == 'break' and self.loops == 0:
+			raise Exception("Invalid Break or Skip")
 		return n.key
 	
 	def visit(self, n: Grouping, env: Symtab):
@@ -231,14 +258,19 @@ class Checker(Visitor):
 		# Crear un nuevo contexto (Symtab)
 		# Visitar ParamList, VarList, StmtList
 		# Determinar el datatype de la funcion (revisando instrucciones return)
+		# La firma (tipos internados) se guarda antes del cuerpo para las
+		# llamadas recursivas y se completa con el tipo de retorno
 		env.add(n.id, n)
 		new_env = Symtab(n.id, env)
+		params = [var_type(param) for param in n.parameters]
+		self.signatures[id(n)] = function(params)
 		for param in n.parameters:
 			param.accept(self, new_env)
 		for var in n.variables:
 			var.accept(self, new_env)
 		for stmt in n.statements:
 			stmt.accept(self, new_env)
+		self.signatures[id(n)] = function(params, lookup_type(n.dtype.type) or INT)
 		return n.dtype.type
 
 	def visit(self, n: Var, env: Symtab):
@@ -258,9 +290,11 @@ class Checker(Visitor):
 		return main.dtype.type
 
 	@classmethod
-	def check(cls, ast):
+	def check(cls, ast, env=None):
+		# env: tabla del programa (para examinarla después de revisar)
 		vis = cls(ast)
-		env = Symtab()
+		if env is None:
+			env = Symtab()
 		return ast.accept(vis, env)
 	
 if __name__ == '__main__':
@@ -0,0 +1,529 @@
+# closures.py
+'''
+Ejecución por compilación a closures
+====================================
+ClosureCompiler recorre una sola vez el AST ya revisado y convierte
+cada nodo en una función de Python (closure) que recibe el marco de la
+función en ejecución. Todo lo que se puede decidir antes de ejecutar
+queda resuelto en la closure:
+
+  - cada variable es una posición del marco (una lista), la dirección
+    (depth, slot) que le dio resolver.py; las de las funciones que la
+    contienen se alcanzan siguiendo el enlace estático (marco[0]) tantos
+    niveles como haga falta
+  - cada operador se elige según su forma: variable local y constante,
+    dos variables locales, expresión y constante o el caso general
+  - las conversiones int <-> float y la división entera se deciden por
+    el tipo de los operandos
+  - las llamadas apuntan directamente a la función destino
+
+Al ejecutar no hay despacho por tipo de nodo, búsqueda de nombres en
+diccionarios ni visit: sólo llamadas entre closures.
+
+Marco de una función: [enlace estático, valor de return, parámetros...,
+variables locales...]. Las sentencias devuelven None para seguir,
+BREAK para salir del while o RETURN (con el valor en marco[1]).
+'''
+import sys
+from array import array
+
+from model_ast import *
+from pycompile import call_pl0
+from resolver  import Frame, resolve
+from vm        import VMError, read_tokens, read_value, float_to_int, int_to_float
+
+
+class ClosureError(Exception):
+  '''
+  El programa usa algo que no se puede compilar a closures.
+  '''
+  pass
+
+
+BREAK  = object()
+RETURN = object()
+
+LINK, RESULT, FIRST = 0, 1, 2
+
+
+def divi(x, y):
+  q = abs(x) // abs(y)
+  return q if (x < 0) == (y < 0) else -q
+
+
+# Fábricas por operador: (general, local y constante, dos locales,
+# expresión y constante)
+OPERATORS = {
+  '+':  (lambda l, r: lambda f: l(f) + r(f),  lambda k, c: lambda f: f[k] + c,
+         lambda k, j: lambda f: f[k] + f[j],  lambda l, c: lambda f: l(f) + c),
+  '-':  (lambda l, r: lambda f: l(f) - r(f),  lambda k, c: lambda f: f[k] - c,
+         lambda k, j: lambda f: f[k] - f[j],  lambda l, c: lambda f: l(f) - c),
+  '*':  (lambda l, r: lambda f: l(f) * r(f),  lambda k, c: lambda f: f[k] * c,
+         lambda k, j: lambda f: f[k] * f[j],  lambda l, c: lambda f: l(f) * c),
+  '/':  (lambda l, r: lambda f: l(f) / r(f),  lambda k, c: lambda f: f[k] / c,
+         lambda k, j: lambda f: f[k] / f[j],  lambda l, c: lambda f: l(f) / c),
+  '//': (lambda l, r: lambda f: divi(l(f), r(f)), lambda k, c: lambda f: divi(f[k], c),
+         lambda k, j: lambda f: divi(f[k], f[j]), lambda l, c: lambda f: divi(l(f), c)),
+  '<':  (lambda l, r: lambda f: l(f) < r(f),  lambda k, c: lambda f: f[k] < c,
+         lambda k, j: lambda f: f[k] < f[j],  lambda l, c: lambda f: l(f) < c),
+  '<=': (lambda l, r: lambda f: l(f) <= r(f), lambda k, c: lambda f: f[k] <= c,
+         lambda k, j: lambda f: f[k] <= f[j], lambda l, c: lambda f: l(f) <= c),
+  '>':  (lambda l, r: lambda f: l(f) > r(f),  lambda k, c: lambda f: f[k] > c,
+         lambda k, j: lambda f: f[k] > f[j],  lambda l, c: lambda f: l(f) > c),
+  '>=': (lambda l, r: lambda f: l(f) >= r(f), lambda k, c: lambda f: f[k] >= c,
+         lambda k, j: lambda f: f[k] >= f[j], lambda l, c: lambda f: l(f) >= c),
+  '==': (lambda l, r: lambda f: l(f) == r(f), lambda k, c: lambda f: f[k] == c,
+         lambda k, j: lambda f: f[k] == f[j], lambda l, c: lambda f: l(f) == c),
+  '!=': (lambda l, r: lambda f: l(f) != r(f), lambda k, c: lambda f: f[k] != c,
+         lambda k, j: lambda f: f[k] != f[j], lambda l, c: lambda f: l(f) != c),
+}
+
+
+@dataclass(slots=True)
+class Code:
+  '''
+  Closure de una expresión con lo que se sabe de ella al compilar:
+  tipo, valor si es constante y posición si es una variable local.
+  '''
+  fn    : object
+  type  : str
+  const : object = None
+  slot  : int = None
+
+
+@dataclass(slots=True)
+class Slot:
+  type  : str
+  depth : int               # profundidad de la función que la declara
+  index : int               # posición en el marco
+
+
+class FunctionInfo:
+  '''
+  Función compilada: enter(enlace, argumentos) crea el marco, ejecuta
+  el cuerpo y devuelve el valor de retorno.
+  '''
+  def __init__(self, name, rtype, depth, ptypes):
+    self.name   = name
+    self.rtype  = rtype
+    self.depth  = depth
+    self.ptypes = ptypes
+    self.enter  = None
+
+
+def link(levels):
+  # Closure que devuelve el marco de la función levels niveles afuera
+  if levels == 0:
+    return lambda f: f
+  if levels == 1:
+    return lambda f: f[LINK]
+  if levels == 2:
+    return lambda f: f[LINK][LINK]
+  def walk(f):
+    for _ in range(levels):
+      f = f[LINK]
+    return f
+  return walk
+
+
+class ClosureCompiler(Visitor):
+
+  def __init__(self, program, frames):
+    self.program = program
+    self.frames = frames
+    self.infos = [FunctionInfo(f.name, f.node.dtype.type or 'int', f.depth, f.types[:f.nparams])
+                  for f in frames]
+    self.rtype = 'int'
+
+  @classmethod
+  def compile(cls, ast, frames=None):
+    program = ClosureProgram()
+    vis = cls(program, frames if frames is not None else resolve(ast))
+    ast.accept(vis, None)
+    return program
+
+  # Declaraciones
+
+  def visit(self, n: Program, frame: Frame):
+    for func in n.functions:
+      func.accept(self, None)
+    main = next((func for func in n.functions if func.id == 'main'), None)
+    if main is None:
+      raise ClosureError('Main function not found')
+    self.program.main = self.infos[main.slot]
+
+  def visit(self, n: Function, frame: Frame):
+    info = self.infos[n.slot]
+    frame = self.frames[n.slot]
+    init = tuple(0.0 if dtype == 'float' else 0 for dtype in frame.types[frame.nparams:])
+    vectors = []
+    for var in n.variables:
+      if isinstance(var, VectorVar):
+        size = self.expr(var.size, frame, 'int').fn
+        vectors.append((FIRST + var.slot, size, 'd' if var.type.type == 'float' else 'q'))
+    for var in n.variables:
+      if isinstance(var, Function):
+        var.accept(self, frame)
+    self.rtype = info.rtype
+    body, _ = self.block(n.statements, frame)
+    info.enter = self.entry(body, init, vectors, 0.0 if info.rtype == 'float' else 0)
+
+  def entry(self, body, init, vectors, default):
+    if vectors:
+      def enter(link, args):
+        f = [link, None, *args, *init]
+        for slot, size, code in vectors:
+          n = size(f)
+          if n < 0:
+            raise VMError('Negative vector size')
+          f[slot] = array(code, bytes(8 * n))
+        return f[RESULT] if body(f) is RETURN else default
+    else:
+      def enter(link, args):
+        f = [link, None, *args, *init]
+        return f[RESULT] if body(f) is RETURN else default
+    return enter
+
+  def variable(self, n, frame):
+    # Slot de la variable a la que se refiere n (ya resuelta)
+    return Slot(frame.outer(n.depth).types[n.slot], n.depth, FIRST + n.slot)
+
+  # Sentencias: devuelven (closure, puede devolver BREAK/RETURN)
+
+  def stmt(self, n, frame):
+    if isinstance(n, Call):
+      # Llamada como sentencia: se descarta el valor
+      value = n.accept(self, frame).fn
+      def call(f):
+        value(f)
+      return call, False
+    return n.accept(self, frame)
+
+  def block(self, stmts, frame):
+    codes = [self.stmt(s, frame) for s in stmts]
+    fns = tuple(fn for fn, _ in codes)
+    exits = any(e for _, e in codes)
+    if len(fns) == 1:
+      return fns[0], exits
+    if not exits and len(fns) == 2:
+      s0, s1 = fns
+      def run(f):
+        s0(f)
+        s1(f)
+    elif not exits and len(fns) == 3:
+      s0, s1, s2 = fns
+      def run(f):
+        s0(f)
+        s1(f)
+        s2(f)
+    elif not exits:
+      def run(f):
+        for fn in fns:
+          fn(f)
+    else:
+      def run(f):
+        for fn in fns:
+          signal = fn(f)
+          if signal is not None:
+            return signal
+    return run, exits
+
+  def visit(self, n: Grouping, frame: Frame):
+    return self.block(n.expr, frame)
+
+  def store(self, sym, frame, value):
+    # Closure que asigna value (una closure) a la variable sym
+    k = sym.index
+    if sym.depth == frame.depth:
+      def assign(f):
+        f[k] = value(f)
+    else:
+      outer = link(frame.depth - sym.depth)
+      def assign(f):
+        outer(f)[k] = value(f)
+    return assign
+
+  def store_element(self, vec, idx, value):
+    # Closure de vec[idx] := value; array('q') no acepta enteros de más
+    # de 64 bits
+    def assign(f):
+      x = value(f)
+      try:
+        vec(f)[idx(f)] = x
+      except OverflowError:
+        raise VMError('Vector element overflow') from None
+    return assign
+
+  def element(self, sym, index, frame):
+    # (closure del vector, closure del índice revisado)
+    vec = self.load(sym, frame)
+    return vec, self.index(self.expr(index, frame, 'int'))
+
+  def index(self, code):
+    # Closure del índice: revisa que no sea negativo
+    if code.const is not None and code.const >= 0:
+      c = code.const
+      return lambda f: c
+    idx = code.fn
+    def checked(f):
+      i = idx(f)
+      if i < 0:
+        raise IndexError
+      return i
+    return checked
+
+  def visit(self, n: Assign, frame: Frame):
+    sym = self.variable(n.loct, frame)
+    if isinstance(n.loct, Vector):
+      value = self.expr(n.expr, frame, sym.type[:-2]).fn
+      if sym.depth == frame.depth:
+        # Vector local: se indexa el marco directamente
+        k = sym.index
+        idx = self.index(self.expr(n.loct.index, frame, 'int'))
+        def assign(f):
+          x = value(f)
+          try:
+            f[k][idx(f)] = x
+          except OverflowError:
+            raise VMError('Vector element overflow') from None
+        return assign, False
+      vec, idx = self.element(sym, n.loct.index, frame)
+      return self.store_element(vec, idx, value), False
+    return self.store(sym, frame, self.expr(n.expr, frame, sym.type).fn), False
+
+  def visit(self, n: OneStmt, frame: Frame):
+    program = self.program
+    if n.key == 'print':
+      text = n.value
+      def output(f):
+        program.write(text)
+      return output, False
+    if n.key == 'write':
+      code = n.value.accept(self, frame)
+      value = code.fn
+      if code.type == 'float':
+        def output(f):
+          program.write('%.15g' % value(f))
+      else:
+        def output(f):
+          program.write(str(value(f)))
+      return output, False
+    if n.key == 'read':
+      sym = self.variable(n.value, frame)
+      is_float = sym.type.startswith('float')
+      read = lambda f: program.read(is_float)
+      if isinstance(n.value, Vector):
+        vec, idx = self.element(sym, n.value.index, frame)
+        return self.store_element(vec, idx, read), False
+      return self.store(sym, frame, read), False
+    if n.key == 'return':
+      value = self.expr(n.value, frame, self.rtype).fn
+      def ret(f):
+        f[RESULT] = value(f)
+        return RETURN
+      return ret, True
+    raise ClosureError(f'Unknown statement {n.key}')
+
+  def visit(self, n: DualStmt, frame: Frame):
+    test = self.cond(n.left, frame)
+    body, exits = self.stmt(n.right, frame)
+    if n.keyLeft != 'while':
+      def when(f):
+        if test(f):
+          return body(f)
+      return when, exits
+    if not exits:
+      def loop(f):
+        while test(f):
+          body(f)
+    else:
+      def loop(f):
+        while test(f):
+          signal = body(f)
+          if signal is not None:
+            if signal is BREAK:
+              break
+            return signal
+    return loop, False if not exits else self.returns(n.right)
+
+  def returns(self, n):
+    # Un while sólo deja salir RETURN (BREAK termina en él)
+    if isinstance(n, OneStmt):
+      return n.key == 'return'
+    if isinstance(n, Grouping):
+      return any(self.returns(s) for s in n.expr)
+    if isinstance(n, DualStmt):
+      return self.returns(n.right)
+    if isinstance(n, TripleStmt):
+      return self.returns(n.middle) or self.returns(n.right)
+    return False
+
+  def visit(self, n: TripleStmt, frame: Frame):
+    test = self.cond(n.left, frame)
+    then, e1 = self.stmt(n.middle, frame)
+    orelse, e2 = self.stmt(n.right, frame)
+    def choose(f):
+      if test(f):
+        return then(f)
+      return orelse(f)
+    return choose, e1 or e2
+
+  def visit(self, n: Single, frame: Frame):
+    if n.key == 'break':
+      return (lambda f: BREAK), True
+    return (lambda f: None), False
+
+  # Condiciones: closures que devuelven un valor de verdad
+
+  def cond(self, n, frame):
+    return n.accept(self, frame).fn
+
+  def visit(self, n: Relation, frame: Frame):
+    if n.rel == 'and' or n.rel == 'or':
+      left, right = self.cond(n.left, frame), self.cond(n.right, frame)
+      if n.rel == 'and':
+        return Code(lambda f: left(f) and right(f), 'int')
+      return Code(lambda f: left(f) or right(f), 'int')
+    return Code(self.operator(n.rel, n.left.accept(self, frame), n.right.accept(self, frame)), 'int')
+
+  def visit(self, n: Not, frame: Frame):
+    rel = self.cond(n.rel, frame)
+    return Code(lambda f: not rel(f), 'int')
+
+  # Expresiones: devuelven un Code
+
+  def expr(self, n, frame, dtype):
+    code = n.accept(self, frame)
+    return self.convert(code, dtype)
+
+  def convert(self, code, dtype):
+    if code.type == dtype or dtype.endswith('[]'):
+      return code
+    conv = int_to_float if dtype == 'float' else float_to_int
+    if code.const is not None:
+      try:
+        return self.constant(conv(code.const), dtype)
+      except VMError:
+        pass                  # se informa al ejecutar
+    value = code.fn
+    return Code(lambda f: conv(value(f)), dtype)
+
+  def constant(self, value, dtype):
+    return Code(lambda f: value, dtype, const=value)
+
+  def operator(self, op, left, right):
+    general, local_const, local_local, expr_const = OPERATORS[op]
+    if right.const is not None and left.slot is not None:
+      return local_const(left.slot, right.const)
+    if left.slot is not None and right.slot is not None:
+      return local_local(left.slot, right.slot)
+    if right.const is not None:
+      return expr_const(left.fn, right.const)
+    return general(left.fn, right.fn)
+
+  def visit(self, n: Integer, frame: Frame):
+    return self.constant(n.value, 'int')
+
+  def visit(self, n: Float, frame: Frame):
+    return self.constant(n.value, 'float')
+
+  def load(self, sym, frame):
+    k = sym.index
+    levels = frame.depth - sym.depth
+    if levels == 0:
+      return lambda f: f[k]
+    if levels == 1:
+      return lambda f: f[LINK][k]
+    outer = link(levels)
+    return lambda f: outer(f)[k]
+
+  def visit(self, n: Ident, frame: Frame):
+    sym = self.variable(n, frame)
+    slot = sym.index if sym.depth == frame.depth else None
+    return Code(self.load(sym, frame), sym.type, slot=slot)
+
+  def visit(self, n: Vector, frame: Frame):
+    sym = self.variable(n, frame)
+    if sym.depth == frame.depth:
+      # Vector local con índice en una variable local o calculado
+      k = sym.index
+      code = self.expr(n.index, frame, 'int')
+      if code.slot is not None:
+        j = code.slot
+        def get(f):
+          i = f[j]
+          if i < 0:
+            raise IndexError
+          return f[k][i]
+        return Code(get, sym.type[:-2])
+      if code.const is None:
+        idx = code.fn
+        def get(f):
+          i = idx(f)
+          if i < 0:
+            raise IndexError
+          return f[k][i]
+        return Code(get, sym.type[:-2])
+    vec, idx = self.element(sym, n.index, frame)
+    return Code(lambda f: vec(f)[idx(f)], sym.type[:-2])
+
+  def visit(self, n: Binary, frame: Frame):
+    left, right = n.left.accept(self, frame), n.right.accept(self, frame)
+    dtype = 'float' if 'float' in (left.type, right.type) else 'int'
+    left, right = self.convert(left, dtype), self.convert(right, dtype)
+    op = '//' if n.op == '/' and dtype == 'int' else n.op
+    return Code(self.operator(op, left, right), dtype)
+
+  def visit(self, n: TypeCast, frame: Frame):
+    return self.expr(n.expr, frame, n.op)
+
+  def visit(self, n: Unary, frame: Frame):
+    code = n.expr.accept(self, frame)
+    if n.op != '-':
+      return code
+    if code.const is not None:
+      return self.constant(-code.const, code.type)
+    value = code.fn
+    return Code(lambda f: -value(f), code.type)
+
+  def visit(self, n: Call, frame: Frame):
+    info = self.infos[n.slot]
+    args = tuple(self.expr(arg, frame, ptype).fn for arg, ptype in zip(n.expr, info.ptypes))
+    # El enlace estático de la llamada es el marco de la función que
+    # declara a la llamada (ninguno para las funciones del programa)
+    outer = link(frame.depth - n.depth + 1) if n.depth > 0 else (lambda f: None)
+    if not args:
+      fn = lambda f: info.enter(outer(f), ())
+    elif len(args) == 1:
+      a0, = args
+      fn = lambda f: info.enter(outer(f), (a0(f),))
+    elif len(args) == 2:
+      a0, a1 = args
+      fn = lambda f: info.enter(outer(f), (a0(f), a1(f)))
+    else:
+      fn = lambda f: info.enter(outer(f), [a(f) for a in args])
+    return Code(fn, info.rtype)
+
+
+class ClosureProgram:
+  '''
+  Programa compilado a closures. read/write se enlazan en cada run.
+  '''
+  def __init__(self):
+    self.main  = None
+    self.read  = None
+    self.write = None
+
+  def run(self, stdin=None, stdout=None):
+    tokens = read_tokens(stdin if stdin is not None else sys.stdin)
+    self.read = lambda is_float: read_value(tokens, is_float)
+    self.write = (stdout if stdout is not None else sys.stdout).write
+    return call_pl0(self.main.enter, (None, ()))
+
+
+def compile_closures(ast, frames=None):
+  '''
+  ClosureProgram de un AST ya revisado por Checker. frames es el
+  resultado de resolve(ast), si ya se calculó.
+  '''
+  return ClosureCompiler.compile(ast, frames)
@@ -5,56 +5,367 @@ Clase de alto nivel que contiene todo sobre el análisis/ejecución de un prog
 Sirve como repositorio de información sobre el programa, incluido el código fuente, informe de errores, etc.
 '''
 #from interp  import Interpreter
-from checker import Checker
+from checker import Checker, Symtab
 from model_ast   import Node
-from lexer_pl0   import Lexer
-from parser_pl0  import Parser
+from lexer_pl0   import LexerForPL0
+from parser_pl0  import ParserForPL0
+from fastlex     import tokenize_file
+from vm          import Compiler, Lowering, VM
+from ircode      import generate_ir
+from optimizer   import optimize
+from cgen        import CGenerator, build
+from pycompile   import compile_python
+from closures    import compile_closures
+from interp      import Interpreter
+from resolver    import resolve
+from lifting     import lift, liftable
+from incremental import Units, DependencySymtab
+from parcheck    import check_parallel
+from sourcemap   import SourceMap, Diagnostics
+from timing      import ProbedLexer, census
+from copy        import deepcopy
+from contextlib  import contextmanager, nullcontext
 
 
 class Context:
 
   def __init__(self):
-    self.lexer  = Lexer()
-    self.parser = Parser()
+    self.lexer  = LexerForPL0()
+    self.parser = ParserForPL0()
     self.interp = Checker(self)
     self.source = ''
     self.ast    = None
+    self.bytecode = None
+    self.ir       = None
+    self.opt_report = None
+    self.csource    = None
+    self.regalloc   = None
+    self.pyprogram  = None
+    self.closures   = None
+    self.frames     = None
+    self.lifted     = None
+    self.result     = None
+    self.checked    = False
+    self.artifacts  = {}
+    self.cache_key  = None
+    self.cached     = None
+    self.units      = Units()
+    self.incremental = False
+    self.check_jobs  = None
+    self.timer       = None     # timing.PassTimer
+    self.memory      = None     # memstats.MemoryTracker
+    self.diagnostics = Diagnostics()
+    self._sourcemap  = None
+    self.lexer.diagnostics = self.parser.diagnostics = self.diagnostics
     self.have_errors = False
 
   def parse(self, source):
+    # Por funciones (incremental.py): sólo se analizan y revisan de nuevo
+    # las que cambiaron desde el último parse. Si el fuente no se puede
+    # dividir, o con check_jobs (revisión completa en paralelo), se
+    # analiza completo
     self.have_errors = False
     self.source = source
-    self.ast = self.parser.parse(self.lexer.tokenize(self.source))
+    self.diagnostics.clear()
+    self.closures = None
+    self.frames = self.lifted = None
+    self.checked = False
+    self.artifacts = {}
+    self.cache_key = None
+    lexer = self.probed(self.lexer)
+    with self.phase('tables'):
+      self.parser.build_tables()
+    with self.phase('parse'):
+      self.ast = None if self.check_jobs else self.units.parse(source, lexer, self.parser)
+      self.incremental = self.ast is not None
+      if not self.check_jobs and self.units.failed:
+        # Errores de sintaxis en una función (ya guardados en diagnostics)
+        self.have_errors = True
+      elif self.ast is None:
+        self.ast = self.parser.parse(lexer.tokenize(self.source))
+        self.have_errors = len(self.diagnostics) > 0
+    self.count('parse')
 
-  def run(self):
+  def parse_cached(self, source, cache, flags=()):
+    '''
+    Como parse, pero con un caché en disco (diskcache.DiskCache): si el
+    fuente ya se compiló con la misma versión y las mismas flags, se
+    recupera el AST revisado (y el IR y el bytecode generados) sin
+    analizar ni revisar nada. Devuelve True si estaba en el caché.
+    '''
+    with self.phase('cache'):
+      key = cache.key(source, flags)
+      entry = cache.get(key)
+    if entry is None:
+      self.parse(source)
+    else:
+      self.have_errors = False
+      self.source = source
+      self.diagnostics.clear()
+      self.closures = None
+      self.frames = None
+      self.incremental = False
+      self.ast = entry['ast']
+      self.result = entry['result']
+      self.lifted = entry['lifted']
+      self.artifacts = entry['artifacts']
+      self.checked = True
+    self.cache_key = key
+    self.cached = set(self.artifacts) if entry is not None else None
+    return entry is not None
+
+  def save(self, cache):
+    # Guarda en el caché lo que se generó desde parse_cached (si hay
+    # algo nuevo y el programa no tiene errores)
+    if self.cache_key is None or not self.checked or self.have_errors:
+      return False
+    if self.cached == set(self.artifacts):
+      return False
+    entry = {
+      'ast'       : self.ast,
+      'result'    : self.result,
+      'lifted'    : self.lifted,
+      'artifacts' : self.artifacts,
+    }
+    self.cached = set(self.artifacts)
+    with self.phase('save'):
+      return cache.put(self.cache_key, entry)
+
+  def parse_file(self, filename):
+    # Análisis por trozos (mmap): el fuente nunca se carga completo
+    self.have_errors = False
+    self.source = None
+    self.diagnostics.clear()
+    self.closures = None
+    self.frames = self.lifted = None
+    self.checked = False
+    self.artifacts = {}
+    self.cache_key = None
+    self.incremental = False
+    tokens = tokenize_file(filename, diagnostics=self.diagnostics)
+    for probe in self.probes():
+      tokens = probe.tokens(tokens)
+    with self.phase('tables'):
+      self.parser.build_tables()
+    with self.phase('parse'):
+      self.ast = self.parser.parse(tokens)
+      self.have_errors = len(self.diagnostics) > 0
+    self.count('parse')
+
+  def run(self, engine=None, stdin=None, stdout=None, opt_level=None):
+    # Revisa el AST (una vez por programa); con engine ('vm', 'py',
+    # 'closure' o 'ast') además ejecuta el programa y devuelve el valor
+    # de main. Con opt_level >= 1 saca las funciones anidadas que se
+    # pueden sacar (lifting.py)
+    if not self.have_errors:
+      if not self.checked:
+        env = None
+        with self.phase('check'):
+          if self.incremental:
+            env = DependencySymtab({})
+            self.result = self.units.check(self.ast, env)
+          elif self.check_jobs:
+            self.result = check_parallel(self.ast, self.check_jobs)
+          else:
+            env = Symtab()
+            self.result = self.interp.check(self.ast, env)
+        self.checked = True
+        self.count('check', symbols=True)
+        if self.memory is not None and env is not None:
+          self.memory.count_symtab(env)
+      if opt_level:
+        self.lift()
+      if engine is None or self.have_errors:
+        return self.result
+      return self.launch(engine, stdin, stdout, opt_level)
+
+  def lift(self):
+    # Lambda lifting sobre el AST ya revisado (sólo la primera vez)
+    if self.lifted is None:
+      self.resolve()
+      with self.phase('lift'):
+        if self.incremental and liftable(self.frames):
+          # Las funciones del caché de units no se modifican
+          self.units.relocate()
+          self.ast = deepcopy(self.ast)
+          self.frames = resolve(self.ast)
+        self.lifted = lift(self.ast, self.frames)
+        if self.lifted:
+          self.frames = resolve(self.ast)
+          self.closures = None
+    return self.lifted
+
+  def resolve(self):
+    # Direcciones (depth, slot) y marcos de cada función; se calculan
+    # al generar código, no en cada revisión
+    if self.frames is None:
+      with self.phase('resolve'):
+        self.frames = resolve(self.ast)
+    return self.frames
+
+  def launch(self, engine, stdin=None, stdout=None, opt_level=None):
+    # Ejecuta el programa ya revisado
+    self.resolve()
+    if engine == 'closure':
+      if self.closures is None:
+        with self.phase('closures'):
+          self.closures = compile_closures(self.ast, self.frames)
+      with self.phase('execute'):
+        return self.closures.run(stdin, stdout)
+    if engine == 'ast':
+      with self.phase('execute'):
+        return Interpreter.interpret(self.ast, stdin, stdout)
+    if engine == 'py':
+      program = self.pycompile()
+      with self.phase('execute'):
+        return program.load(stdin, stdout).main()
+    if self.compile(opt_level):
+      with self.phase('execute'):
+        return VM(self.bytecode, stdin, stdout).run()
+
+  def ircode(self, opt_level=None):
+    # Código intermedio (el AST debe estar ya revisado), optimizado si
+    # se da opt_level
+    if not self.have_errors:
+      if ('ir', opt_level) in self.artifacts:
+        self.ir, self.opt_report = self.artifacts['ir', opt_level]
+        return self.ir
+      if opt_level:
+        self.lift()
+      self.resolve()
+      with self.phase('ircode'):
+        self.ir = generate_ir(self.ast)
+      self.opt_report = None
+      if opt_level is not None:
+        with self.phase('optimize'):
+          self.opt_report = optimize(self.ir, opt_level)
+      self.artifacts['ir', opt_level] = (self.ir, self.opt_report)
+    return self.ir
+
+  def compile(self, opt_level=None):
+    # Bytecode para la VM: directamente desde el AST o, con opt_level,
+    # a través del código intermedio optimizado
+    if not self.have_errors:
+      if ('bytecode', opt_level) in self.artifacts:
+        self.bytecode, self.regalloc = self.artifacts['bytecode', opt_level]
+        if ('ir', opt_level) in self.artifacts:
+          self.ir, self.opt_report = self.artifacts['ir', opt_level]
+      elif opt_level is None:
+        self.resolve()
+        with self.phase('bytecode'):
+          self.bytecode = Compiler.compile(self.ast)
+        self.artifacts['bytecode', opt_level] = (self.bytecode, None)
+      else:
+        ir = self.ircode(opt_level)
+        with self.phase('bytecode'):
+          self.bytecode = Lowering.lower(ir)
+        self.regalloc = self.bytecode.regalloc
+        self.artifacts['bytecode', opt_level] = (self.bytecode, self.regalloc)
+    return self.bytecode
+
+  def pycompile(self):
+    # Programa compilado a código de CPython (el AST debe estar revisado)
     if not self.have_errors:
-      return self.interp.interpret(self.ast)
+      self.resolve()
+      with self.phase('pycompile'):
+        self.pyprogram = compile_python(self.ast, self.source)
+    return self.pyprogram
+
+  def functions(self, stdin=None, stdout=None):
+    '''
+    Funciones del programa como funciones de Python: por ejemplo
+    context.functions().fib(20). read/write/print usan stdin/stdout.
+    '''
+    self.run()
+    if not self.have_errors and self.pycompile():
+      return self.pyprogram.load(stdin, stdout)
+
+  def execute(self, stdin=None, stdout=None, opt_level=None, engine='vm'):
+    return self.run(engine, stdin, stdout, opt_level)
+
+  def native(self, output, asm=False, opt_level=None, debug=False):
+    # Ensamblador (asm) o ejecutable en output, a través de C
+    self.run(opt_level=opt_level)
+    if not self.have_errors and self.ircode(opt_level):
+      with self.phase('cgen'):
+        gen = CGenerator(self.ir, debug)
+        self.csource = gen.source()
+      self.regalloc = gen.report
+      with self.phase('build'):
+        return build(self.csource, output, asm, debug)
+
+  def probes(self):
+    # timer y memory (los que haya); memory envuelve a timer, para que
+    # su costo no cuente en los tiempos
+    return [probe for probe in (self.timer, self.memory) if probe is not None]
+
+  def probed(self, lexer):
+    for probe in self.probes():
+      lexer = ProbedLexer(lexer, probe)
+    return lexer
+
+  def phase(self, name):
+    # Fase medida por timer y memory, si los hay
+    if self.memory is None:
+      return nullcontext() if self.timer is None else self.timer.phase(name)
+    if self.timer is None:
+      return self.memory.phase(name)
+    return self.both_phases(name)
+
+  @contextmanager
+  def both_phases(self, name):
+    with self.memory.phase(name), self.timer.phase(name):
+      yield
+
+  def count(self, name, symbols=False):
+    # Nodos (y símbolos) del AST para el rendimiento de la fase name y
+    # bytes por clase de nodo
+    if self.ast is None:
+      return
+    if self.timer is not None:
+      nodes, nsymbols = census(self.ast)
+      if symbols:
+        self.timer.count(name, nodes=nodes, symbols=nsymbols)
+      else:
+        self.timer.count(name, nodes=nodes)
+    if self.memory is not None and not symbols:
+      self.memory.count_nodes(self.ast)
+
+  @property
+  def sourcemap(self):
+    # Índice de líneas del fuente actual (se construye una sola vez)
+    if self.source is None:
+      return None
+    if self._sourcemap is None or self._sourcemap.source is not self.source:
+      self._sourcemap = SourceMap(self.source)
+    return self._sourcemap
 
   def find_source(self, node):
-    indices = self.parser.index_position(node)
-    if indices:
-      return self.source[indices[0]:indices[1]]
+    if self.incremental:
+      self.units.relocate()
+    if node.pos is not None and self.source is not None:
+      return self.source[node.pos:node.endpos]
     else:
       return f'{type(node).__name__} (fuente no disponible)'
 
   def error(self, message, position):
+    # Sólo se guarda el error; report() les da formato a todos juntos
     if isinstance(position, Node):
-      lineno = self.parser.line_position(position)
-      (start, end) = (part_start, part_end) = self.parser.index_position(position)
-      while start >= 0 and self.source[start] != '\n':
-        start -=1
-
-      start += 1
-      while end < len(self.source) and self.source[end] != '\n':
-        end += 1
-      print()
-      print(self.source[start:end])
-      print(" "*(part_start - start), end='')
-      print("^"*(part_end - part_start))
-      print(f'{lineno}: {message}')
-
+      if self.incremental:
+        self.units.relocate()
+      self.diagnostics.add(message, position.pos, position.endpos)
+    elif isinstance(position, tuple):
+      self.diagnostics.add(message, *position)
+    elif isinstance(position, int):
+      self.diagnostics.add(message, lineno=position)
     else:
-      print(f'{position}: {message}')
-
+      self.diagnostics.add(f'{position}: {message}')
     self.have_errors = True
 
+  def report(self, style='text'):
+    '''
+    Los errores guardados como texto ('text' o 'short', una línea por
+    error) o JSON ('json').
+    '''
+    return self.diagnostics.format(self.sourcemap, style)
+
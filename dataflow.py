@@ -0,0 +1,64 @@
+# dataflow.py
+'''
+Análisis de flujo de datos sobre el CFG del código intermedio (ircode):
+registros vivos (liveness) y dominadores. Los usan el optimizador, las
+optimizaciones de ciclos y la asignación de registros.
+'''
+from ircode import Op
+
+
+def instr_uses(func, instr):
+  uses = instr.uses()
+  if instr.op is Op.CALL and func.captured:
+    uses.extend(func.captured)
+  return uses
+
+
+def liveness(func):
+  '''
+  Registros vivos a la entrada y a la salida de cada bloque:
+  devuelve (live_in, live_out), diccionarios etiqueta -> set.
+  '''
+  gen, killed = {}, {}
+  for block in func.blocks:
+    g, k = set(), set()
+    for instr in block.instrs:
+      g.update(r for r in instr_uses(func, instr) if r not in k)
+      dst = instr.defs()
+      if dst is not None:
+        k.add(dst)
+    gen[block.label], killed[block.label] = g, k
+  live_in  = { block.label: set() for block in func.blocks }
+  live_out = { block.label: set() for block in func.blocks }
+  changed = True
+  while changed:
+    changed = False
+    for block in reversed(func.blocks):
+      label = block.label
+      out = set().union(*(live_in[s.label] for s in block.succs))
+      new = gen[label] | (out - killed[label])
+      if new != live_in[label] or out != live_out[label]:
+        live_in[label], live_out[label], changed = new, out, True
+  return live_in, live_out
+
+
+def dominators(func):
+  '''
+  Dominadores de cada bloque: diccionario etiqueta -> set de etiquetas
+  (cada bloque se domina a sí mismo).
+  '''
+  entry = func.blocks[0].label
+  every = { block.label for block in func.blocks }
+  dom = { label: set(every) for label in every }
+  dom[entry] = { entry }
+  changed = True
+  while changed:
+    changed = False
+    for block in func.blocks:
+      if block.label == entry:
+        continue
+      new = set.intersection(*(dom[p.label] for p in block.preds)) if block.preds else set()
+      new.add(block.label)
+      if new != dom[block.label]:
+        dom[block.label], changed = new, True
+  return dom
@@ -0,0 +1,186 @@
+# diskcache.py
+'''
+Caché de compilación en disco
+=============================
+Guarda el AST ya revisado de un programa (y el código intermedio y el
+bytecode que se generen después) en un directorio, por defecto
+~/.cache/pl0 (o $XDG_CACHE_HOME/pl0, o $PL0_CACHE_DIR). Si el mismo
+fuente se vuelve a compilar con la misma versión del compilador y las
+mismas opciones, Context lo recupera sin pasar por el lexer, el parser
+ni el checker.
+
+  - Cada entrada es un archivo <clave>.bin (pickle) cuya clave es el
+    sha256 de la versión del compilador, las opciones y el fuente. La
+    versión incluye un hash de los módulos del compilador, así que un
+    cambio en el código invalida las entradas viejas.
+  - La escritura es atómica (archivo temporal en el mismo directorio y
+    os.replace): varios procesos pueden compilar a la vez y nunca leen
+    una entrada a medias.
+  - El tamaño total está acotado: al escribir se borran las entradas
+    usadas hace más tiempo (LRU por la fecha de modificación, que se
+    actualiza en cada acierto).
+  - stats cuenta aciertos, fallos, escrituras y desalojos del proceso.
+'''
+from dataclasses import dataclass
+import hashlib
+import os
+import pickle
+import tempfile
+
+VERSION = '0.1'
+
+MAX_BYTES = 256 * 1024 * 1024
+
+
+def default_dir():
+  path = os.environ.get('PL0_CACHE_DIR')
+  if path:
+    return path
+  base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+  return os.path.join(base, 'pl0')
+
+
+def compiler_version():
+  # VERSION más el hash del contenido de los módulos del compilador (no
+  # de sus fechas: en CI cada checkout tiene fechas nuevas)
+  root = os.path.dirname(os.path.abspath(__file__))
+  digest = hashlib.sha256(VERSION.encode('utf-8'))
+  for entry in sorted(os.scandir(root), key=lambda e: e.name):
+    if entry.name.endswith('.py') and entry.is_file():
+      with open(entry.path, 'rb') as f:
+        digest.update(entry.name.encode('utf-8') + b'\0' + f.read())
+  return f'{VERSION}+{digest.hexdigest()[:16]}'
+
+
+@dataclass(slots=True)
+class CacheStats:
+  hits      : int = 0
+  misses    : int = 0
+  writes    : int = 0
+  evictions : int = 0
+  errors    : int = 0
+
+  def format(self, entries=None, size=None):
+    lookups = self.hits + self.misses
+    rate = f'{100 * self.hits / lookups:.0f}%' if lookups else '-'
+    lines = [
+      f'cache: {self.hits} hits, {self.misses} misses ({rate} hit rate)',
+      f'  {self.writes} writes, {self.evictions} evictions, {self.errors} errors',
+    ]
+    if entries is not None:
+      lines.append(f'  {entries} entries, {size / 1024:.1f} KiB on disk')
+    return '\n'.join(lines)
+
+
+class DiskCache:
+
+  def __init__(self, path=None, max_bytes=MAX_BYTES):
+    self.path = path or default_dir()
+    self.max_bytes = max_bytes
+    self.version = compiler_version()
+    self.stats = CacheStats()
+
+  def key(self, source, flags=()):
+    digest = hashlib.sha256()
+    digest.update(self.version.encode('utf-8'))
+    digest.update(b'\0' + repr(tuple(flags)).encode('utf-8') + b'\0')
+    digest.update(source.encode('utf-8'))
+    return digest.hexdigest()
+
+  def filename(self, key):
+    return os.path.join(self.path, key + '.bin')
+
+  def get(self, key):
+    '''
+    Valor guardado con esa clave, o None.
+    '''
+    filename = self.filename(key)
+    try:
+      with open(filename, 'rb') as f:
+        value = pickle.load(f)
+    except FileNotFoundError:
+      self.stats.misses += 1
+      return None
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError,
+            ImportError, IndexError, TypeError, ValueError, RecursionError):
+      # Entrada dañada o de un formato viejo
+      self.stats.misses += 1
+      self.stats.errors += 1
+      self.remove(filename)
+      return None
+    try:
+      os.utime(filename)
+    except OSError:
+      pass
+    self.stats.hits += 1
+    return value
+
+  def put(self, key, value):
+    '''
+    Guarda value (atómicamente) y desaloja entradas si hace falta.
+    '''
+    try:
+      os.makedirs(self.path, exist_ok=True)
+      fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+    except OSError:
+      self.stats.errors += 1
+      return False
+    try:
+      with os.fdopen(fd, 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+      os.replace(tmp, self.filename(key))
+    except (OSError, pickle.PicklingError, RecursionError):
+      self.stats.errors += 1
+      self.remove(tmp)
+      return False
+    self.stats.writes += 1
+    self.evict()
+    return True
+
+  def entries(self):
+    # (fecha, tamaño, archivo) de cada entrada
+    found = []
+    try:
+      with os.scandir(self.path) as it:
+        for entry in it:
+          if entry.name.endswith('.bin'):
+            try:
+              st = entry.stat()
+            except OSError:
+              continue
+            found.append((st.st_mtime_ns, st.st_size, entry.path))
+    except OSError:
+      pass
+    return found
+
+  def usage(self):
+    # (número de entradas, bytes)
+    found = self.entries()
+    return len(found), sum(size for _, size, _ in found)
+
+  def evict(self):
+    found = self.entries()
+    total = sum(size for _, size, _ in found)
+    if total <= self.max_bytes:
+      return
+    for _, size, filename in sorted(found):
+      if total <= self.max_bytes:
+        break
+      if self.remove(filename):
+        self.stats.evictions += 1
+      total -= size
+
+  def clear(self):
+    for _, _, filename in self.entries():
+      self.remove(filename)
+
+  def remove(self, filename):
+    # Otro proceso puede haberlo borrado antes
+    try:
+      os.remove(filename)
+      return True
+    except OSError:
+      return False
+
+  def report(self):
+    return self.stats.format(*self.usage())
@@ -0,0 +1,294 @@
+# fastlex.py
+'''
+Lexer rápido para PL0 dirigido por tablas.
+
+A diferencia de LexerForPL0 (una alternativa de la expresión regular por
+cada token y un objeto Token por coincidencia), aquí:
+
+1. Los identificadores se reconocen una sola vez y las palabras
+   reservadas se resuelven con una búsqueda en un diccionario.
+2. Los operadores se resuelven también por diccionario.
+3. Los tokens se guardan en forma columnar (TokenStream): arreglos
+   paralelos con el código de tipo, el inicio, el fin y la línea de
+   cada token, más una tabla aparte con los valores de los literales.
+
+TokenStream.tokens() adapta el flujo columnar a objetos Token de SLY,
+generados de forma perezosa, para alimentar a ParserForPL0.
+
+Para archivos muy grandes, tokenize_file() analiza el archivo por trozos
+(leídos de un mmap) y genera los tokens a medida, con memoria constante.
+'''
+from array import array
+from bisect import bisect_left
+from codecs import getincrementaldecoder
+from json import loads
+from sly.lex import Token
+import mmap
+import re
+
+from lexer_pl0 import LexerForPL0
+
+
+# Códigos de tipo: índice en TOKEN_NAMES
+TOKEN_NAMES = tuple(sorted(LexerForPL0.tokens))
+TOKEN_CODES = { name: code for code, name in enumerate(TOKEN_NAMES) }
+
+KEYWORDS = {
+  'fun': 'FUN', 'begin': 'BEGIN', 'end': 'END', 'if': 'IF', 'then': 'THEN',
+  'else': 'ELSE', 'while': 'WHILE', 'do': 'DO', 'print': 'PRINT',
+  'read': 'READ', 'write': 'WRITE', 'return': 'RETURN', 'skip': 'SKIP',
+  'break': 'BREAK', 'and': 'AND', 'or': 'OR', 'not': 'NOT',
+  'int': 'TINT', 'float': 'TFLOAT',
+}
+
+OPERATORS = {
+  ':=': 'ASSIGN', ':': 'COLON', '==': 'EQ', '!=': 'NEQ', '<=': 'LTE',
+  '<': 'LT', '>=': 'GTE', '>': 'GT', '+': 'PLUS', '-': 'MINUS',
+  '*': 'TIMES', '/': 'DIVIDE', '(': 'LPAREN', ')': 'RPAREN',
+  ';': 'SEMICOLON', ',': 'COMMA', '[': 'LBRACKET', ']': 'RBRACKET',
+}
+
+KEYWORD_CODES  = { k: TOKEN_CODES[v] for k, v in KEYWORDS.items() }
+OPERATOR_CODES = { k: TOKEN_CODES[v] for k, v in OPERATORS.items() }
+ID     = TOKEN_CODES['ID']
+INT    = TOKEN_CODES['INT']
+FLOAT  = TOKEN_CODES['FLOAT']
+STRING = TOKEN_CODES['STRING']
+
+# Grupos de la expresión maestra (m.lastindex). Los blancos y saltos de
+# línea se absorben delante de cada token; las líneas se cuentan entre el
+# inicio de un token y el del siguiente. Las alternativas y su orden son
+# los de LexerForPL0 (la primera que coincide gana), así que los dos
+# lexers dan los mismos tokens y errores: p. ej. '007' es un error, '1e5'
+# es INT 1 e ID e5 y un comentario sin cerrar es '/' '*'. Un error toma
+# los caracteres hasta el siguiente blanco, como LexerForPL0.error.
+(G_NAME, G_COMMENT, G_OPEN_COMMENT, G_INT, G_FLOAT, G_STRING,
+ G_OPEN_STRING, G_OPERATOR, G_ERROR, G_BLANK) = range(1, 11)
+
+# Con final=False (un trozo de la entrada) un comentario o una cadena
+# que llegan al fin del trozo pueden seguir en el siguiente: los grupos
+# G_OPEN_* los detienen. En el último trozo no coinciden nunca.
+_MASTER = r'''
+  [ \t\r\n]*(?:
+    ([a-zA-Z_][a-zA-Z0-9_]*)
+   |(/\*[\s\S]*?\*/)
+   |({open_comment})
+   |((?:[1-9]\d*|0)(?![\d\.]))
+   |((?:0|[1-9]\d*)(?:\.\d+)?(?:\d[e][+-]?\d+)?(?![\d]))
+   |("(?:\\["n\\]|[^"\\])+")
+   |({open_string})
+   |(:=|==|!=|<=|>=|[-+*/<>:;,()\[\]])
+   |([^\s]+)
+   |([^ \t\r\n])
+  )
+'''
+MASTER = re.compile(_MASTER.format(open_comment=r'(?!)', open_string=r'(?!)'), re.VERBOSE)
+MASTER_CHUNK = re.compile(_MASTER.format(open_comment=r'/\*[\s\S]*',
+                                         open_string=r'"(?:\\["n\\]|[^"\\])*\\?\Z'), re.VERBOSE)
+
+
+class TokenStream:
+  '''
+  Flujo de tokens en forma columnar. El token i tiene tipo
+  TOKEN_NAMES[types[i]], ocupa source[starts[i]:ends[i]] y está en la
+  línea lines[i]. Los valores de INT, FLOAT y STRING se guardan en
+  literals, en el mismo orden en que aparecen (lit_index[k] es el
+  número de token del literal k).
+  '''
+  def __init__(self, source='', base=0):
+    self.source    = source
+    self.base      = base       # desplazamiento de source en el archivo
+    self.types     = array('B')
+    self.starts    = array('I')
+    self.ends      = array('I')
+    self.lines     = array('I')
+    self.lit_index = array('I')
+    self.literals  = []
+
+  def __len__(self):
+    return len(self.types)
+
+  def type(self, i):
+    return TOKEN_NAMES[self.types[i]]
+
+  def value(self, i):
+    code = self.types[i]
+    if code == INT or code == FLOAT or code == STRING:
+      return self.literals[bisect_left(self.lit_index, i)]
+    return self.source[self.starts[i]:self.ends[i]]
+
+  def nbytes(self):
+    # Memoria de las columnas (sin contar la tabla de literales)
+    return sum(a.itemsize * len(a) for a in
+               (self.types, self.starts, self.ends, self.lines, self.lit_index))
+
+  def tokens(self):
+    '''
+    Genera objetos Token de SLY uno a uno para ParserForPL0.
+    '''
+    source, names, literals, base = self.source, TOKEN_NAMES, self.literals, self.base
+    k = 0
+    for code, start, end, line in zip(self.types, self.starts, self.ends, self.lines):
+      tok = Token()
+      tok.type = names[code]
+      if code == INT or code == FLOAT or code == STRING:
+        tok.value = literals[k]
+        k += 1
+      else:
+        tok.value = source[start:end]
+      tok.lineno = line
+      tok.index = base + start
+      tok.end = base + end
+      yield tok
+
+
+def report(message, offset, lineno, diagnostics):
+  # Como LexerForPL0.report: a diagnostics (sourcemap.Diagnostics) con
+  # el desplazamiento en la entrada, o a la salida si no hay
+  if diagnostics is None:
+    print(f'{message} at line {lineno}')
+  else:
+    diagnostics.add(message, offset, offset + 1, lineno)
+
+
+def scan(source, stream=None, pos=0, endpos=None, lineno=1, final=True, diagnostics=None):
+  '''
+  Agrega a stream los tokens de source[pos:endpos] y devuelve
+  (stream, lineno, stop). Si final es False, source es solo un trozo
+  de la entrada: el análisis se detiene (stop) en el primer token que
+  podría continuar en el trozo siguiente, y lineno es la línea en stop.
+  Los errores léxicos van a diagnostics.
+  '''
+  if stream is None:
+    stream = TokenStream(source)
+  if endpos is None:
+    endpos = len(source)
+  limit = endpos if final else endpos - MARGIN
+  stop = endpos
+
+  types, starts, ends, lines = stream.types, stream.starts, stream.ends, stream.lines
+  lit_index, literals = stream.lit_index, stream.literals
+  add_type, add_start, add_end, add_line = types.append, starts.append, ends.append, lines.append
+  keywords, operators = KEYWORD_CODES, OPERATOR_CODES
+
+  count, prev = source.count, pos
+  master = MASTER if final else MASTER_CHUNK
+  for m in master.finditer(source, pos, endpos):
+    kind = m.lastindex
+    if kind is None:
+      break
+    start, end = m.span(kind)
+    if end > limit:
+      stop = start
+      break
+    if kind == G_NAME:
+      code = keywords.get(source[start:end], ID)
+    elif kind == G_OPERATOR:
+      code = operators[source[start:end]]
+    elif kind == G_INT:
+      code = INT
+      lit_index.append(len(types))
+      literals.append(int(source[start:end]))
+    elif kind == G_FLOAT:
+      code = FLOAT
+      lit_index.append(len(types))
+      literals.append(float(source[start:end]))
+    elif kind == G_STRING:
+      code = STRING
+      lit_index.append(len(types))
+      literals.append(loads(source[start:end], strict=False))
+    else:
+      lineno += count('\n', prev, start)
+      prev = start
+      if kind == G_ERROR:
+        report(f'Illegal character {source[start:min(end, start+5)]}', stream.base + start, lineno, diagnostics)
+      elif kind == G_BLANK:
+        # Un blanco que LexerForPL0 no ignora (p. ej. '\f')
+        report(f'Illegal character {source[start:start+5]}', stream.base + start, lineno, diagnostics)
+      continue
+    lineno += count('\n', prev, start)
+    prev = start
+    add_type(code)
+    add_start(start)
+    add_end(end)
+    add_line(lineno)
+  lineno += count('\n', prev, stop)
+  return stream, lineno, stop
+
+
+def tokenize(source, diagnostics=None):
+  '''
+  Análisis léxico completo de source en un TokenStream.
+  '''
+  return scan(source, diagnostics=diagnostics)[0]
+
+
+# ---------------------------------------------------------------------
+#  Análisis léxico por trozos (archivos grandes)
+# ---------------------------------------------------------------------
+
+# Caracteres al final de un trozo que pueden cambiar el token anterior
+# (p. ej. '1' + 'e+5', ':' + '=')
+MARGIN = 3
+
+CHUNK_SIZE = 1 << 18
+
+
+def stream_tokens(chunks, diagnostics=None):
+  '''
+  Genera Tokens de SLY a partir de un iterable de trozos de texto. Los
+  tokens, comentarios y cadenas que cruzan el borde entre dos trozos
+  se vuelven a analizar junto con el trozo siguiente, de modo que solo
+  hay en memoria un trozo (y su TokenStream) a la vez.
+  '''
+  buf, base, lineno = '', 0, 1
+  chunks = iter(chunks)
+  final = False
+  while not final:
+    chunk = next(chunks, None)
+    final = chunk is None
+    if not final:
+      buf += chunk
+      if len(buf) < MARGIN + 1:
+        continue
+    stream, lineno, stop = scan(buf, TokenStream(buf, base), lineno=lineno, final=final,
+                                diagnostics=diagnostics)
+    yield from stream.tokens()
+    base += stop
+    buf = buf[stop:]
+
+
+def file_chunks(filename, chunk_size=CHUNK_SIZE, use_mmap=True):
+  '''
+  Trozos de texto (UTF-8) de un archivo, leídos de un mmap o, si no es
+  posible (archivo vacío, tubería...), con lecturas de chunk_size.
+  '''
+  decoder = getincrementaldecoder('utf-8')()
+  with open(filename, 'rb') as f:
+    reader = f
+    if use_mmap:
+      try:
+        reader = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+      except (ValueError, OSError):
+        reader = f
+    try:
+      while True:
+        data = reader.read(chunk_size)
+        if not data:
+          break
+        yield decoder.decode(data)
+      tail = decoder.decode(b'', final=True)
+      if tail:
+        yield tail
+    finally:
+      if reader is not f:
+        reader.close()
+
+
+def tokenize_file(filename, chunk_size=CHUNK_SIZE, use_mmap=True, diagnostics=None):
+  '''
+  Tokens de SLY de un archivo, generados de forma perezosa y con
+  memoria constante sin importar el tamaño del archivo. Los errores
+  léxicos van a diagnostics, con su desplazamiento en el archivo.
+  '''
+  return stream_tokens(file_chunks(filename, chunk_size, use_mmap), diagnostics)
@@ -0,0 +1,275 @@
+# incremental.py
+'''
+Análisis incremental por función
+================================
+Un editor llama a Context.parse en cada tecla. Units divide el fuente
+en las funciones del programa (unidades), cada una identificada por el
+hash de su texto, y guarda de la vez anterior su Function ya analizada
+y revisada:
+
+  - Sólo se vuelven a analizar (lexer + parser) las unidades cuyo texto
+    cambió. La división se hace con una sola expresión regular que
+    busca fun/begin/end (saltando comentarios y cadenas), sin el lexer.
+  - Sólo se vuelven a revisar las unidades nuevas y aquellas que usan
+    una función del programa cuya firma cambió. Al revisar una unidad
+    se registran las funciones del programa que busca (Call) y la firma
+    (Type internado de typesys) que tenían; si todas siguen siendo el
+    mismo objeto, la unidad se reutiliza tal cual.
+
+Si el fuente no se puede dividir (texto fuera de las funciones,
+comentarios sin cerrar, begin/end desbalanceados) Context vuelve al
+análisis completo, que informa los errores como siempre.
+
+Las unidades reutilizadas conservan sus nodos aunque se hayan movido en
+el fuente; relocate corrige sus pos/endpos sólo cuando hacen falta
+(p. ej. al informar un error).
+'''
+from dataclasses import dataclass
+from bisect import bisect_left, bisect_right
+from hashlib import blake2b
+from itertools import takewhile
+import re
+
+from model_ast import *
+from checker   import Checker, Symtab
+
+
+# fun/begin/end fuera de comentarios y cadenas. El grupo 'open' es un
+# comentario sin cerrar
+_words = re.compile(r'/\*[\s\S]*?\*/|(?P<open>/\*)|"(?:\\["n\\]|[^"\\])*"|\b(?P<word>fun|begin|end)\b')
+_blank = re.compile(r'(?:\s|/\*[\s\S]*?\*/)*')
+
+
+def split_units(source, pos=0, endpos=None):
+  '''
+  Lista de (inicio, fin) de cada función del programa en source[pos:endpos],
+  o None si no se puede dividir.
+  '''
+  endpos = len(source) if endpos is None else endpos
+  units = []
+  stack = []      # por función abierta: nivel de begin de su cuerpo (None: cabecera)
+  depth = 0
+  start = last = pos
+  for m in _words.finditer(source, pos, endpos):
+    word = m.group('word')
+    if m.group('open'):
+      return None
+    if word is None:
+      continue
+    if word == 'fun':
+      if not stack:
+        if not _blank.fullmatch(source, last, m.start()):
+          return None
+        start = m.start()
+      stack.append(None)
+    elif word == 'begin':
+      if not stack:
+        return None
+      if stack[-1] is None:
+        stack[-1] = depth
+      depth += 1
+    else:
+      depth -= 1
+      if depth < 0:
+        return None
+      if stack and stack[-1] == depth:
+        stack.pop()
+        if not stack:
+          units.append((start, m.end()))
+          last = m.end()
+  if stack or not _blank.fullmatch(source, last, endpos):
+    return None
+  return units
+
+
+def common_prefix(a, b):
+  # Largo del prefijo común, comparando trozos (en C) por búsqueda binaria
+  lo, hi = 0, min(len(a), len(b))
+  while lo < hi:
+    mid = (lo + hi + 1) // 2
+    if a[lo:mid] == b[lo:mid]:
+      lo = mid
+    else:
+      hi = mid - 1
+  return lo
+
+
+def common_suffix(a, b, limit):
+  lo, hi = 0, min(len(a), len(b), limit)
+  la, lb = len(a), len(b)
+  while lo < hi:
+    mid = (lo + hi + 1) // 2
+    if a[la - mid:la - lo] == b[lb - mid:lb - lo]:
+      lo = mid
+    else:
+      hi = mid - 1
+  return lo
+
+
+def reset_types(func):
+  '''
+  Borra los dtype que escribió la revisión anterior de func (de la
+  función, sus funciones anidadas y sus expresiones), para revisarla
+  como recién analizada: una llamada recursiva usa el dtype de la
+  función.
+  '''
+  for node in walk(func):
+    if isinstance(node, (Function, Relation, Binary, Unary)):
+      node.dtype = DataType(None)
+
+
+@dataclass(slots=True)
+class Unit:
+  '''
+  Una función del programa. signature es su firma (function(...) de
+  typesys) y deps las firmas de las funciones del programa que usaba la
+  última vez que se revisó (None: hay que revisarla). offset es el
+  inicio de la función en el fuente según los pos/endpos de sus nodos.
+  '''
+  key       : bytes
+  func      : Function
+  signature : object = None
+  deps      : dict = None
+  offset    : int = 0
+
+
+class DependencySymtab(Symtab):
+  '''
+  Tabla de símbolos del programa que anota las funciones buscadas en
+  ella mientras se revisa una unidad.
+  '''
+  def __init__(self, signatures):
+    super().__init__()
+    self.signatures = signatures
+    self.current = None
+    self.deps = {}
+
+  def get(self, name):
+    if self.current is not None and name != self.current:
+      self.deps[name] = self.signatures.get(name)
+    return super().get(name)
+
+
+class Units:
+  '''
+  Caché de unidades. Entre un parse y el siguiente sólo se vuelve a
+  dividir la zona editada (lo que no está en el prefijo ni en el sufijo
+  común con el fuente anterior); las unidades de afuera se conservan
+  con sus posiciones desplazadas.
+  '''
+
+  def __init__(self):
+    self.units = {}         # key -> Unit
+    self.order = []         # Unit de cada función del programa actual
+    self.spans = []         # (inicio, fin) de cada una en self.source
+    self.source = None
+    self.parsed = 0         # unidades analizadas / revisadas en la última vez
+    self.checked = 0
+    self.failed = False     # alguna unidad tenía errores de sintaxis
+
+  def split(self, source):
+    # (inicio, fin) de cada unidad y cuántas del principio y del final
+    # son las mismas de la vez anterior
+    old, spans = self.source, self.spans
+    if old is None:
+      return split_units(source), 0, 0
+    prefix = common_prefix(old, source)
+    suffix = common_suffix(old, source, min(len(old), len(source)) - prefix)
+    delta = len(source) - len(old)
+    # Se exige un carácter sin cambios después/antes de la unidad, para
+    # que el end/fun que la limita siga siendo una palabra completa
+    head = bisect_left(spans, prefix, key=lambda span: span[1])
+    tail = len(spans) - bisect_right(spans, len(old) - suffix, key=lambda span: span[0])
+    tail = min(tail, len(spans) - head)
+    lo = spans[head - 1][1] if head else 0
+    hi = spans[len(spans) - tail][0] + delta if tail else len(source)
+    middle = split_units(source, lo, hi)
+    if middle is None:
+      return split_units(source), 0, 0
+    moved = [(start + delta, end + delta) for start, end in spans[len(spans) - tail:]]
+    return spans[:head] + middle + moved, head, tail
+
+  def parse(self, source, lexer, parser):
+    '''
+    Program con una Function por unidad, o None si el fuente no se
+    puede dividir o alguna unidad tiene errores de sintaxis (failed; se
+    informan los de todas las unidades).
+    '''
+    self.failed = False
+    self.parsed = 0
+    spans, head, tail = self.split(source)
+    if not spans:
+      return None
+    order = self.order[:head]
+    lineno, last = 1, 0
+    for start, end in spans[head:len(spans) - tail]:
+      text = source[start:end]
+      key = blake2b(text.encode('utf-8'), digest_size=16).digest()
+      unit = self.units.get(key)
+      if unit is None:
+        lineno += source.count('\n', last, start)
+        last = start
+        reported = len(lexer.diagnostics or ())
+        tokens = lexer.tokenize(source, lineno, start)
+        ast = parser.parse(takewhile(lambda tok: tok.index < end, tokens))
+        self.parsed += 1
+        if (parser.errors or len(lexer.diagnostics or ()) > reported
+            or not isinstance(ast, Program) or len(ast.functions) != 1):
+          # Se siguen analizando las demás para informar todos los errores
+          self.failed = True
+          continue
+        unit = Unit(key, ast.functions[0], offset=start)
+      order.append(unit)
+    if self.failed:
+      return None
+    if tail:
+      order.extend(self.order[len(self.order) - tail:])
+    self.order, self.spans, self.source = order, spans, source
+    self.units = { unit.key: unit for unit in order }
+    return Program([unit.func for unit in order], pos=spans[0][0], endpos=spans[-1][1])
+
+  def relocate(self):
+    '''
+    Desplaza pos/endpos de los nodos de las unidades que se movieron en
+    el fuente desde que se analizaron.
+    '''
+    for unit, (start, end) in zip(self.order, self.spans):
+      delta = start - unit.offset
+      if delta:
+        for node in walk(unit.func):
+          if node.pos is not None:
+            node.pos += delta
+            node.endpos += delta
+        unit.offset = start
+
+  def check(self, program, env=None):
+    '''
+    Revisa program (devuelto por parse) como Checker.check, volviendo a
+    revisar sólo las unidades nuevas o cuyas dependencias cambiaron.
+    env es la tabla del programa (una DependencySymtab vacía), si se
+    quiere examinar después.
+    '''
+    if env is None:
+      env = DependencySymtab({})
+    signatures = env.signatures
+    checker = Checker(program)
+    self.checked = 0
+    for unit in self.order:
+      func = unit.func
+      if unit.deps is not None and all(signatures.get(name) is sig for name, sig in unit.deps.items()):
+        env.add(func.id, func)
+        checker.signatures[id(func)] = unit.signature
+      else:
+        unit.deps = None
+        env.current, env.deps = func.id, {}
+        reset_types(func)
+        func.accept(checker, env)
+        env.current = None
+        unit.signature = checker.signatures[id(func)]
+        unit.deps = env.deps
+        self.checked += 1
+      signatures[func.id] = unit.signature
+    main = env.get('main')
+    if main == None:
+      raise Exception("Main function not found")
+    return main.dtype.type
@@ -0,0 +1,230 @@
+# interp.py
+'''
+Intérprete directo del AST
+==========================
+Interpreter ejecuta un Program ya revisado recorriendo el AST en cada
+paso: cada nodo se despacha con visit, las variables se buscan por
+nombre en una cadena de entornos (diccionarios) y return/break son
+excepciones. Es la forma más simple de ejecutar PL0 y sirve de
+referencia para los demás motores (closures.py, pycompile.py, vm.py).
+'''
+import sys
+from array import array
+
+from model_ast import *
+from pycompile import call_pl0
+from vm        import VMError, read_tokens, read_value, float_to_int, int_to_float
+
+
+class ReturnSignal(Exception):
+  def __init__(self, value):
+    self.value = value
+
+
+class BreakSignal(Exception):
+  pass
+
+
+class Env:
+  '''
+  Variables de una activación. parent es el entorno de la función que
+  la contiene (alcance léxico) y funcs las funciones declaradas en ella.
+  '''
+  def __init__(self, parent=None):
+    self.parent = parent
+    self.vars  = {}
+    self.types = {}
+    self.funcs = {}
+
+  def lookup(self, name):
+    env = self
+    while env is not None:
+      if name in env.vars:
+        return env
+      env = env.parent
+    raise VMError(f'Variable {name} not found')
+
+  def function(self, name):
+    env = self
+    while env is not None:
+      if name in env.funcs:
+        return env.funcs[name], env
+      env = env.parent
+    raise VMError(f'Function {name} not found')
+
+
+class Interpreter(Visitor):
+
+  def __init__(self, stdin=None, stdout=None):
+    self.input = read_tokens(stdin if stdin is not None else sys.stdin)
+    self.stdout = stdout if stdout is not None else sys.stdout
+
+  @classmethod
+  def interpret(cls, ast, stdin=None, stdout=None):
+    vis = cls(stdin, stdout)
+    env = Env()
+    for func in ast.functions:
+      env.funcs[func.id] = func
+    main, _ = env.function('main')
+    return call_pl0(vis.call, (main, [], env))
+
+  def call(self, func, args, parent):
+    env = Env(parent)
+    for param, value in zip(func.parameters, args):
+      env.vars[param.id] = value
+      env.types[param.id] = param.type.type
+    for var in func.variables:
+      var.accept(self, env)
+    rtype = func.dtype.type or 'int'
+    try:
+      for stmt in func.statements:
+        stmt.accept(self, env)
+    except ReturnSignal as ret:
+      return self.convert(ret.value, rtype)
+    return 0.0 if rtype == 'float' else 0
+
+  def convert(self, value, dtype):
+    if dtype == 'float':
+      return value if type(value) is float else int_to_float(value)
+    if dtype == 'int':
+      return value if type(value) is int else float_to_int(value)
+    return value
+
+  # Declaraciones
+
+  def visit(self, n: Function, env: Env):
+    env.funcs[n.id] = n
+
+  def visit(self, n: Var, env: Env):
+    env.vars[n.id] = 0.0 if n.type.type == 'float' else 0
+    env.types[n.id] = n.type.type
+
+  def visit(self, n: VectorVar, env: Env):
+    size = n.size.accept(self, env)
+    if size < 0:
+      raise VMError('Negative vector size')
+    env.vars[n.id] = array('d' if n.type.type == 'float' else 'q', bytes(8 * size))
+    env.types[n.id] = n.type.type
+
+  # Sentencias
+
+  def visit(self, n: Assign, env: Env):
+    value = n.expr.accept(self, env)
+    owner = env.lookup(n.loct.id)
+    value = self.convert(value, owner.types[n.loct.id])
+    if isinstance(n.loct, Vector):
+      self.store(owner.vars[n.loct.id], n.loct.index.accept(self, env), value)
+    else:
+      owner.vars[n.loct.id] = value
+
+  def store(self, vec, index, value):
+    if index < 0:
+      raise IndexError
+    try:
+      vec[index] = value
+    except OverflowError:
+      raise VMError('Vector element overflow') from None
+
+  def visit(self, n: OneStmt, env: Env):
+    if n.key == 'print':
+      self.stdout.write(n.value)
+    elif n.key == 'write':
+      value = n.value.accept(self, env)
+      self.stdout.write('%.15g' % value if isinstance(value, float) else str(value))
+    elif n.key == 'read':
+      owner = env.lookup(n.value.id)
+      dtype = owner.types[n.value.id]
+      value = read_value(self.input, dtype == 'float')
+      if isinstance(n.value, Vector):
+        self.store(owner.vars[n.value.id], n.value.index.accept(self, env), value)
+      else:
+        owner.vars[n.value.id] = value
+    elif n.key == 'return':
+      raise ReturnSignal(n.value.accept(self, env))
+
+  def visit(self, n: DualStmt, env: Env):
+    if n.keyLeft == 'while':
+      try:
+        while n.left.accept(self, env):
+          n.right.accept(self, env)
+      except BreakSignal:
+        pass
+    elif n.left.accept(self, env):
+      n.right.accept(self, env)
+
+  def visit(self, n: TripleStmt, env: Env):
+    if n.left.accept(self, env):
+      n.middle.accept(self, env)
+    else:
+      n.right.accept(self, env)
+
+  def visit(self, n: Grouping, env: Env):
+    for stmt in n.expr:
+      stmt.accept(self, env)
+
+  def visit(self, n: Single, env: Env):
+    if n.key == 'break':
+      raise BreakSignal()
+
+  # Expresiones
+
+  def visit(self, n: Relation, env: Env):
+    if n.rel == 'and':
+      return n.left.accept(self, env) and n.right.accept(self, env)
+    if n.rel == 'or':
+      return n.left.accept(self, env) or n.right.accept(self, env)
+    left = n.left.accept(self, env)
+    right = n.right.accept(self, env)
+    if n.rel == '<':
+      return left < right
+    if n.rel == '<=':
+      return left <= right
+    if n.rel == '>':
+      return left > right
+    if n.rel == '>=':
+      return left >= right
+    if n.rel == '==':
+      return left == right
+    return left != right
+
+  def visit(self, n: Not, env: Env):
+    return not n.rel.accept(self, env)
+
+  def visit(self, n: Literal, env: Env):
+    return n.value
+
+  def visit(self, n: Ident, env: Env):
+    return env.lookup(n.id).vars[n.id]
+
+  def visit(self, n: Vector, env: Env):
+    index = n.index.accept(self, env)
+    if index < 0:
+      raise IndexError
+    return env.lookup(n.id).vars[n.id][index]
+
+  def visit(self, n: Binary, env: Env):
+    left = n.left.accept(self, env)
+    right = n.right.accept(self, env)
+    if n.op == '+':
+      return left + right
+    if n.op == '-':
+      return left - right
+    if n.op == '*':
+      return left * right
+    if isinstance(left, int) and isinstance(right, int):
+      q = abs(left) // abs(right)
+      return q if (left < 0) == (right < 0) else -q
+    return left / right
+
+  def visit(self, n: TypeCast, env: Env):
+    return self.convert(n.expr.accept(self, env), n.op)
+
+  def visit(self, n: Unary, env: Env):
+    value = n.expr.accept(self, env)
+    return -value if n.op == '-' else value
+
+  def visit(self, n: Call, env: Env):
+    func, owner = env.function(n.id)
+    args = [self.convert(arg.accept(self, env), param.type.type) if not isinstance(param, VectorVar)
+            else arg.accept(self, env) for arg, param in zip(n.expr, func.parameters)]
+    return self.call(func, args, owner)
@@ -1,44 +1,681 @@
+# ircode.py
+'''
+Código intermedio (IR) de tres direcciones para PL0
+===================================================
+IntermediateCodeGenerator recorre el AST ya revisado por Checker y
+genera, para cada función, un IRFunction: instrucciones de tres
+direcciones sobre registros virtuales (sin límite), agrupadas en
+bloques básicos que forman el grafo de flujo de control (CFG).
+
+Cada instrucción es un registro Instr(op, a, b, c) con un opcode de Op
+y tres operandos enteros. OPERANDS indica qué es cada operando:
+
+  d   registro destino (definición)
+  r   valor usado: un registro (>= 0) o una constante (< 0, ~k es el
+      índice en IRFunction.consts)
+  l   etiqueta de un bloque
+  f   índice de una función en IRProgram.functions
+  k   índice en IRProgram.strings
+  i   valor inmediato
+  -   sin uso
+
+Los registros 0..nvars-1 son los parámetros y las variables locales de
+la función (en ese orden); los demás son temporales. Los vectores son
+registros que contienen la referencia al arreglo.
+
+Cada bloque termina en una sola instrucción de salto: JUMP, BR (salto
+condicional a dos bloques) o RET. Las relaciones producen 0 o 1 en un
+registro y los and/or se evalúan en cortocircuito con bloques.
+
+Las funciones anidadas leen y escriben las variables de las funciones
+que las contienen con UPLOAD/UPSTORE (niveles hacia afuera, registro).
+'''
+from dataclasses import dataclass, field
+from enum import IntEnum
+from math import copysign
+from typing import List
+
 from model_ast import *
 
 
-class IntermediateCodeGenerator:
-    def __init__(self):
-        self.target = 1
-        self.code = []
-        self.stack = []
+class Op(IntEnum):
+  MOV     = 0
+  ADDI    = 1
+  SUBI    = 2
+  MULI    = 3
+  DIVI    = 4
+  ADDF    = 5
+  SUBF    = 6
+  MULF    = 7
+  DIVF    = 8
+  NEGI    = 9
+  NEGF    = 10
+  ITOF    = 11
+  FTOI    = 12
+  LT      = 13
+  LE      = 14
+  GT      = 15
+  GE      = 16
+  EQ      = 17
+  NE      = 18
+  LOADV   = 19
+  STOREV  = 20
+  UPLOAD  = 21
+  UPSTORE = 22
+  ARG     = 23
+  CALL    = 24
+  NEWVEC  = 25
+  READI   = 26
+  READF   = 27
+  WRITEI  = 28
+  WRITEF  = 29
+  PRINT   = 30
+  JUMP    = 31
+  BR      = 32
+  RET     = 33
+
+
+OPERANDS = {
+  Op.MOV:     'dr-',    # a := b
+  Op.ADDI:    'drr',    # a := b + c
+  Op.SUBI:    'drr',
+  Op.MULI:    'drr',
+  Op.DIVI:    'drr',    # división entera truncando hacia cero
+  Op.ADDF:    'drr',
+  Op.SUBF:    'drr',
+  Op.MULF:    'drr',
+  Op.DIVF:    'drr',
+  Op.NEGI:    'dr-',    # a := -b
+  Op.NEGF:    'dr-',
+  Op.ITOF:    'dr-',
+  Op.FTOI:    'dr-',
+  Op.LT:      'drr',    # a := b < c (0 o 1)
+  Op.LE:      'drr',
+  Op.GT:      'drr',
+  Op.GE:      'drr',
+  Op.EQ:      'drr',
+  Op.NE:      'drr',
+  Op.LOADV:   'drr',    # a := b[c]
+  Op.STOREV:  'rrr',    # a[b] := c
+  Op.UPLOAD:  'dii',    # a := registro c de la función b niveles afuera
+  Op.UPSTORE: 'iir',    # registro b de la función a niveles afuera := c
+  Op.ARG:     'ir-',    # argumento a de la siguiente llamada := b
+  Op.CALL:    'dfi',    # a := función b con c argumentos
+  Op.NEWVEC:  'dri',    # a := vector de b elementos (float si c)
+  Op.READI:   'd--',
+  Op.READF:   'd--',
+  Op.WRITEI:  'r--',
+  Op.WRITEF:  'r--',
+  Op.PRINT:   'k--',
+  Op.JUMP:    'l--',
+  Op.BR:      'rll',    # si a != 0 saltar a b, si no a c
+  Op.RET:     'r--',
+}
+
+ARITH = {
+  ('+', 'int'): Op.ADDI, ('-', 'int'): Op.SUBI, ('*', 'int'): Op.MULI, ('/', 'int'): Op.DIVI,
+  ('+', 'float'): Op.ADDF, ('-', 'float'): Op.SUBF, ('*', 'float'): Op.MULF, ('/', 'float'): Op.DIVF,
+}
+COMPARE    = { '<': Op.LT, '<=': Op.LE, '>': Op.GT, '>=': Op.GE, '==': Op.EQ, '!=': Op.NE }
+TERMINATORS = frozenset((Op.JUMP, Op.BR, Op.RET))
+
+
+def is_const(operand):
+  return operand < 0
+
+
+def has_call(n):
+  # La expresión n contiene una llamada
+  if isinstance(n, Call):
+    return True
+  if isinstance(n, (Binary, Relation)):
+    return has_call(n.left) or has_call(n.right)
+  if isinstance(n, Unary):
+    return has_call(n.expr)
+  if isinstance(n, Not):
+    return has_call(n.rel)
+  if isinstance(n, Vector):
+    return has_call(n.index)
+  return False
+
+
+def var_type(var):
+  # Tipo del registro de una variable: 'int', 'float', 'int[]' o 'float[]'
+  dtype = var.type.type
+  return dtype + '[]' if isinstance(var, VectorVar) else dtype
+
+
+def elem_type(dtype):
+  return dtype[:-2] if dtype.endswith('[]') else dtype
+
+
+class IRError(Exception):
+  '''
+  El programa usa algo que no se puede traducir al código intermedio.
+  '''
+  pass
+
+
+@dataclass(slots=True)
+class Instr:
+  op : Op
+  a  : int = 0
+  b  : int = 0
+  c  : int = 0
+
+  def operands(self):
+    return zip(OPERANDS[self.op], (self.a, self.b, self.c))
+
+  def defs(self):
+    # Registro definido (o None)
+    return self.a if OPERANDS[self.op][0] == 'd' else None
+
+  def uses(self):
+    # Registros leídos (sin las constantes)
+    return [v for kind, v in self.operands() if kind == 'r' and v >= 0]
+
+  def labels(self):
+    return [v for kind, v in self.operands() if kind == 'l']
+
+
+@dataclass(slots=True, eq=False)
+class Block:
+  label  : int
+  instrs : List[Instr] = field(default_factory=list)
+  succs  : List['Block'] = field(default_factory=list)
+  preds  : List['Block'] = field(default_factory=list)
+
+  @property
+  def terminator(self):
+    return self.instrs[-1] if self.instrs and self.instrs[-1].op in TERMINATORS else None
+
+
+class IRFunction:
+  '''
+  Código intermedio de una función: registros, constantes y bloques
+  básicos (blocks está en el orden de emisión; blocks[0] es la entrada).
+  '''
+  def __init__(self, name, index, rtype='int', parent=None):
+    self.name    = name
+    self.index   = index
+    self.rtype   = rtype
+    self.parent  = parent       # IRFunction que la contiene (o None)
+    self.depth   = 0 if parent is None else parent.depth + 1
+    self.nparams = 0
+    self.ptypes  = []
+    self.nvars   = 0
+    self.names   = []           # nombre de cada variable (registros 0..nvars-1)
+    self.regtypes = []          # 'int', 'float', 'int[]' o 'float[]'
+    self.captured = set()       # variables que usan las funciones anidadas
+    self.consts  = []
+    self.blocks  = []
+    self._const_ids = {}
+    self._next_label = 0
+
+  @property
+  def qualname(self):
+    if self.parent is None:
+      return self.name
+    return f'{self.parent.qualname}.{self.name}'
+
+  @property
+  def nregs(self):
+    return len(self.regtypes)
+
+  def new_reg(self, dtype):
+    self.regtypes.append(dtype)
+    return len(self.regtypes) - 1
+
+  def const(self, value):
+    # 0.0 y -0.0 son iguales (==) pero no son la misma constante
+    if isinstance(value, float):
+      key = (float, value, copysign(1.0, value))
+    else:
+      key = (type(value), value)
+    ident = self._const_ids.get(key)
+    if ident is None:
+      ident = self._const_ids[key] = len(self.consts)
+      self.consts.append(value)
+    return ~ident
+
+  def value(self, operand):
+    # Valor de una constante
+    return self.consts[~operand]
+
+  def type_of(self, operand):
+    if is_const(operand):
+      return 'float' if isinstance(self.value(operand), float) else 'int'
+    return self.regtypes[operand]
+
+  def new_block(self):
+    block = Block(self._next_label)
+    self._next_label += 1
+    self.blocks.append(block)
+    return block
+
+  def block_map(self):
+    return { b.label: b for b in self.blocks }
+
+  def instructions(self):
+    for block in self.blocks:
+      yield from block.instrs
+
+  def __len__(self):
+    return sum(len(b.instrs) for b in self.blocks)
+
+  def build_cfg(self):
+    '''
+    Calcula succs y preds de cada bloque y elimina los bloques que no
+    se alcanzan desde la entrada.
+    '''
+    labels = self.block_map()
+    for block in self.blocks:
+      block.succs = [labels[label] for label in block.terminator.labels()]
+      block.preds = []
+    seen = { self.blocks[0].label }
+    work = [self.blocks[0]]
+    while work:
+      for succ in work.pop().succs:
+        if succ.label not in seen:
+          seen.add(succ.label)
+          work.append(succ)
+    self.blocks = [b for b in self.blocks if b.label in seen]
+    for block in self.blocks:
+      for succ in block.succs:
+        if block not in succ.preds:
+          succ.preds.append(block)
+
+  def format_operand(self, kind, value, program=None):
+    if kind == 'd' or (kind == 'r' and value >= 0):
+      return f'r{value}'
+    if kind == 'r':
+      return repr(self.value(value))
+    if kind == 'l':
+      return f'B{value}'
+    if kind == 'f':
+      return program.functions[value].qualname if program else f'f{value}'
+    if kind == 'k':
+      return repr(program.strings[value]) if program else f'k{value}'
+    return str(value)
+
+  def format_instr(self, instr, program=None):
+    args = [self.format_operand(kind, value, program) for kind, value in instr.operands() if kind != '-']
+    return f'{instr.op.name:8} {", ".join(args)}'
+
+  def dump(self, program=None):
+    params = ', '.join(f'r{k} {self.names[k]}:{self.regtypes[k]}' for k in range(self.nparams))
+    lines = [f'function {self.qualname}({params}) -> {self.rtype}']
+    local = [f'r{k} {self.names[k]}:{self.regtypes[k]}' for k in range(self.nparams, self.nvars)]
+    if local:
+      lines.append(f'  vars: {", ".join(local)}')
+    for block in self.blocks:
+      preds = ' '.join(f'B{p.label}' for p in block.preds)
+      lines.append(f'B{block.label}:'.ljust(34) + f'; preds {preds}' if preds else f'B{block.label}:')
+      for instr in block.instrs:
+        lines.append(f'    {self.format_instr(instr, program)}')
+    return '\n'.join(lines)
+
+
+class IRProgram:
+
+  def __init__(self):
+    self.functions = []
+    self.strings   = []
+    self.main      = None
+
+  def function(self, name):
+    for func in self.functions:
+      if func.qualname == name:
+        return func
+    return None
+
+  def dump(self):
+    return '\n\n'.join(func.dump(self) for func in self.functions) + '\n'
+
+
+@dataclass(slots=True)
+class Symbol:
+  kind  : str               # 'var' o 'func'
+  index : int               # registro o índice de la función
+  type  : str
+  owner : IRFunction = None
+
+
+class Scope:
+
+  def __init__(self, owner=None, parent=None):
+    self.owner = owner
+    self.parent = parent
+    self.names = {}
+
+  def get(self, name):
+    scope = self
+    while scope is not None:
+      sym = scope.names.get(name)
+      if sym is not None:
+        return sym
+      scope = scope.parent
+    return None
+
+
+# ---------------------------------------------------------------------
+#  Generación del IR a partir del AST
+# ---------------------------------------------------------------------
+
+class IntermediateCodeGenerator(Visitor):
+
+  def __init__(self):
+    self.program = IRProgram()
+    self.func  = None
+    self.block = None
+    self.loops = []
+
+  def generate_code(self, ast):
+    ast.accept(self, Scope())
+    return self.program
+
+  # Emisión
+
+  def emit(self, op, a=0, b=0, c=0):
+    if self.block.terminator is not None:
+      # Código después de un salto (p. ej. tras return o break): nadie
+      # llega a este bloque y build_cfg lo eliminará
+      self.start(self.func.new_block())
+    instr = Instr(op, a, b, c)
+    self.block.instrs.append(instr)
+    return instr
+
+  def start(self, block):
+    # Continúa en block; el bloque anterior cae en él con un JUMP
+    if self.block is not None and self.block.terminator is None:
+      self.block.instrs.append(Instr(Op.JUMP, block.label))
+    self.block = block
+
+  def temp(self, dtype):
+    return self.func.new_reg(dtype)
+
+  def variable(self, name, scope):
+    sym = scope.get(name)
+    if sym is None or sym.kind != 'var':
+      raise IRError(f'Variable {name} not found')
+    return sym
+
+  def levels(self, sym):
+    return self.func.depth - sym.owner.depth
+
+  def load(self, sym):
+    # Registro con el valor de la variable sym
+    if sym.owner is self.func:
+      return sym.index
+    reg = self.temp(sym.type)
+    sym.owner.captured.add(sym.index)
+    self.emit(Op.UPLOAD, reg, self.levels(sym), sym.index)
+    return reg
+
+  def store(self, sym, value):
+    if sym.owner is self.func:
+      self.move(sym.index, value)
+    else:
+      sym.owner.captured.add(sym.index)
+      self.emit(Op.UPSTORE, self.levels(sym), sym.index, value)
+
+  def move(self, dst, value):
+    # Si value es el temporal que acaba de calcularse, se calcula
+    # directamente en dst
+    last = self.block.instrs[-1] if self.block.instrs else None
+    if value >= self.func.nvars and last is not None and last.defs() == value:
+      last.a = dst
+    elif dst != value:
+      self.emit(Op.MOV, dst, value)
+
+  def declare(self, n, scope, parent):
+    index = len(self.program.functions)
+    func = IRFunction(n.id, index, n.dtype.type or 'int', parent)
+    func.ptypes = [var_type(param) for param in n.parameters]
+    self.program.functions.append(func)
+    if n.id in scope.names:
+      raise IRError(f'Symbol {n.id} already defined')
+    scope.names[n.id] = Symbol('func', index, func.rtype, func)
+
+  # Declaraciones
+
+  def visit(self, n: Program, scope: Scope):
+    for func in n.functions:
+      self.declare(func, scope, None)
+    for func in n.functions:
+      func.accept(self, scope)
+    main = scope.get('main')
+    if main is None or main.kind != 'func':
+      raise IRError('Main function not found')
+    self.program.main = main.index
+    return self.program
+
+  def visit(self, n: Function, scope: Scope):
+    sym = scope.names[n.id]
+    saved = (self.func, self.block, self.loops)
+    func = self.func = sym.owner
+    self.block, self.loops = None, []
+    env = Scope(func, scope)
+    for param in n.parameters:
+      param.accept(self, env)
+    func.nparams = len(n.parameters)
+    nested = [var for var in n.variables if isinstance(var, Function)]
+    for var in n.variables:
+      if isinstance(var, Function):
+        self.declare(var, env, func)
+      else:
+        var.accept(self, env)
+    func.nvars = len(func.regtypes)
+    self.start(func.new_block())
+    for var in n.variables:
+      if isinstance(var, VectorVar):
+        vec = env.names[var.id]
+        size = self.expr(var.size, env, 'int')
+        self.emit(Op.NEWVEC, vec.index, size, int(vec.type == 'float[]'))
+    for stmt in n.statements:
+      stmt.accept(self, env)
+    self.emit(Op.RET, func.const(0.0 if func.rtype == 'float' else 0))
+    func.build_cfg()
+    for var in nested:
+      var.accept(self, env)
+    self.func, self.block, self.loops = saved
+
+  def visit(self, n: Var, scope: Scope):
+    self.local(n.id, var_type(n), scope)
+
+  def visit(self, n: DataType, scope: Scope):
+    return n.type
+
+  def local(self, name, dtype, scope):
+    if name in scope.names:
+      raise IRError(f'Symbol {name} already defined')
+    scope.names[name] = Symbol('var', self.func.new_reg(dtype), dtype, self.func)
+    self.func.names.append(name)
+
+  # Sentencias
+
+  def visit(self, n: Assign, scope: Scope):
+    sym = self.variable(n.loct.id, scope)
+    if isinstance(n.loct, Vector):
+      index = self.expr(n.loct.index, scope, 'int')
+      value = self.expr(n.expr, scope, elem_type(sym.type))
+      self.emit(Op.STOREV, self.load(sym), index, value)
+    else:
+      self.store(sym, self.expr(n.expr, scope, sym.type))
+
+  def visit(self, n: OneStmt, scope: Scope):
+    if n.key == 'print':
+      self.program.strings.append(n.value)
+      self.emit(Op.PRINT, len(self.program.strings) - 1)
+    elif n.key == 'write':
+      value, dtype = n.value.accept(self, scope)
+      self.emit(Op.WRITEF if dtype == 'float' else Op.WRITEI, value)
+    elif n.key == 'read':
+      sym = self.variable(n.value.id, scope)
+      dtype = elem_type(sym.type)
+      value = self.temp(dtype)
+      if isinstance(n.value, Vector):
+        index = self.expr(n.value.index, scope, 'int')
+        self.emit(Op.READF if dtype == 'float' else Op.READI, value)
+        self.emit(Op.STOREV, self.load(sym), index, value)
+      else:
+        self.emit(Op.READF if dtype == 'float' else Op.READI, value)
+        self.store(sym, value)
+    elif n.key == 'return':
+      self.emit(Op.RET, self.expr(n.value, scope, self.func.rtype))
+
+  def visit(self, n: DualStmt, scope: Scope):
+    func = self.func
+    if n.keyLeft == 'while':
+      test, body, end = func.new_block(), func.new_block(), func.new_block()
+      self.start(test)
+      n.left.accept(self, scope, body, end)
+      self.start(body)
+      self.loops.append(end)
+      n.right.accept(self, scope)
+      self.loops.pop()
+      self.start(test)
+      self.block = None
+      self.start(end)
+    else:
+      then, end = func.new_block(), func.new_block()
+      n.left.accept(self, scope, then, end)
+      self.start(then)
+      n.right.accept(self, scope)
+      self.start(end)
+
+  def visit(self, n: TripleStmt, scope: Scope):
+    func = self.func
+    then, orelse, end = func.new_block(), func.new_block(), func.new_block()
+    n.left.accept(self, scope, then, orelse)
+    self.start(then)
+    n.middle.accept(self, scope)
+    self.emit(Op.JUMP, end.label)
+    self.block = orelse
+    n.right.accept(self, scope)
+    self.start(end)
+
+  def visit(self, n: Grouping, scope: Scope):
+    for stmt in n.expr:
+      stmt.accept(self, scope)
+
+  def visit(self, n: Single, scope: Scope):
+    if n.key == 'break':
+      if not self.loops:
+        raise IRError('break outside of a loop')
+      self.emit(Op.JUMP, self.loops[-1].label)
+
+  # Condiciones: saltan al bloque true si se cumplen y a false si no
+
+  def visit(self, n: Relation, scope: Scope, true: Block, false: Block):
+    if n.rel == 'and' or n.rel == 'or':
+      right = self.func.new_block()
+      if n.rel == 'and':
+        n.left.accept(self, scope, right, false)
+      else:
+        n.left.accept(self, scope, true, right)
+      self.block = right
+      n.right.accept(self, scope, true, false)
+      return
+    left, right, _ = self.operands(n.left, n.right, scope)
+    test = self.temp('int')
+    self.emit(COMPARE[n.rel], test, left, right)
+    self.emit(Op.BR, test, true.label, false.label)
+
+  def visit(self, n: Not, scope: Scope, true: Block, false: Block):
+    n.rel.accept(self, scope, false, true)
+
+  # Expresiones: devuelven (operando, tipo)
+
+  def expr(self, n, scope, dtype):
+    value, etype = n.accept(self, scope)
+    if etype != dtype:
+      conv = self.temp(dtype)
+      self.emit(Op.ITOF if dtype == 'float' else Op.FTOI, conv, value)
+      return conv
+    return value
+
+  def operands(self, left, right, scope):
+    lvalue, ltype = left.accept(self, scope)
+    if has_call(right):
+      lvalue = self.snapshot(lvalue)
+    rvalue, rtype = right.accept(self, scope)
+    if ltype != rtype:
+      if ltype == 'int':
+        lvalue = self.convert(lvalue)
+      else:
+        rvalue = self.convert(rvalue)
+    return lvalue, rvalue, 'float' if 'float' in (ltype, rtype) else 'int'
+
+  def snapshot(self, value):
+    # Copia de una variable cuyo valor se usa después de una llamada (que
+    # puede cambiarla desde una función anidada); el optimizador quita la
+    # copia si la variable no es capturada
+    if is_const(value) or value >= self.func.nvars:
+      return value
+    copy = self.temp(self.func.regtypes[value])
+    self.emit(Op.MOV, copy, value)
+    return copy
+
+  def convert(self, value):
+    conv = self.temp('float')
+    self.emit(Op.ITOF, conv, value)
+    return conv
+
+  def visit(self, n: Integer, scope: Scope):
+    return self.func.const(n.value), 'int'
+
+  def visit(self, n: Float, scope: Scope):
+    return self.func.const(n.value), 'float'
 
-    def visit(self, node: Literal):
-        value, target = node.value, self.target
-        if node.type == 'int':
-          self.code.append(f"MOVI {value }, {target}")
-        elif node.type == 'float':
-          self.code.append(f"MOVF {value}, {target}")
-        self.target += 1
+  def visit(self, n: Ident, scope: Scope):
+    sym = self.variable(n.id, scope)
+    return self.load(sym), sym.type
 
-    def visit(self, node: Var):
-        name = node.id
-        if node.type == 'int':
-          self.code.append(f"VARI {name}")
-        elif node.type == 'float':
-          self.code.append(f"VARF {name}")
-        self.stack.append(node)
+  def visit(self, n: Vector, scope: Scope):
+    sym = self.variable(n.id, scope)
+    index = self.expr(n.index, scope, 'int')
+    dtype = elem_type(sym.type)
+    reg = self.temp(dtype)
+    self.emit(Op.LOADV, reg, self.load(sym), index)
+    return reg, dtype
 
-    def visit(self, node: Ident):
-        name = node.name
-        self.code.append(f"ALLOCI {name}")
+  def visit(self, n: Binary, scope: Scope):
+    left, right, dtype = self.operands(n.left, n.right, scope)
+    reg = self.temp(dtype)
+    self.emit(ARITH[n.op, dtype], reg, left, right)
+    return reg, dtype
 
-    def visit_LOADI(self, node):
-        name, target = node.name, node.target
-        self.code.append(f"LOADI {name}, {target}")
+  def visit(self, n: TypeCast, scope: Scope):
+    return self.expr(n.expr, scope, n.op), n.op
 
-    def visit_STOREI(self, node):
-        target, name = node.target, node.name
-        self.code.append(f"STOREI {target}, {name}")
+  def visit(self, n: Unary, scope: Scope):
+    value, dtype = n.expr.accept(self, scope)
+    if n.op != '-':
+      return value, dtype
+    reg = self.temp(dtype)
+    self.emit(Op.NEGF if dtype == 'float' else Op.NEGI, reg, value)
+    return reg, dtype
 
-    # Implement the remaining visit methods for other instructions...
+  def visit(self, n: Call, scope: Scope):
+    sym = scope.get(n.id)
+    if sym is None or sym.kind != 'func':
+      raise IRError(f'Function {n.id} not found')
+    args = []
+    for k, (arg, ptype) in enumerate(zip(n.expr, sym.owner.ptypes)):
+      value = self.expr(arg, scope, ptype)
+      if any(has_call(later) for later in n.expr[k + 1:]):
+        value = self.snapshot(value)
+      args.append(value)
+    for k, value in enumerate(args):
+      self.emit(Op.ARG, k, value)
+    reg = self.temp(sym.type)
+    self.emit(Op.CALL, reg, sym.index, len(args))
+    return reg, sym.type
 
-    def generate_code(self, ast):
-        for node in ast:
-            self.visit(node)
 
-        return self.code
+def generate_ir(ast):
+  '''
+  IR de un AST ya revisado por Checker.
+  '''
+  return IntermediateCodeGenerator().generate_code(ast)
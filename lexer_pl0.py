@@ -16,6 +16,10 @@ class LexerForPL0(Lexer):
   # ignore spaces and tabs
   ignore = ' \t\r'
 
+  # Si no es None, los errores se guardan aquí (sourcemap.Diagnostics)
+  # en vez de imprimirse
+  diagnostics = None
+
   # ignore comments
   @_(r'/\*[\s\S]*?\*/')
   def ignore_comment(self, t):
@@ -31,9 +35,7 @@ class LexerForPL0(Lexer):
   # float number
   @_(r'(0|[1-9]\d*)(\.\d+)?(\d[e][+-]?\d+)?(?![\d])')
   def FLOAT(self, t):
-    if '.' in t.value:
-      if 'e' not in t.value:
-        t.value = float(t.value)
+    t.value = float(t.value)
     return t
 
   # string
@@ -92,19 +94,25 @@ class LexerForPL0(Lexer):
   # uncompleted comment
   @_(r'/\*.*[\s\S]*(?!\*/)')
   def uncompleted_comment(self, t):
-    print(f'Uncompleted comment {t.value[0:5]} at line {t.lineno}')
+    self.report(f'Uncompleted comment {t.value[0:5]}', t)
     self.index += 1
 
   # error handling
   @_(r'[^\s]+')
   def error(self, t):
-    print(f'Illegal character {t.value[0:5]}  at line {t.lineno}')
+    self.report(f'Illegal character {t.value[0:5]}', t)
     next = self.index
     if self.text[next:next+1] == '\n':
       self.lineno += 1
     self.index += 1
     #self.lineno += 1
 
+  def report(self, message, t):
+    if self.diagnostics is None:
+      print(f'{message} at line {t.lineno}')
+    else:
+      self.diagnostics.add(message, t.index, t.index + 1, t.lineno)
+
 def print_lexer(source):
   #print tokens using rich library
   lexer = LexerForPL0()
@@ -121,7 +129,14 @@ def print_lexer(source):
     console.print('\nNO TOKENS FOUND\n')
   else:
     console.print(table)
-  
+
+
+def print_tokens(tokens):
+  # Una fila por token a medida que llegan, sin acumular una tabla
+  # (para entradas grandes que se analizan por trozos)
+  for tok in tokens:
+    print(f'{tok.type:10} {str(tok.value):20} {tok.lineno:>8} {tok.index:>10} {tok.end:>10}')
+
 
 if __name__ == '__main__':
   if len(argv) != 2:
@@ -0,0 +1,77 @@
+# lifting.py
+'''
+Lambda lifting
+==============
+Una función anidada (declarada en el varList de otra) que no usa
+variables de las funciones que la contienen no necesita enlace estático
+ni display: se puede convertir en una función del programa. Así las
+llamadas recursivas a un ayudante anidado cuestan lo mismo que a
+cualquier función externa en todos los backends (la VM no publica su
+marco, C no pasa el enlace 'up', las closures no lo calculan y Python
+no la define de nuevo en cada llamada a la función que la contiene).
+
+Una función F se puede sacar si F y las funciones anidadas en ella:
+
+  - sólo usan variables propias o de funciones anidadas dentro de F
+  - sólo llaman a funciones de F, a funciones del programa o a otras
+    funciones que también se sacan
+
+(la segunda condición se resuelve por punto fijo). Usa las direcciones
+de resolver.py; después de lift hay que volver a llamar a resolve.
+
+La función sacada toma su nombre calificado (externa.interna), que no
+choca con ningún identificador de PL0, y se agrega a Program.functions
+antes de la función del programa que la contenía. Las llamadas a ella
+(Frame.sites) se renombran.
+'''
+from model_ast import *
+
+
+def inside(frames, slot):
+  # Slots de la función slot y de todas las anidadas en ella
+  found = [slot]
+  for k in found:
+    found.extend(frames[k].nested)
+  return set(found)
+
+
+def liftable(frames):
+  '''
+  Slots de las funciones anidadas que se pueden sacar.
+  '''
+  candidates = { slot for slot, frame in enumerate(frames) if frame.depth > 0 }
+  closed = { slot: inside(frames, slot) for slot in candidates }
+  changed = True
+  while changed:
+    changed = False
+    for slot in sorted(candidates):
+      body, depth = closed[slot], frames[slot].depth
+      free = any(d < depth for k in body for d, _ in frames[k].free)
+      calls = any(callee not in body and frames[callee].depth > 0 and callee not in candidates
+                  for k in body for callee in frames[k].calls)
+      if free or calls:
+        candidates.discard(slot)
+        changed = True
+  return candidates
+
+
+def lift(ast, frames):
+  '''
+  Saca las funciones anidadas que no usan variables externas. Devuelve
+  sus nombres calificados.
+  '''
+  slots = liftable(frames)
+  lifted = []
+  for slot in sorted(slots, key=lambda k: -frames[k].depth):
+    frame = frames[slot]
+    func = frame.node
+    frame.parent.node.variables.remove(func)
+    top = frame
+    while top.depth > 0:
+      top = top.parent
+    func.id = frame.name
+    for call in frame.sites:
+      call.id = frame.name
+    ast.functions.insert(ast.functions.index(top.node), func)
+    lifted.append(frame.name)
+  return sorted(lifted)
@@ -0,0 +1,297 @@
+# loops.py
+'''
+Optimización de ciclos sobre el código intermedio (ircode)
+==========================================================
+Los ciclos se detectan en el CFG de cada IRFunction como ciclos
+naturales: una arista de vuelta B -> H (H domina a B) define un ciclo
+con cabecera H formado por H y los bloques que llegan a B sin pasar por
+H. Los ciclos con la misma cabecera se unen.
+
+Transformaciones (pasadas de optimizer.py en -O2):
+
+  licm       movimiento de código invariante: las instrucciones cuyo
+             valor no cambia dentro del ciclo se mueven al
+             preencabezado (un bloque que se ejecuta una vez antes de
+             entrar al ciclo)
+  strength   reducción de fuerza: t := i * a, con i una variable de
+             inducción básica y a invariante, se reemplaza por un
+             registro que se inicializa en el preencabezado y se
+             incrementa junto con i
+
+Una variable de inducción básica es un registro con una sola definición
+en el ciclo, de la forma i := i + c o i := i - c con c constante.
+
+Sólo se adelantan al preencabezado las instrucciones que no pueden
+fallar (LOADV, UPLOAD y divisiones por algo que no es una constante
+distinta de cero sólo si su bloque se ejecuta siempre en cada vuelta) y
+cuyo resultado no se usa al salir del ciclo sin haberlas ejecutado.
+'''
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Set
+
+from dataflow import dominators, liveness
+from ircode   import Block, Instr, Op, is_const
+
+
+@dataclass(slots=True)
+class Loop:
+  header    : Block
+  blocks    : Set[int]                     # etiquetas (incluye la cabecera)
+  latches   : List[Block] = field(default_factory=list)
+  preheader : Block = None
+
+
+def find_loops(func):
+  '''
+  Ciclos naturales de func, de los más internos (más pequeños) a los
+  más externos.
+  '''
+  dom = dominators(func)
+  loops = {}
+  for block in func.blocks:
+    for succ in block.succs:
+      if succ.label not in dom[block.label]:
+        continue
+      loop = loops.get(succ.label)
+      if loop is None:
+        loop = loops[succ.label] = Loop(succ, { succ.label })
+      loop.latches.append(block)
+      work = [block]
+      while work:
+        b = work.pop()
+        if b.label not in loop.blocks:
+          loop.blocks.add(b.label)
+          work.extend(b.preds)
+  return sorted(loops.values(), key=lambda loop: (len(loop.blocks), loop.header.label))
+
+
+def ensure_preheader(func, loop):
+  '''
+  Bloque por el que se entra al ciclo desde afuera. Si no hay uno que
+  sólo salte a la cabecera, se crea y se ubica justo antes de ella.
+  '''
+  header = loop.header
+  outside = [p for p in header.preds if p.label not in loop.blocks]
+  if len(outside) == 1 and outside[0].terminator.op is Op.JUMP:
+    loop.preheader = outside[0]
+    return outside[0]
+  pre = func.new_block()
+  func.blocks.remove(pre)
+  func.blocks.insert(func.blocks.index(header), pre)
+  pre.instrs.append(Instr(Op.JUMP, header.label))
+  for block in outside:
+    term = block.terminator
+    if term.b == header.label and term.op is Op.BR:
+      term.b = pre.label
+    if term.c == header.label and term.op is Op.BR:
+      term.c = pre.label
+    if term.a == header.label and term.op is Op.JUMP:
+      term.a = pre.label
+  func.build_cfg()
+  loop.preheader = pre
+  return pre
+
+
+def loop_defs(func, loop, labels):
+  # Número de definiciones de cada registro dentro del ciclo
+  defs = Counter()
+  for label in loop.blocks:
+    for instr in labels[label].instrs:
+      dst = instr.defs()
+      if dst is not None:
+        defs[dst] += 1
+      if instr.op is Op.CALL:
+        defs.update(func.captured)
+  return defs
+
+
+def exits(func, loop, labels):
+  # (bloques del ciclo con un sucesor afuera, sucesores de afuera)
+  exiting, targets = [], []
+  for label in loop.blocks:
+    block = labels[label]
+    outside = [s for s in block.succs if s.label not in loop.blocks]
+    if outside:
+      exiting.append(block)
+      targets.extend(outside)
+  return exiting, targets
+
+
+# ---------------------------------------------------------------------
+#  Movimiento de código invariante
+# ---------------------------------------------------------------------
+
+HOISTABLE = frozenset((
+  Op.MOV, Op.ADDI, Op.SUBI, Op.MULI, Op.DIVI, Op.ADDF, Op.SUBF, Op.MULF,
+  Op.DIVF, Op.NEGI, Op.NEGF, Op.ITOF, Op.FTOI, Op.LT, Op.LE, Op.GT,
+  Op.GE, Op.EQ, Op.NE, Op.LOADV, Op.UPLOAD,
+))
+MEMORY_READS  = frozenset((Op.LOADV, Op.UPLOAD))
+MEMORY_WRITES = frozenset((Op.STOREV, Op.UPSTORE, Op.CALL))
+
+
+def may_fail(func, instr):
+  if instr.op in MEMORY_READS:
+    return True
+  if instr.op is Op.DIVI or instr.op is Op.DIVF:
+    return not is_const(instr.c) or func.value(instr.c) == 0
+  return False
+
+
+def hoist_loop(func, loop):
+  '''
+  Mueve las instrucciones invariantes de loop a su preencabezado.
+  Devuelve cuántas movió.
+  '''
+  pre = ensure_preheader(func, loop)
+  labels = func.block_map()
+  dom = dominators(func)
+  live_in, _ = liveness(func)
+  defs = loop_defs(func, loop, labels)
+  exiting, targets = exits(func, loop, labels)
+  exit_live = set().union(*(live_in[t.label] for t in targets))
+  stores = any(instr.op in MEMORY_WRITES for label in loop.blocks for instr in labels[label].instrs)
+  order = [b for b in func.blocks if b.label in loop.blocks]
+
+  header_live = live_in[loop.header.label]
+
+  def invariant(kind, value):
+    return kind != 'r' or is_const(value) or defs[value] == 0
+
+  def movable(instr, always):
+    dst = instr.defs()
+    if instr.op not in HOISTABLE or defs[dst] != 1 or dst in header_live:
+      return False
+    if not all(invariant(kind, value) for kind, value in instr.operands()):
+      return False
+    if instr.op in MEMORY_READS and stores:
+      return False
+    # Si el bloque no se ejecuta en todas las vueltas, la instrucción no
+    # debe poder fallar ni cambiar un valor que se usa al salir
+    return always or (dst not in exit_live and not may_fail(func, instr))
+
+  moved = 0
+  changed = True
+  while changed:
+    changed = False
+    for block in order:
+      always = all(block.label in dom[e.label] for e in exiting)
+      kept = []
+      for instr in block.instrs:
+        if movable(instr, always):
+          pre.instrs.insert(-1, instr)
+          defs[instr.a] = 0
+          moved += 1
+          changed = True
+        else:
+          kept.append(instr)
+      block.instrs = kept
+  return moved
+
+
+def for_each_loop(func, transform):
+  '''
+  Aplica transform(func, loop) a cada ciclo, de adentro hacia afuera.
+  Los ciclos se vuelven a calcular después de cada uno porque los
+  preencabezados nuevos pasan a formar parte de los ciclos externos.
+  '''
+  done = set()
+  total = 0
+  while True:
+    pending = [loop for loop in find_loops(func) if loop.header.label not in done]
+    if not pending:
+      return total
+    loop = pending[0]
+    done.add(loop.header.label)
+    total += transform(func, loop)
+
+
+def hoist_invariants(func):
+  return for_each_loop(func, hoist_loop)
+
+
+# ---------------------------------------------------------------------
+#  Variables de inducción y reducción de fuerza
+# ---------------------------------------------------------------------
+
+def induction_variables(func, loop, labels=None):
+  '''
+  Variables de inducción básicas de loop: diccionario registro ->
+  (instrucción que la incrementa, paso constante).
+  '''
+  labels = labels or func.block_map()
+  defs = loop_defs(func, loop, labels)
+  ivs = {}
+  for label in loop.blocks:
+    for instr in labels[label].instrs:
+      op, a, b, c = instr.op, instr.a, instr.b, instr.c
+      if op is not Op.ADDI and op is not Op.SUBI or defs[a] != 1:
+        continue
+      if b == a and is_const(c):
+        step = func.value(c)
+      elif op is Op.ADDI and c == a and is_const(b):
+        step = func.value(b)
+      else:
+        continue
+      ivs[a] = (instr, step if op is Op.ADDI else -step)
+  return ivs
+
+
+def reduce_loop(func, loop):
+  '''
+  Reemplaza t := i * a (i variable de inducción básica, a invariante)
+  por t := s, donde s = i * a se calcula en el preencabezado y se
+  incrementa en a * paso cada vez que cambia i. Devuelve cuántas
+  multiplicaciones reemplazó.
+  '''
+  labels = func.block_map()
+  ivs = induction_variables(func, loop, labels)
+  if not ivs:
+    return 0
+  defs = loop_defs(func, loop, labels)
+
+  def invariant(value):
+    return is_const(value) or defs[value] == 0
+
+  candidates = []
+  for label in sorted(loop.blocks):
+    for instr in labels[label].instrs:
+      if instr.op is not Op.MULI or defs[instr.a] != 1 or instr.a in ivs:
+        continue
+      if instr.b in ivs and invariant(instr.c):
+        candidates.append((instr, instr.b, instr.c))
+      elif instr.c in ivs and invariant(instr.b):
+        candidates.append((instr, instr.c, instr.b))
+  if not candidates:
+    return 0
+
+  pre = ensure_preheader(func, loop)
+  labels = func.block_map()
+  reduced = {}          # (i, a) -> registro s
+  for instr, iv, factor in candidates:
+    s = reduced.get((iv, factor))
+    if s is None:
+      s = reduced[iv, factor] = func.new_reg('int')
+      update, step = ivs[iv]
+      pre.instrs.insert(-1, Instr(Op.MULI, s, iv, factor))
+      if is_const(factor):
+        delta = func.const(func.value(factor) * step)
+      elif step == 1:
+        delta = factor
+      else:
+        delta = func.new_reg('int')
+        pre.instrs.insert(-1, Instr(Op.MULI, delta, factor, func.const(step)))
+      # s se actualiza justo después de i
+      for label in loop.blocks:
+        instrs = labels[label].instrs
+        pos = next((k for k, i in enumerate(instrs) if i is update), None)
+        if pos is not None:
+          instrs.insert(pos + 1, Instr(Op.ADDI, s, s, delta))
+          break
+    instr.op, instr.b, instr.c = Op.MOV, s, 0
+  return len(candidates)
+
+
+def reduce_strength(func):
+  return for_each_loop(func, reduce_loop)
@@ -0,0 +1,258 @@
+# memstats.py
+'''
+Memoria de cada fase del compilador
+===================================
+MemoryTracker (context.memory = MemoryTracker()) usa tracemalloc para
+medir, en cada fase por la que pasa un Context (las mismas que mide
+timing.PassTimer), el pico de memoria durante la fase y la memoria que
+queda retenida al terminar (la diferencia con la del inicio). Además
+cuenta objetos:
+
+  - tokens: tamaño medio de un token (el objeto y su valor), es decir
+    lo que costaría guardar la lista de tokens (el parser los consume
+    uno a uno y no la guarda)
+  - AST: número de nodos y bytes por clase de model_ast (el nodo, sus
+    listas y sus valores propios; los DataType son compartidos)
+  - Symtab: número de tablas (una por función más la del programa),
+    símbolos y bytes del árbol que arma el checker
+
+Con budget (bytes) la compilación se detiene con MemoryBudgetError en
+cuanto la memoria pasa del límite: al terminar cada fase y, dentro del
+lexer/parser, cada CHECK_TOKENS tokens. La excepción lleva el informe
+hasta ese momento.
+'''
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+import json
+import re
+import sys
+import tracemalloc
+
+from model_ast import *
+
+# Cada cuántos tokens se revisa el presupuesto durante el parse
+CHECK_TOKENS = 4096
+
+_units = { '': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3 }
+
+
+class MemoryBudgetError(Exception):
+  '''
+  La compilación pasó del presupuesto de memoria. report es el informe
+  de MemoryTracker hasta ese momento.
+  '''
+  def __init__(self, message, report=None):
+    super().__init__(message)
+    self.report = report
+
+
+def parse_size(text):
+  '''
+  Bytes de un tamaño como '512M', '2G', '64k' o '1000000'.
+  '''
+  m = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([kKmMgG]?)i?[bB]?\s*', text)
+  if m is None:
+    raise ValueError(f'Invalid size {text!r}')
+  return int(float(m.group(1)) * _units[m.group(2).upper()])
+
+
+def size(n):
+  for unit in ('B', 'KiB', 'MiB'):
+    if abs(n) < 1024:
+      return f'{n:.0f} {unit}' if unit == 'B' else f'{n:.1f} {unit}'
+    n /= 1024
+  return f'{n:.1f} GiB'
+
+
+@dataclass(slots=True)
+class PhaseMemory:
+  name     : str
+  calls    : int = 0
+  peak     : int = 0      # pico (bytes trazados) durante la fase
+  retained : int = 0      # bytes que quedaron al terminar (acumulado)
+  current  : int = 0      # bytes trazados al terminar (la última vez)
+
+
+@dataclass(slots=True)
+class _Open:
+  name  : str
+  start : int
+  peak  : int
+
+
+def node_sizes(ast):
+  '''
+  {clase: [nodos, bytes]} de los nodos del AST.
+  '''
+  found = {}
+  names = {}
+  for node in walk(ast):
+    kind = type(node)
+    if kind not in names:
+      names[kind] = tuple(f.name for f in fields(kind) if f.name not in SPAN_FIELDS)
+    nbytes = sys.getsizeof(node)
+    for name in names[kind]:
+      value = getattr(node, name)
+      if isinstance(value, list):
+        nbytes += sys.getsizeof(value)
+      elif isinstance(value, (str, int, float)):
+        nbytes += sys.getsizeof(value)
+    entry = found.setdefault(kind.__name__, [0, 0])
+    entry[0] += 1
+    entry[1] += nbytes
+  return found
+
+
+def symtab_sizes(env):
+  '''
+  (tablas, símbolos, bytes) del árbol de Symtab con raíz env.
+  '''
+  scopes = symbols = nbytes = 0
+  stack = [env]
+  while stack:
+    env = stack.pop()
+    scopes += 1
+    symbols += len(env.entries)
+    nbytes += (sys.getsizeof(env) + sys.getsizeof(env.__dict__)
+               + sys.getsizeof(env.entries) + sys.getsizeof(env.children))
+    stack.extend(env.children)
+  return scopes, symbols, nbytes
+
+
+class MemoryTracker:
+
+  def __init__(self, budget=None):
+    self.budget = budget
+    self.phases = {}        # nombre -> PhaseMemory, en el orden de la primera vez
+    self.stack = []         # _Open de cada fase abierta
+    self.tokens_seen = 0
+    self.token_bytes = 0
+    self.nodes = {}         # de node_sizes
+    self.symtab = None      # de symtab_sizes
+    self.exceeded = None    # fase en la que se pasó del presupuesto
+    self.started = False
+
+  def start(self):
+    if not tracemalloc.is_tracing():
+      tracemalloc.start()
+      self.started = True
+
+  def stop(self):
+    if self.started:
+      tracemalloc.stop()
+      self.started = False
+
+  def get(self, name):
+    record = self.phases.get(name)
+    if record is None:
+      record = self.phases[name] = PhaseMemory(name)
+    return record
+
+  @contextmanager
+  def phase(self, name):
+    # tracemalloc tiene un solo pico: antes de reiniciarlo se guarda el
+    # de la fase que contiene a ésta
+    current, peak = tracemalloc.get_traced_memory()
+    if self.stack:
+      self.stack[-1].peak = max(self.stack[-1].peak, peak)
+    tracemalloc.reset_peak()
+    self.stack.append(_Open(name, current, current))
+    try:
+      yield self.get(name)
+    finally:
+      opened = self.stack.pop()
+      current, peak = tracemalloc.get_traced_memory()
+      peak = max(peak, opened.peak)
+      if self.stack:
+        self.stack[-1].peak = max(self.stack[-1].peak, peak)
+      record = self.get(name)
+      record.calls += 1
+      record.peak = max(record.peak, peak)
+      record.retained += current - opened.start
+      record.current = current
+      self.check(name, peak)
+
+  def check(self, name, used=None):
+    if self.budget is None or self.exceeded is not None:
+      return
+    if used is None:
+      used = tracemalloc.get_traced_memory()[1]
+    if used > self.budget:
+      self.exceeded = name
+      raise MemoryBudgetError(f'Memory budget exceeded in {name}: {size(used)} > {size(self.budget)}',
+                              self.format())
+
+  def tokens(self, tokens, name='lex'):
+    '''
+    Los mismos tokens, midiendo su tamaño y revisando el presupuesto
+    cada CHECK_TOKENS tokens.
+    '''
+    sizeof = sys.getsizeof
+    for tok in tokens:
+      self.tokens_seen += 1
+      self.token_bytes += sizeof(tok) + sizeof(tok.value)
+      if self.tokens_seen % CHECK_TOKENS == 0:
+        self.check(self.stack[-1].name if self.stack else name)
+      yield tok
+
+  def rows(self):
+    # PhaseMemory de cada fase; las que siguen abiertas (si se aborta a
+    # mitad de una) con lo medido hasta ahora
+    current, peak = tracemalloc.get_traced_memory()
+    running = { opened.name: opened for opened in self.stack }
+    for record in self.phases.values():
+      opened = running.get(record.name)
+      if opened is None:
+        yield record
+      else:
+        yield PhaseMemory(record.name, record.calls, max(record.peak, peak, opened.peak),
+                          record.retained + current - opened.start, current)
+
+  def count_nodes(self, ast):
+    self.nodes = node_sizes(ast)
+
+  def count_symtab(self, env):
+    self.symtab = symtab_sizes(env)
+
+  def as_dict(self):
+    total_nodes = sum(count for count, _ in self.nodes.values())
+    rows = list(self.rows())
+    return {
+      'budget'   : self.budget,
+      'exceeded' : self.exceeded,
+      'peak'     : max((r.peak for r in rows), default=0),
+      'phases'   : [{ 'name': r.name, 'calls': r.calls, 'peak': r.peak, 'retained': r.retained,
+                      'current': r.current } for r in rows],
+      'tokens'   : { 'count': self.tokens_seen, 'bytes': self.token_bytes,
+                     'bytes_per_token': self.token_bytes / self.tokens_seen if self.tokens_seen else 0 },
+      'nodes'    : { 'count': total_nodes,
+                     'kinds': { kind: { 'count': count, 'bytes': nbytes, 'bytes_per_node': nbytes / count }
+                                for kind, (count, nbytes) in self.nodes.items() } },
+      'symtab'   : None if self.symtab is None else dict(zip(('scopes', 'symbols', 'bytes'), self.symtab)),
+    }
+
+  def format(self, style='text'):
+    '''
+    Informe como texto o como JSON (style='json').
+    '''
+    if style == 'json':
+      return json.dumps(self.as_dict(), indent=1)
+    lines = [f'{"phase":<12} {"peak":>12} {"retained":>12} {"after":>12}']
+    for r in self.rows():
+      lines.append(f'{r.name:<12} {size(r.peak):>12} {size(r.retained):>12} {size(r.current):>12}')
+    if self.tokens_seen:
+      lines.append(f'tokens: {self.tokens_seen}, {self.token_bytes / self.tokens_seen:.1f} B/token '
+                   f'({size(self.token_bytes)} as a list)')
+    if self.nodes:
+      total = sum(count for count, _ in self.nodes.values())
+      nbytes = sum(nbytes for _, nbytes in self.nodes.values())
+      lines.append(f'AST: {total} nodes, {size(nbytes)}')
+      for kind, (count, nbytes) in sorted(self.nodes.items(), key=lambda item: -item[1][1]):
+        lines.append(f'  {kind:<12} {count:>9} {nbytes / count:8.1f} B/node {size(nbytes):>12}')
+    if self.symtab is not None:
+      scopes, symbols, nbytes = self.symtab
+      lines.append(f'Symtab: {scopes} scopes, {symbols} symbols, {size(nbytes)}')
+    if self.budget is not None:
+      state = f'exceeded in {self.exceeded}' if self.exceeded else 'ok'
+      lines.append(f'budget: {size(self.budget)} ({state})')
+    return '\n'.join(lines)
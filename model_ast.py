@@ -1,61 +1,188 @@
-from dataclasses import dataclass, field
-from multimethod import multimeta
-from typing import List
+from dataclasses import dataclass, field, fields
+from typing import ClassVar, List
 
 
 # Clase Visitor
-class Visitor(metaclass=multimeta):
-  ...
+class VisitorMeta(type):
+  '''
+  Permite definir varios métodos visit en una clase, uno por tipo de
+  nodo (según la anotación del primer parámetro). Cada clase de nodo
+  concreta se resuelve una sola vez, la primera vez que se visita,
+  siguiendo su MRO hasta el método visit más específico (p. ej.
+  TypeCast antes que Unary, Vector antes que Ident); después el
+  despacho es una búsqueda en un diccionario.
+  '''
+  class __prepare__(dict):
+    def __init__(self, *args, **kwargs):
+      super().__init__()
+      self.overloads = {}
+
+    def __setitem__(self, key, value):
+      if key == 'visit' and callable(value):
+        node_type = visit_type(value)
+        if node_type is not None:
+          self.overloads[node_type] = value
+          return
+      super().__setitem__(key, value)
+
+  def __new__(meta, clsname, bases, namespace):
+    cls = super().__new__(meta, clsname, bases, dict(namespace))
+    overloads = {}
+    for base in reversed(cls.__mro__[1:]):
+      overloads.update(getattr(base, '_visit_overloads', {}))
+    overloads.update(getattr(namespace, 'overloads', {}))
+    cls._visit_overloads = overloads
+    cls._visit_table = {}
+    return cls
+
+  def resolve(cls, node_type):
+    '''
+    Método visit para la clase node_type (o None si no hay ninguno).
+    '''
+    for klass in node_type.__mro__:
+      method = cls._visit_overloads.get(klass)
+      if method is not None:
+        cls._visit_table[node_type] = method
+        return method
+    return None
+
+
+def visit_type(func):
+  # Anotación del parámetro que recibe el nodo (el primero después de self)
+  code = func.__code__
+  if code.co_argcount < 2:
+    return None
+  node_type = func.__annotations__.get(code.co_varnames[1])
+  return node_type if isinstance(node_type, type) else None
+
+
+class Visitor(metaclass=VisitorMeta):
+
+  def visit(self, n, *args, **kwargs):
+    method = self._visit_table.get(n.__class__)
+    if method is None:
+      method = type(self).resolve(n.__class__)
+      if method is None:
+        raise TypeError(f'{type(self).__name__} has no visit for {type(n).__name__}')
+    return method(self, n, *args, **kwargs)
 
 
 # Clases Abstractas
-@dataclass
+# Todos los nodos usan __slots__ (sin __dict__ por instancia)
+
+def address():
+  # Campo depth/slot que llena resolver.py (sólo por nombre)
+  return field(default=None, kw_only=True)
+
+def span():
+  # Desplazamiento en el fuente que llena el parser (sólo por nombre; no
+  # cuenta al comparar nodos)
+  return field(default=None, kw_only=True, compare=False, repr=False)
+
+SPAN_FIELDS = ('pos', 'endpos')
+
+@dataclass(slots=True)
 class Node:
+  pos    : int = span()    # inicio del texto del nodo
+  endpos : int = span()    # fin (exclusivo)
+
   def accept(self, v:Visitor, *args, **kwargs):
     return v.visit(self, *args, **kwargs)
 
-@dataclass
+_subfields = {}
+
+def subnodes(node):
+  '''
+  Nodos hijos de node (sin los DataType, que son compartidos).
+  '''
+  names = _subfields.get(type(node))
+  if names is None:
+    names = _subfields[type(node)] = tuple(f.name for f in fields(type(node))
+                                          if f.name not in SPAN_FIELDS)
+  for name in names:
+    value = getattr(node, name)
+    if isinstance(value, list):
+      for item in value:
+        if isinstance(item, Node) and not isinstance(item, DataType):
+          yield item
+    elif isinstance(value, Node) and not isinstance(value, DataType):
+      yield value
+
+def walk(node):
+  '''
+  node y todos sus descendientes, en preorden.
+  '''
+  stack = [node]
+  while stack:
+    node = stack.pop()
+    yield node
+    children = list(subnodes(node))
+    children.reverse()
+    stack.extend(children)
+
+@dataclass(slots=True)
 class Stmt(Node):
   ...
 
-@dataclass
+@dataclass(slots=True)
 class Expr(Node):
   ...
 
-@dataclass
+@dataclass(slots=True)
 class Type(Node):
   ...
 
 # Clases concretas
-@dataclass
+@dataclass(slots=True)
 class DataType(Type):
+  '''
+  Los DataType están internados: DataType('int') devuelve siempre el
+  mismo objeto, compartido por todos los nodos. No deben modificarse;
+  para cambiar el tipo de un nodo se le asigna otro DataType.
+  '''
   type : str
 
-@dataclass
+  _interned : ClassVar[dict] = {}
+
+  def __new__(cls, type=None):
+    dtype = cls._interned.get(type)
+    if dtype is None:
+      dtype = cls._interned[type] = object.__new__(cls)
+    return dtype
+
+  def __hash__(self):
+    return hash(self.type)
+
+  def __reduce__(self):
+    return (DataType, (self.type,))
+
+@dataclass(slots=True)
 class Program(Stmt):
   functions : List[Stmt]
 
-@dataclass
+@dataclass(slots=True)
 class Function(Stmt):
   id          : str
   parameters  : List[Expr]
   variables   : List[Expr]
   statements  : List[Stmt]
-  dtype       : DataType = field(default_factory=lambda: DataType(None))
+  dtype       : DataType = DataType(None)
+  depth       : int = address()   # nivel de anidamiento (0: función externa)
+  slot        : int = address()   # índice de su marco en resolve()
 
-@dataclass
+@dataclass(slots=True)
 class OneStmt(Stmt):
   key   : str
   value  : Stmt
 
-@dataclass
+@dataclass(slots=True)
 class DualStmt(Stmt):
   keyLeft   : str
   left      : Stmt
   keyRight  : str
   right     : Stmt
 
-@dataclass
+@dataclass(slots=True)
 class TripleStmt(Stmt):
   keyLeft   : str
   left      : Stmt
@@ -64,86 +191,92 @@ class TripleStmt(Stmt):
   keyRight  : str
   right     : Stmt
 
-@dataclass
+@dataclass(slots=True)
 class Grouping(Expr):
   begin : str
   expr  : Expr
   end   : str
 
-@dataclass
+@dataclass(slots=True)
 class Single(Stmt):
   key   : str
 
-@dataclass
+@dataclass(slots=True)
 class Relation(Expr):
   rel    : str
   left   : Expr
   right  : Expr
-  dtype  : DataType = field(default_factory=lambda: DataType(None))
+  dtype  : DataType = DataType(None)
 
-@dataclass
+@dataclass(slots=True)
 class Not(Expr):
   key   : str
   rel   : Expr
 
-@dataclass
+@dataclass(slots=True)
 class Binary(Expr):
   op    : str
   left  : Expr
   right : Expr
-  dtype : DataType = field(default_factory=lambda: DataType(None))
+  dtype : DataType = DataType(None)
 
-@dataclass
+@dataclass(slots=True)
 class Unary(Expr):
   op    : str
   expr  : Expr
-  dtype : DataType = field(default_factory=lambda: DataType(None))
+  dtype : DataType = DataType(None)
 
-@dataclass
+@dataclass(slots=True)
 class TypeCast(Unary):
   ...
 
-@dataclass
+@dataclass(slots=True)
 class Call(Expr):
   id   : str
   expr : List[Expr]
+  depth : int = address()         # depth de la función llamada
+  slot  : int = address()         # su índice en resolve()
 
 
-@dataclass
+@dataclass(slots=True)
 class Var(Expr):
   id   : str
   type : DataType
+  depth : int = address()         # depth de la función que la declara
+  slot  : int = address()         # posición en el marco de esa función
 
-@dataclass
+@dataclass(slots=True)
 class VectorVar(Var):
   id   : str
   type : DataType
   size : Expr
 
-@dataclass 
+@dataclass(slots=True)
 class Ident(Expr):
   id   : str
+  depth : int = address()         # como en Var, los de su declaración
+  slot  : int = address()
 
-@dataclass
+@dataclass(slots=True)
 class Vector(Ident):
   id   : str
   index : Expr
 
-@dataclass
+@dataclass(slots=True)
 class Assign(Stmt):
   loct : Ident
   expr : Expr
 
-@dataclass
+@dataclass(slots=True)
 class Literal(Expr):
 	...
 
-@dataclass
+@dataclass(slots=True)
 class Integer(Literal):
 	value : int
 	dtype : DataType('int')
 
-@dataclass
+@dataclass(slots=True)
 class Float(Literal):
 	value : float
 	dtype : DataType('float')
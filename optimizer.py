@@ -0,0 +1,529 @@
+# optimizer.py
+'''
+Optimización del código intermedio (ircode)
+===========================================
+Pasadas sobre cada IRFunction, entre la revisión de tipos y la
+generación de código:
+
+  fold        propagación y plegado de constantes dentro de cada bloque,
+              simplificaciones algebraicas (x+0, x*1...) y saltos BR con
+              condición constante
+  constprop   propagación global de constantes (análisis de flujo de
+              datos sobre el CFG) seguida del plegado
+  copies      propagación de copias (MOV) en cada bloque básico
+              extendido (bloques encadenados con un único predecesor)
+  cse         eliminación de subexpresiones comunes en cada bloque
+              básico extendido (numeración de valores)
+  dce         eliminación de código muerto usando el análisis de vida
+              (liveness) de los registros
+  cfg         simplificación del CFG: bloques que sólo saltan y bloques
+              con un único sucesor/predecesor se unen
+  licm        movimiento de código invariante fuera de los ciclos
+  strength    reducción de fuerza con variables de inducción
+
+licm y strength están en loops.py.
+
+Niveles:
+
+  -O0   sin optimizar
+  -O1   fold, copies, dce
+  -O2   constprop, copies, cse, licm, strength, copies, dce, cfg
+        (hasta que no haya cambios, como máximo MAX_ROUNDS vueltas)
+
+optimize() devuelve un OptReport con las instrucciones eliminadas y
+reescritas por cada pasada.
+
+Las llamadas (CALL) pueden leer y modificar las variables capturadas por
+funciones anidadas (IRFunction.captured), así que se tratan como uso y
+definición de esas variables. Las instrucciones sin efectos, como
+LOADV o DIVI, se eliminan si su resultado no se usa, aunque pudieran
+fallar al ejecutarse.
+'''
+from collections import Counter
+from math import copysign, isfinite
+
+from dataflow import instr_uses, liveness
+from ircode   import Op, Instr, OPERANDS, is_const
+from loops    import hoist_invariants, reduce_strength
+
+MAX_ROUNDS = 4
+
+
+# ---------------------------------------------------------------------
+#  Plegado de constantes
+# ---------------------------------------------------------------------
+
+def div_int(x, y):
+  # División entera truncando hacia cero (como en la VM y en C)
+  q = abs(x) // abs(y)
+  return q if (x < 0) == (y < 0) else -q
+
+FOLD = {
+  Op.ADDI: lambda x, y: x + y,
+  Op.SUBI: lambda x, y: x - y,
+  Op.MULI: lambda x, y: x * y,
+  Op.DIVI: lambda x, y: div_int(x, y) if y else None,
+  Op.ADDF: lambda x, y: x + y,
+  Op.SUBF: lambda x, y: x - y,
+  Op.MULF: lambda x, y: x * y,
+  Op.DIVF: lambda x, y: x / y if y else None,
+  Op.NEGI: lambda x, y: -x,
+  Op.NEGF: lambda x, y: -x,
+  Op.ITOF: lambda x, y: float(x),
+  Op.FTOI: lambda x, y: int(x) if isfinite(x) else None,
+  Op.LT:   lambda x, y: int(x < y),
+  Op.LE:   lambda x, y: int(x <= y),
+  Op.GT:   lambda x, y: int(x > y),
+  Op.GE:   lambda x, y: int(x >= y),
+  Op.EQ:   lambda x, y: int(x == y),
+  Op.NE:   lambda x, y: int(x != y),
+}
+
+COMMUTATIVE = frozenset((Op.ADDI, Op.MULI, Op.ADDF, Op.MULF, Op.EQ, Op.NE))
+
+# Operando que deja igual al otro (ADDF y SUBF: ver is_identity)
+IDENTITY = {
+  Op.ADDI: 0, Op.SUBI: 0, Op.MULI: 1, Op.DIVI: 1,
+  Op.ADDF: -0.0, Op.SUBF: 0.0, Op.MULF: 1.0, Op.DIVF: 1.0,
+}
+
+# Instrucciones sin efectos: se pueden eliminar si su resultado no se usa
+PURE = frozenset(FOLD) | { Op.MOV, Op.LOADV, Op.UPLOAD, Op.NEWVEC }
+
+
+def fold_instr(func, instr):
+  '''
+  Pliega instr si sus operandos son constantes o si es una
+  simplificación algebraica. Devuelve True si la cambió.
+  '''
+  op = instr.op
+  if op is Op.BR and is_const(instr.a):
+    target = instr.b if func.value(instr.a) else instr.c
+    instr.op, instr.a, instr.b, instr.c = Op.JUMP, target, 0, 0
+    return True
+  fold = FOLD.get(op)
+  if fold is None:
+    return False
+  kinds = OPERANDS[op]
+  b, c = instr.b, instr.c
+  if is_const(b) and (kinds[2] != 'r' or is_const(c)):
+    value = fold(func.value(b), func.value(c) if kinds[2] == 'r' else None)
+    if value is not None:
+      instr.op, instr.b, instr.c = Op.MOV, func.const(value), 0
+      return True
+    return False
+  # x*0 y 0*x (sólo enteros: con float el resultado puede ser nan)
+  if op is Op.MULI and ((is_const(b) and func.value(b) == 0) or (is_const(c) and func.value(c) == 0)):
+    instr.op, instr.b, instr.c = Op.MOV, func.const(0), 0
+    return True
+  # Identidades: x+0, 0+x, x-0, x*1, 1*x, x/1
+  if op in IDENTITY:
+    if is_const(c) and is_identity(op, func.value(c)):
+      instr.op, instr.c = Op.MOV, 0
+      return True
+    if op in COMMUTATIVE and is_const(b) and is_identity(op, func.value(b)):
+      instr.op, instr.b, instr.c = Op.MOV, c, 0
+      return True
+  return False
+
+
+def is_identity(op, value):
+  # Con float sólo x + -0.0 y x - 0.0 dan siempre x: si x es -0.0,
+  # x + 0.0 y x - -0.0 dan 0.0
+  if op is Op.ADDF:
+    return value == 0 and copysign(1.0, value) < 0
+  if op is Op.SUBF:
+    return value == 0 and copysign(1.0, value) > 0
+  return value == IDENTITY[op]
+
+
+def rewrite_uses(instr, mapping):
+  '''
+  Reemplaza los registros usados por instr según mapping. Devuelve
+  True si cambió algún operando.
+  '''
+  kinds = OPERANDS[instr.op]
+  changed = False
+  if kinds[0] == 'r' and instr.a in mapping:
+    instr.a, changed = mapping[instr.a], True
+  if kinds[1] == 'r' and instr.b in mapping:
+    instr.b, changed = mapping[instr.b], True
+  if kinds[2] == 'r' and instr.c in mapping:
+    instr.c, changed = mapping[instr.c], True
+  return changed
+
+
+def kill(func, instr, state):
+  # Olvida lo que se sabía de los registros que instr modifica
+  dst = instr.defs()
+  if dst is not None:
+    state.pop(dst, None)
+  if instr.op is Op.CALL:
+    for reg in func.captured:
+      state.pop(reg, None)
+
+
+def fold_block(func, block, state):
+  '''
+  Propaga las constantes conocidas al entrar (state: registro ->
+  constante) por el bloque y pliega sus instrucciones. Devuelve el
+  número de instrucciones cambiadas; state queda con las constantes a
+  la salida.
+  '''
+  changed = 0
+  for instr in block.instrs:
+    hit = rewrite_uses(instr, state)
+    hit = fold_instr(func, instr) or hit
+    changed += hit
+    kill(func, instr, state)
+    if instr.op is Op.MOV and is_const(instr.b):
+      state[instr.a] = instr.b
+  return changed
+
+
+def fold_constants(func):
+  changed = sum(fold_block(func, block, {}) for block in func.blocks)
+  func.build_cfg()
+  return changed
+
+
+def transfer(func, block, state):
+  # Constantes a la salida del bloque, sin modificarlo
+  state = dict(state)
+  for instr in block.instrs:
+    probe = Instr(instr.op, instr.a, instr.b, instr.c)
+    rewrite_uses(probe, state)
+    fold_instr(func, probe)
+    kill(func, probe, state)
+    if probe.op is Op.MOV and is_const(probe.b):
+      state[probe.a] = probe.b
+  return state
+
+
+def meet(states):
+  # Constantes con el mismo valor en todos los predecesores
+  states = [s for s in states if s is not None]
+  if not states:
+    return None
+  first, rest = states[0], states[1:]
+  return { reg: value for reg, value in first.items()
+           if all(s.get(reg) == value for s in rest) }
+
+
+def propagate_constants(func):
+  '''
+  Propagación global de constantes: se calculan las constantes
+  conocidas a la entrada de cada bloque iterando hasta un punto fijo
+  y después se pliega cada bloque con ellas.
+  '''
+  total = 0
+  while True:
+    entry = func.blocks[0]
+    out = { block.label: None for block in func.blocks }
+    changed = True
+    while changed:
+      changed = False
+      for block in func.blocks:
+        state = {} if block is entry else meet(out[p.label] for p in block.preds)
+        if state is None:
+          continue
+        new = transfer(func, block, state)
+        if new != out[block.label]:
+          out[block.label], changed = new, True
+    rewritten = 0
+    for block in func.blocks:
+      state = {} if block is entry else meet(out[p.label] for p in block.preds)
+      rewritten += fold_block(func, block, state or {})
+    nblocks = len(func.blocks)
+    func.build_cfg()
+    total += rewritten
+    # Si un BR se volvió JUMP pueden aparecer constantes nuevas
+    if len(func.blocks) == nblocks:
+      return total
+
+
+# ---------------------------------------------------------------------
+#  Propagación de copias y subexpresiones comunes
+# ---------------------------------------------------------------------
+
+def invalidate(copies, reg):
+  # Quita las copias de reg y las que dependen de reg
+  copies.pop(reg, None)
+  for dst in [d for d, src in copies.items() if src == reg]:
+    del copies[dst]
+
+
+def extended_blocks(func, visit, state):
+  '''
+  Recorre los bloques básicos extendidos de func: cada bloque con un
+  único predecesor continúa con el estado (copiado) que dejó ese
+  predecesor; los demás empiezan con una copia de state. visit(block,
+  state) procesa el bloque y actualiza state. Devuelve la suma de lo que
+  devuelve visit.
+  '''
+  entry = func.blocks[0]
+  total = 0
+  for root in func.blocks:
+    if root is not entry and len(root.preds) == 1:
+      continue
+    work = [(root, dict(state))]
+    while work:
+      block, current = work.pop()
+      total += visit(block, current)
+      for succ in block.succs:
+        if succ is not entry and len(succ.preds) == 1:
+          work.append((succ, dict(current)))
+  return total
+
+
+def copy_block(func, block, copies):
+  changed = 0
+  for instr in block.instrs:
+    changed += rewrite_uses(instr, copies)
+    dst = instr.defs()
+    if dst is not None:
+      invalidate(copies, dst)
+    if instr.op is Op.CALL:
+      for reg in func.captured:
+        invalidate(copies, reg)
+    if instr.op is Op.MOV and instr.a != instr.b:
+      copies[instr.a] = instr.b
+  return changed
+
+
+def coalesce_copies(func):
+  '''
+  t := op ...; ...; MOV a, t  ->  a := op ... cuando t es un temporal que
+  sólo se usa en el MOV y a no se lee ni se escribe entre las dos
+  instrucciones.
+  '''
+  uses = Counter(r for instr in func.instructions() for r in instr.uses())
+  changed = 0
+  for block in func.blocks:
+    instrs = block.instrs
+    defined = {}        # temporal -> posición de su definición
+    for k, instr in enumerate(instrs):
+      if (instr.op is Op.MOV and instr.b in defined and instr.b >= func.nvars
+          and uses[instr.b] == 1):
+        start = defined[instr.b]
+        between = instrs[start + 1:k]
+        dst = instr.a
+        if all(dst not in i.uses() and i.defs() != dst for i in between) and \
+           not (instrs[start].op is Op.CALL and dst in func.captured):
+          instrs[start].a = dst
+          instr.b = dst
+          changed += 1
+      reg = instr.defs()
+      if reg is not None:
+        defined[reg] = k
+    block.instrs = [i for i in instrs if not (i.op is Op.MOV and i.a == i.b)]
+  return changed
+
+
+def propagate_copies(func):
+  '''
+  Tras MOV a, b los usos de a se reemplazan por b mientras ni a ni b
+  cambien (en el bloque básico extendido). Después se unen las copias
+  de un temporal recién calculado (coalesce_copies).
+  '''
+  changed = extended_blocks(func, lambda block, copies: copy_block(func, block, copies), {})
+  return changed + coalesce_copies(func)
+
+
+# Operaciones que leen memoria (los vectores o las variables de otra
+# función): su valor cambia con cualquier escritura o llamada
+MEMORY_READS  = frozenset((Op.LOADV, Op.UPLOAD))
+MEMORY_WRITES = frozenset((Op.STOREV, Op.UPSTORE, Op.CALL))
+
+
+def cse_block(func, block, available):
+  # available: (op, b, c) -> registro con ese valor
+  changed = 0
+  for instr in block.instrs:
+    op = instr.op
+    key = None
+    if op in FOLD or op in MEMORY_READS:
+      b, c = instr.b, instr.c
+      if op in COMMUTATIVE and b > c:
+        b, c = c, b
+      key = (op, b, c)
+      reg = available.get(key)
+      if reg is not None:
+        instr.op, instr.b, instr.c = Op.MOV, reg, 0
+        changed += 1
+        key = None
+    dst = instr.defs()
+    if dst is not None:
+      killed = {dst} | (func.captured if op is Op.CALL else set())
+      for k in [k for k, r in available.items() if r in killed or k[1] in killed or k[2] in killed]:
+        del available[k]
+    if op in MEMORY_WRITES:
+      for k in [k for k in available if k[0] in MEMORY_READS]:
+        del available[k]
+    if key is not None and dst not in key[1:]:
+      available[key] = dst
+  return changed
+
+
+def eliminate_common_subexpressions(func):
+  '''
+  Numeración de valores en cada bloque básico extendido: si una
+  expresión (op, b, c) ya está calculada en un registro que no ha
+  cambiado, se reemplaza por un MOV de ese registro.
+  '''
+  return extended_blocks(func, lambda block, available: cse_block(func, block, available), {})
+
+
+# ---------------------------------------------------------------------
+#  Código muerto
+# ---------------------------------------------------------------------
+
+def eliminate_dead_code(func):
+  '''
+  Quita las instrucciones sin efectos cuyo resultado no se usa y los
+  MOV de un registro a sí mismo.
+  '''
+  func.build_cfg()
+  _, live_out = liveness(func)
+  for block in func.blocks:
+    live = set(live_out[block.label])
+    kept = []
+    for instr in reversed(block.instrs):
+      dst = instr.defs()
+      if instr.op in PURE and (dst not in live or instr.op is Op.MOV and instr.b == dst):
+        continue
+      if dst is not None:
+        live.discard(dst)
+      live.update(instr_uses(func, instr))
+      kept.append(instr)
+    kept.reverse()
+    block.instrs = kept
+  return 0
+
+
+# ---------------------------------------------------------------------
+#  Simplificación del CFG
+# ---------------------------------------------------------------------
+
+def simplify_cfg(func):
+  '''
+  Redirige los saltos a bloques que sólo contienen un JUMP y une cada
+  bloque que termina en JUMP con su sucesor si éste no tiene otros
+  predecesores.
+  '''
+  changed = 0
+  labels = func.block_map()
+
+  def forward(label):
+    seen = set()
+    block = labels[label]
+    while len(block.instrs) == 1 and block.instrs[0].op is Op.JUMP and block.label not in seen:
+      seen.add(block.label)
+      block = labels[block.instrs[0].a]
+    return block.label
+
+  for block in func.blocks:
+    term = block.terminator
+    if term.op is Op.JUMP:
+      target = forward(term.a)
+      changed += target != term.a
+      term.a = target
+    elif term.op is Op.BR:
+      b, c = forward(term.b), forward(term.c)
+      changed += (b != term.b) + (c != term.c)
+      term.b, term.c = b, c
+      if b == c:
+        term.op, term.a, term.b, term.c = Op.JUMP, b, 0, 0
+  func.build_cfg()
+
+  entry = func.blocks[0]
+  merged = True
+  while merged:
+    merged = False
+    for block in func.blocks:
+      term = block.terminator
+      if term.op is not Op.JUMP:
+        continue
+      succ = labels[term.a]
+      if succ is block or succ is entry or len(succ.preds) != 1:
+        continue
+      block.instrs[-1:] = succ.instrs
+      func.blocks.remove(succ)
+      changed += 1
+      func.build_cfg()
+      merged = True
+      break
+  return changed
+
+
+# ---------------------------------------------------------------------
+#  Niveles de optimización
+# ---------------------------------------------------------------------
+
+PASSES = {
+  'fold':      fold_constants,
+  'constprop': propagate_constants,
+  'copies':    propagate_copies,
+  'cse':       eliminate_common_subexpressions,
+  'dce':       eliminate_dead_code,
+  'cfg':       simplify_cfg,
+  'licm':      hoist_invariants,
+  'strength':  reduce_strength,
+}
+
+LEVELS = {
+  0: (),
+  1: ('fold', 'copies', 'dce'),
+  2: ('constprop', 'copies', 'cse', 'licm', 'strength', 'copies', 'dce', 'cfg'),
+}
+
+
+class OptReport:
+  '''
+  Instrucciones eliminadas y reescritas por cada pasada (sumando todas
+  las funciones y vueltas). Una pasada que agrega instrucciones, como
+  strength, tiene un número negativo de eliminadas.
+  '''
+  def __init__(self, level, passes):
+    self.level   = level
+    self.removed = { name: 0 for name in passes }
+    self.changed = { name: 0 for name in passes }
+    self.before  = 0
+    self.after   = 0
+    self.rounds  = 0
+
+  def format(self):
+    lines = [f'-O{self.level}: {self.before} -> {self.after} instructions ({self.rounds} rounds)']
+    for name in self.removed:
+      lines.append(f'  {name:10} removed {self.removed[name]:6}   rewritten {self.changed[name]:6}')
+    return '\n'.join(lines)
+
+
+def optimize_function(func, level, names, report):
+  for _ in range(MAX_ROUNDS if level > 1 else 1):
+    size = len(func)
+    progress = 0
+    for name in names:
+      before = len(func)
+      changed = PASSES[name](func)
+      report.removed[name] += before - len(func)
+      report.changed[name] += changed
+      progress += changed + before - len(func)
+    report.rounds = max(report.rounds, _ + 1)
+    if not progress and len(func) == size:
+      break
+
+
+def optimize(program, level=1, passes=None):
+  '''
+  Optimiza en su lugar todas las funciones de program (un IRProgram) y
+  devuelve un OptReport. passes reemplaza la lista de pasadas del nivel.
+  '''
+  names = LEVELS[level] if passes is None else tuple(passes)
+  report = OptReport(level, names)
+  report.before = sum(len(func) for func in program.functions)
+  if level > 0:
+    for func in program.functions:
+      optimize_function(func, level, names, report)
+  report.after = sum(len(func) for func in program.functions)
+  return report
@@ -0,0 +1,200 @@
+# parcheck.py
+'''
+Revisión de tipos en paralelo
+=============================
+Checker revisa las funciones del programa una tras otra. El tipo de
+cada función sólo depende de sus return y de las funciones anteriores,
+así que la revisión se divide en dos pasadas:
+
+1. Declaraciones (en serie, barata): se agregan las funciones a la tabla
+   del programa y de cada una se revisan sólo los return, en el mismo
+   orden que Checker (primero los de las funciones anidadas). Así se
+   obtiene su firma y su tipo de retorno final, los mismos que tendría
+   al terminar la revisión completa.
+2. Cuerpos (en paralelo): cada proceso revisa completas, con Checker,
+   las funciones que le tocan, viendo en la tabla del programa sólo las
+   funciones anteriores, con su tipo final, como en la revisión en
+   serie. Los procesos se crean con fork después de la primera pasada:
+   heredan el AST y las firmas sin copiarlos.
+
+Cada proceso devuelve los dtype de los nodos anotados (Relation, Binary,
+Unary, TypeCast y las funciones) de cada función, en el orden de un
+recorrido fijo, y se copian en el AST en el orden de las funciones. Si
+hay cualquier error se repite la revisión en serie, que informa el
+mismo primer error que Checker.check.
+'''
+from dataclasses import fields
+import multiprocessing
+import os
+
+from model_ast import *
+from checker   import Checker, Symtab, var_type
+from typesys   import INT, lookup_type, function
+
+
+# Con menos funciones que esto no conviene crear procesos
+MIN_FUNCTIONS = 256
+
+ANNOTATED = (Relation, Binary, Unary, Function)
+
+_children = {}
+
+
+def children(cls):
+  # Campos de cls que pueden tener nodos (no los DataType ni cadenas)
+  names = _children.get(cls)
+  if names is None:
+    names = _children[cls] = tuple(f.name for f in fields(cls)
+                                   if f.name not in ('dtype', 'type', 'depth', 'slot') + SPAN_FIELDS)
+  return names
+
+
+def annotated(node, found):
+  '''
+  Agrega a found los nodos con dtype del subárbol, en orden fijo.
+  '''
+  if isinstance(node, ANNOTATED):
+    found.append(node)
+  for name in children(type(node)):
+    value = getattr(node, name)
+    if isinstance(value, list):
+      for item in value:
+        if isinstance(item, Node):
+          annotated(item, found)
+    elif isinstance(value, Node):
+      annotated(value, found)
+  return found
+
+
+def returns(stmts, found):
+  # Sentencias return (en orden), dentro de if/while/begin
+  for stmt in stmts:
+    if isinstance(stmt, OneStmt):
+      if stmt.key == 'return':
+        found.append(stmt)
+    elif isinstance(stmt, DualStmt):
+      returns([stmt.right], found)
+    elif isinstance(stmt, TripleStmt):
+      returns([stmt.middle, stmt.right], found)
+    elif isinstance(stmt, Grouping):
+      returns(stmt.expr, found)
+  return found
+
+
+class ProgramScope(Symtab):
+  '''
+  Tabla del programa vista desde la función número index: las
+  funciones siguientes todavía no están declaradas (la función index sí,
+  como en serie, que la declara antes de revisar su cuerpo).
+  '''
+  def __init__(self, entries, position, index):
+    super().__init__()
+    self.entries = entries
+    self.position = position
+    self.index = index
+
+  def get(self, name):
+    node = self.entries.get(name)
+    if node is not None and self.position[name] <= self.index:
+      return node
+    return None
+
+  def add(self, name, value):
+    if self.position.get(name) != self.index:
+      raise Symtab.SymbolDefinedError()
+
+
+def declare(checker, func, env):
+  '''
+  Primera pasada de una función: firma y tipo de retorno.
+  '''
+  env.add(func.id, func)
+  new_env = Symtab(func.id, env)
+  params = [var_type(param) for param in func.parameters]
+  checker.signatures[id(func)] = function(params)
+  for param in func.parameters:
+    param.accept(checker, new_env)
+  for var in func.variables:
+    if isinstance(var, Function):
+      declare(checker, var, new_env)
+    else:
+      var.accept(checker, new_env)
+  for stmt in returns(func.statements, []):
+    stmt.accept(checker, new_env)
+  checker.signatures[id(func)] = function(params, lookup_type(func.dtype.type) or INT)
+
+
+# Estado heredado por los procesos (fork)
+_program = None
+
+
+def _check_range(bounds):
+  ast, signatures, entries, position, initial = _program
+  results = []
+  for index in range(*bounds):
+    func = ast.functions[index]
+    # La revisión completa parte de los tipos que había antes de la
+    # primera pasada, como en serie
+    for node in annotated(func, []):
+      node.dtype = initial[id(node)]
+    checker = Checker(ast)
+    checker.signatures.update(signatures)
+    try:
+      func.accept(checker, ProgramScope(entries, position, index))
+    except Exception:
+      return None
+    results.append([node.dtype.type for node in annotated(func, [])])
+  return results
+
+
+def serial(ast, initial):
+  # Revisión en serie desde el estado anterior a la primera pasada
+  for node, dtype in initial:
+    node.dtype = dtype
+  return Checker.check(ast)
+
+
+def check_parallel(ast, jobs=None):
+  '''
+  Como Checker.check(ast), repartiendo la revisión de los cuerpos entre
+  jobs procesos.
+  '''
+  jobs = jobs or os.cpu_count() or 1
+  functions = ast.functions
+  if (jobs < 2 or len(functions) < MIN_FUNCTIONS
+      or 'fork' not in multiprocessing.get_all_start_methods()):
+    return Checker.check(ast)
+
+  global _program
+  initial = [(node, node.dtype) for func in functions for node in annotated(func, [])]
+  checker = Checker(ast)
+  env = Symtab()
+  try:
+    for func in functions:
+      declare(checker, func, env)
+  except Exception:
+    return serial(ast, initial)
+  position = { func.id: k for k, func in enumerate(functions) }
+  signatures = { id(func): checker.signatures[id(func)] for func in functions }
+
+  # Rangos contiguos de funciones, varios por proceso
+  step = max(1, len(functions) // (jobs * 4))
+  ranges = [(k, min(k + step, len(functions))) for k in range(0, len(functions), step)]
+  _program = (ast, signatures, env.entries, position,
+              { id(node): dtype for node, dtype in initial })
+  try:
+    with multiprocessing.get_context('fork').Pool(jobs) as pool:
+      parts = pool.map(_check_range, ranges)
+  finally:
+    _program = None
+  if any(part is None for part in parts):
+    return serial(ast, initial)
+
+  for (start, end), part in zip(ranges, parts):
+    for func, dtypes in zip(functions[start:end], part):
+      for node, dtype in zip(annotated(func, []), dtypes):
+        node.dtype = DataType(dtype)
+  main = env.get('main')
+  if main == None:
+    raise Exception("Main function not found")
+  return main.dtype.type
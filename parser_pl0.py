@@ -1,12 +1,36 @@
 from sly import Parser
+from sly.yacc import YaccError
 from sys import argv
+from hashlib import sha256
+import marshal
+import os
+import sly
+import tempfile
 from rich import print as rprint
 from lexer_pl0 import LexerForPL0, print_lexer
 from model_ast import *
 
+class ParserTables:
+  '''
+  Tablas LALR cargadas desde disco. Solo contiene lo que usa
+  Parser.parse: acciones, goto y estados por defecto.
+  '''
+  def __init__(self, lr_action, lr_goto, defaulted_states):
+    self.lr_action = lr_action
+    self.lr_goto = lr_goto
+    self.defaulted_states = defaulted_states
+
+
 class ParserForPL0(Parser):
   #expected_shift_reduce = 1
-  debugfile = 'parserPL0.txt'
+
+  # El volcado de estados (parserPL0.txt) solo se escribe bajo pedido:
+  # asignar debugfile antes del primer uso o llamar a write_debugfile()
+  debugfile = None
+
+  # Tablas LALR persistidas, indexadas por el hash de la gramática
+  tabfile = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         '__pycache__', 'parsetab_pl0.bin')
 
   precedence = (
     ('left', 'AND', 'OR'),
@@ -19,15 +43,107 @@ class ParserForPL0(Parser):
 
   tokens = LexerForPL0.tokens
 
+  @classmethod
+  def _build(cls, definitions):
+    # SLY invoca _build al crear la clase; las tablas se construyen
+    # (o se cargan del disco) la primera vez que se usa el parser
+    cls._definitions = definitions
+    cls._lrtable = None
+
+  @classmethod
+  def signature(cls):
+    '''
+    Hash de las producciones, la precedencia, los tokens y la versión
+    de SLY. Identifica las tablas guardadas en tabfile.
+    '''
+    prods = [(p.name, p.prod, p.prec) for p in cls._grammar.Productions]
+    key = repr((sly.__version__, sorted(cls.tokens), cls.precedence, prods))
+    return sha256(key.encode('utf-8')).hexdigest()
+
+  @classmethod
+  def build_tables(cls, use_cache=True):
+    '''
+    Construye la gramática y obtiene las tablas LALR, leyéndolas de
+    tabfile si la firma coincide o generándolas (y guardándolas) si no.
+    '''
+    if cls._lrtable is not None:
+      return cls._lrtable
+    rules = cls._Parser__collect_rules(cls._definitions)
+    if not cls._Parser__validate_specification():
+      raise YaccError('Invalid parser specification')
+    cls._Parser__build_grammar(rules)
+
+    signature = cls.signature()
+    if use_cache and not cls.debugfile:
+      cls._lrtable = read_tables(cls.tabfile, signature)
+    if cls._lrtable is None:
+      cls._Parser__build_lrtables()
+      if use_cache:
+        write_tables(cls.tabfile, signature, cls._lrtable)
+      if cls.debugfile:
+        cls.write_debugfile(cls.debugfile)
+    return cls._lrtable
+
+  @classmethod
+  def write_debugfile(cls, filename='parserPL0.txt'):
+    # Las tablas leídas de disco no guardan la descripción de los
+    # estados, así que el volcado siempre se hace con tablas nuevas
+    if not hasattr(cls._lrtable, 'state_descriptions'):
+      cls._lrtable = None
+      cls.build_tables(use_cache=False)
+    with open(filename, 'w') as f:
+      f.write(str(cls._grammar))
+      f.write('\n')
+      f.write(str(cls._lrtable))
+    cls.log.info('Parser debugging for %s written to %s', cls.__qualname__, filename)
+
+  # Si no es None, los errores de sintaxis se guardan aquí
+  # (sourcemap.Diagnostics) en vez de escribirse en stderr
+  diagnostics = None
+
+  def parse(self, tokens):
+    if self._lrtable is None:
+      self.build_tables()
+    self.errors = 0
+    # SLY guarda la posición de cada valor reducido por su id; las de
+    # un parse no sirven para el siguiente
+    self._line_positions = {}
+    self._index_positions = {}
+    ast = super().parse(tokens)
+    if isinstance(ast, Node):
+      self.set_spans(ast)
+    return ast
+
+  def set_spans(self, ast):
+    # pos/endpos de cada nodo, de la última regla que lo devolvió
+    positions = self._index_positions
+    for node in walk(ast):
+      node.pos, node.endpos = positions.get(id(node), (None, None))
+
+  def error(self, token):
+    # Se cuentan los errores de sintaxis de cada parse (Context no
+    # guarda en caché una función con errores)
+    self.errors += 1
+    if self.diagnostics is None:
+      return super().error(token)
+    if token:
+      self.diagnostics.add(f'Syntax error at {token.value!r}', token.index, token.end, token.lineno)
+    else:
+      self.diagnostics.add('Syntax error at end of input')
+
   # grammar rules implementation
 
   @_('funcList')
   def program(self, p):
     return Program(p.funcList)
   
-  @_('func funcList')
+  # Las listas son recursivas por la izquierda: se reduce cada elemento
+  # en cuanto se lee (pila LALR constante) y se agrega a la lista ya
+  # construida en tiempo O(1)
+  @_('funcList func')
   def funcList(self, p):
-    return [p.func] + p.funcList
+    p.funcList.append(p.func)
+    return p.funcList
   
   @_('func')
   def funcList(self, p):
@@ -49,9 +165,10 @@ class ParserForPL0(Parser):
   def func(self, p):
     return Function(p.ID, [], [], p.statementList)
   
-  @_('statements SEMICOLON statementList')
+  @_('statementList SEMICOLON statements')
   def statementList(self, p):
-    return p.statements + p.statementList
+    p.statementList.extend(p.statements)
+    return p.statementList
   
   @_('statements')
   def statementList(self, p):
@@ -137,9 +254,10 @@ class ParserForPL0(Parser):
   def relation(self, p):
     return p.relation
 
-  @_('expr COMMA exprList')
+  @_('exprList COMMA expr')
   def exprList(self, p):
-    return [p.expr] + p.exprList
+    p.exprList.append(p.expr)
+    return p.exprList
 
   @_('expr')
   def exprList(self, p):
@@ -185,17 +303,19 @@ class ParserForPL0(Parser):
   def expr(self, p):
     return TypeCast(p.TFLOAT, p.expr)
   
-  @_('varDecl COMMA paramList')
+  @_('paramList COMMA varDecl')
   def paramList(self, p):
-    return [p.varDecl] + p.paramList
+    p.paramList.append(p.varDecl)
+    return p.paramList
 
   @_('varDecl')
   def paramList(self, p):
     return [p.varDecl]
   
-  @_('varDecl SEMICOLON varList', 'func SEMICOLON varList')
+  @_('varList varDecl SEMICOLON', 'varList func SEMICOLON')
   def varList(self, p):
-    return [p[0]] + p.varList
+    p.varList.append(p[1])
+    return p.varList
   
   @_('varDecl SEMICOLON', 'func SEMICOLON')
   def varList(self, p):
@@ -234,9 +354,44 @@ class ParserForPL0(Parser):
     return Vector(p.ID, p.expr)
   
 
-def gen_ast(text_input):
-  lexer = LexerForPL0()
+def read_tables(filename, signature):
+  try:
+    with open(filename, 'rb') as f:
+      data = marshal.load(f)
+  except (OSError, EOFError, ValueError, TypeError):
+    return None
+  if not isinstance(data, tuple) or len(data) != 4 or data[0] != signature:
+    return None
+  return ParserTables(*data[1:])
+
+
+def write_tables(filename, signature, lrtable):
+  # Escritura atómica: varios procesos pueden generar la tabla a la vez
+  data = (signature, lrtable.lr_action, lrtable.lr_goto, lrtable.defaulted_states)
+  try:
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(filename), suffix='.tmp')
+  except OSError:
+    return
+  try:
+    with os.fdopen(fd, 'wb') as f:
+      marshal.dump(data, f)
+    os.replace(tmp, filename)
+  except (OSError, ValueError):
+    # No se deja el temporal a medias
+    try:
+      os.remove(tmp)
+    except OSError:
+      pass
+
+
+def gen_ast(text_input, fast=False):
   parser = ParserForPL0()
+  if fast:
+    # Lexer columnar (fastlex) adaptado a objetos Token de SLY
+    from fastlex import tokenize
+    return parser.parse(tokenize(text_input).tokens())
+  lexer = LexerForPL0()
   return parser.parse(lexer.tokenize(text_input))
 
 
@@ -1,11 +1,12 @@
 # pl0.py
 '''
-usage: pl0.py [-h] [-d] [-o OUT] [-l] [-D] [-p] [-I] [--sym] [-S] [-R] input
+usage: pl0.py [-h] [-d] [-o OUT] [-l] [-D] [-p] [-I] [-a] [--sym] [-S] [-R] [--engine {vm,py,closure,ast}] [-O {0,1,2}] [--opt-report] [--ra-report] [--cache] [--cache-dir DIR] [--cache-stats] [--diagnostics {text,short,json}] [--time-passes] [--mem-stats] [--mem-budget SIZE] [--stats-format {text,json}] [--check-jobs N] [-j JOBS] [--codegen] [--verbose] [input ...]
 
 Compiler for PL0
 
 positional arguments:
-  input              PL0 program file to compile
+  input              PL0 program file to compile. Several files, directories or
+                     glob patterns compile all of them in parallel (batch mode)
 
 optional arguments:
   -h, --help         show this help message and exit
@@ -15,18 +16,66 @@ optional arguments:
   -d, --dot          Generate AST graph as DOT format
   -p, --png          Generate AST graph as png format
   -I, --ir           Dump the generated Intermediate representation
+  -a, --ast          Store the checked AST in flat binary form (astfile)
   --sym              Dump the symbol table
   -S, --asm          Store the generated assembly file
   -R, --exec         Execute the generated program
+  --engine {vm,py,closure,ast}
+                     Engine used by -R: register VM, CPython code objects,
+                     closures or AST interpreter
+  -O {0,1,2}         Optimization level
+  --opt-report       Print the instructions removed by each optimization pass
+  --ra-report        Print the register allocation spill statistics of each function
+  --cache            Reuse the checked AST, IR and bytecode stored by earlier compilations
+  --cache-dir DIR    Cache directory (default ~/.cache/pl0)
+  --cache-stats      Print the cache hit/miss statistics
+  --diagnostics {text,short,json}
+                     Format of the lexer and parser error report
+  --time-passes      Print the time, counts and throughput of each compiler phase
+  --mem-stats        Print the peak and retained memory of each compiler phase and the
+                     size of tokens, AST nodes and symbol tables
+  --mem-budget SIZE  Stop compiling with a memory report when traced memory exceeds SIZE
+                     (e.g. 512M, 2G)
+  --stats-format {text,json}
+                     Format of the --time-passes and --mem-stats reports
+  --check-jobs N     Type-check the functions of a large program with N processes
+  -j JOBS, --jobs JOBS
+                     Worker processes in batch mode (default: all CPUs)
+  --codegen          In batch mode, also generate VM bytecode (at the -O level)
+  --verbose          In batch mode, list every file, not only the failed ones
 '''
 from contextlib import redirect_stdout
 from rich       import print
 
-from lexer_pl0   import print_lexer
+from lexer_pl0   import print_lexer, print_tokens
 from parser_pl0  import gen_ast
 from context     import Context
+from fastlex     import tokenize_file
+from vm          import CompileError, VMError
+from cgen        import NativeError
+from diskcache   import DiskCache, VERSION
+from batch       import run_batch
+from timing      import PassTimer
+from memstats    import MemoryTracker, MemoryBudgetError, parse_size
+import astfile
 
 import argparse
+import os
+import sys
+
+# Por encima de este tamaño el lexer trabaja por trozos sobre un mmap
+STREAM_SIZE = 8 << 20
+
+# Opciones que producen la salida de un único programa
+SINGLE_FILE_FLAGS = (
+  ('-l', 'lex'), ('-d', 'dot'), ('-p', 'png'), ('-I', 'ir'), ('-a', 'ast'),
+  ('--sym', 'sym'), ('-R', 'exec'), ('-o', 'out'), ('-S', 'asm'),
+)
+
+
+def batch_mode(inputs):
+  # Varios archivos, o un directorio o un patrón
+  return len(inputs) > 1 or (len(inputs) == 1 and not os.path.isfile(inputs[0]))
 
 
 def parse_args():
@@ -37,15 +86,16 @@ def parse_args():
   cli.add_argument(
     '-v', '--version',
     action='version',
-    version='0.1')
+    version=VERSION)
 
   fgroup = cli.add_argument_group('Formatting options')
 
   fgroup.add_argument(
     'input',
     type=str,
-    nargs='?',
-    help='PL0 program file to compile')
+    nargs='*',
+    help='PL0 program file to compile. Several files, directories or glob patterns '
+         'compile all of them in parallel (batch mode)')
 
   mutex = fgroup.add_mutually_exclusive_group()
 
@@ -66,32 +116,184 @@ def parse_args():
     action='store_true',
     help='Generate AST graph as png format')
 
+  mutex.add_argument(
+    '-I', '--ir',
+    action='store_true',
+    help='Dump the generated Intermediate representation')
+
+  mutex.add_argument(
+    '-a', '--ast',
+    action='store_true',
+    help='Store the checked AST in flat binary form (astfile)')
+
   mutex.add_argument(
     '--sym',
     action='store_true',
     help='Dump the symbol table')
 
-  return cli.parse_args()
+  mutex.add_argument(
+    '-R', '--exec',
+    action='store_true',
+    help='Execute the generated program')
+
+  cli.add_argument(
+    '-D', '--debug',
+    action='store_true',
+    help='Generate assembly with extra information (for debugging purposes)')
+
+  cli.add_argument(
+    '-o', '--out',
+    type=str,
+    help='File name to store generated executable')
+
+  cli.add_argument(
+    '-S', '--asm',
+    action='store_true',
+    help='Store the generated assembly file')
+
+  cli.add_argument(
+    '--engine',
+    choices=('vm', 'py', 'closure', 'ast'),
+    default='vm',
+    help='Engine used by -R: register VM, CPython code objects, closures or AST interpreter')
+
+  cli.add_argument(
+    '-O',
+    dest='opt',
+    type=int,
+    choices=(0, 1, 2),
+    default=None,
+    help='Optimization level (-O0, -O1, -O2)')
+
+  cli.add_argument(
+    '--opt-report',
+    action='store_true',
+    help='Print the instructions removed by each optimization pass')
+
+  cli.add_argument(
+    '--ra-report',
+    action='store_true',
+    help='Print the register allocation spill statistics of each function')
+
+  cli.add_argument(
+    '--cache',
+    action='store_true',
+    help='Reuse the checked AST, IR and bytecode stored by earlier compilations')
+
+  cli.add_argument(
+    '--cache-dir',
+    metavar='DIR',
+    default=None,
+    help='Cache directory (default ~/.cache/pl0)')
+
+  cli.add_argument(
+    '--cache-stats',
+    action='store_true',
+    help='Print the cache hit/miss statistics')
+
+  cli.add_argument(
+    '--diagnostics',
+    choices=['text', 'short', 'json'],
+    default='text',
+    help='Format of the lexer and parser error report')
+
+  cli.add_argument(
+    '--time-passes',
+    action='store_true',
+    help='Print the time, counts and throughput of each compiler phase')
+
+  cli.add_argument(
+    '--mem-stats',
+    action='store_true',
+    help='Print the peak and retained memory of each compiler phase and the size of tokens, AST nodes and symbol tables')
+
+  cli.add_argument(
+    '--mem-budget',
+    type=parse_size,
+    metavar='SIZE',
+    default=None,
+    help='Stop compiling with a memory report when traced memory exceeds SIZE (e.g. 512M, 2G)')
+
+  cli.add_argument(
+    '--stats-format',
+    choices=['text', 'json'],
+    default='text',
+    help='Format of the --time-passes and --mem-stats reports')
+
+  cli.add_argument(
+    '--check-jobs',
+    type=int,
+    default=None,
+    metavar='N',
+    help='Type-check the functions of a large program with N processes')
+
+  batch = cli.add_argument_group('Batch mode')
+
+  batch.add_argument(
+    '-j', '--jobs',
+    type=int,
+    default=None,
+    help='Worker processes in batch mode (default: all CPUs)')
+
+  batch.add_argument(
+    '--codegen',
+    action='store_true',
+    help='In batch mode, also generate VM bytecode (at the -O level)')
+
+  batch.add_argument(
+    '--verbose',
+    action='store_true',
+    help='In batch mode, list every file, not only the failed ones')
+
+  args = cli.parse_args()
+  if batch_mode(args.input):
+    # Las salidas de un solo programa no tienen sentido en modo batch
+    used = [flag for flag, dest in SINGLE_FILE_FLAGS if getattr(args, dest)]
+    if used:
+      cli.error(f'{", ".join(used)}: only allowed with a single input file, not in batch mode')
+  return args
 
 
 if __name__ == '__main__':
 
   args = parse_args()
   context = Context()
+  context.check_jobs = args.check_jobs
+  if args.time_passes:
+    context.timer = PassTimer()
+  if args.mem_stats or args.mem_budget:
+    context.memory = MemoryTracker(args.mem_budget)
+    context.memory.start()
+  cache = DiskCache(args.cache_dir) if args.cache or args.cache_dir else None
 
-  if args.input: fname = args.input
+  fname = None
+  if args.input and not batch_mode(args.input):
+    fname = args.input[0]
+    stream = os.path.getsize(fname) > STREAM_SIZE
 
-  with open(fname, encoding='utf-8') as file:
-    source = file.read()
+  if batch_mode(args.input):
+    # Varios archivos, directorios o patrones: modo batch. El informe
+    # no pasa por rich (los nombres y mensajes no son markup)
+    cache_dir = cache.path if cache is not None else None
+    report = run_batch(args.input, args.jobs, args.opt, args.codegen, cache_dir, args.mem_budget)
+    sys.stdout.write(report.format(args.verbose) + '\n')
+    if report.failed:
+      sys.exit(1)
 
-  if args.lex:
+  elif args.input and args.lex:
     flex = fname.split('.')[0] + '.lex'
     print(f'print lexer: {flex}')
     with open(flex, 'w', encoding='utf-8') as f:
       with redirect_stdout(f):
-        print_lexer(source)
+        if stream:
+          print_tokens(tokenize_file(fname))
+        else:
+          with open(fname, encoding='utf-8') as file:
+            print_lexer(file.read())
 
-  elif args.dot or args.png:
+  elif args.input and (args.dot or args.png):
+    with open(fname, encoding='utf-8') as file:
+      source = file.read()
     ast, dot = gen_ast(source)
     base = fname.split('.')[0]
 
@@ -105,9 +307,76 @@ if __name__ == '__main__':
     elif args.png:
       ...
 
-    else:
-      context.parse(source)
-      context.run()
+  elif args.input:
+    try:
+      if stream:
+        context.parse_file(fname)
+      else:
+        with open(fname, encoding='utf-8') as file:
+          source = file.read()
+        if cache is not None:
+          context.parse_cached(source, cache, ('O', args.opt))
+        else:
+          context.parse(source)
+      if context.diagnostics:
+        sys.stdout.write(context.report(args.diagnostics) + '\n')
+      if args.ir:
+        context.run()
+        if context.ircode(args.opt):
+          fir = fname.split('.')[0] + '.ir'
+          print(f'print ir: {fir}')
+          with open(fir, 'w', encoding='utf-8') as f:
+            f.write(context.ir.dump())
+      elif args.ast:
+        context.run()
+        if not context.have_errors:
+          fast = fname.split('.')[0] + '.ast'
+          print(f'print ast: {fast}')
+          astfile.dump(context.ast, fast)
+      elif args.exec:
+        try:
+          context.execute(opt_level=args.opt, engine=args.engine)
+        except CompileError as e:
+          print(f'Compile error: {e}')
+        except VMError as e:
+          print(f'Runtime error: {e}')
+      elif args.asm or args.out:
+        try:
+          if args.asm:
+            fasm = fname.split('.')[0] + '.s'
+            if context.native(fasm, asm=True, opt_level=args.opt, debug=args.debug):
+              print(f'print asm: {fasm}')
+            if args.debug and context.csource:
+              fc = fname.split('.')[0] + '.c'
+              print(f'print c: {fc}')
+              with open(fc, 'w', encoding='utf-8') as f:
+                f.write(context.csource)
+          if args.out and context.native(args.out, opt_level=args.opt, debug=args.debug):
+            print(f'print executable: {args.out}')
+        except NativeError as e:
+          print(f'Native error: {e}')
+      else:
+        context.run()
+      if args.opt_report and context.lifted:
+        print(f'lambda lifting: {len(context.lifted)} made global')
+        for name in context.lifted:
+          print(f'  {name}')
+      if args.opt_report and context.opt_report:
+        print(context.opt_report.format())
+      if args.ra_report and context.regalloc:
+        print(context.regalloc.format())
+      if cache is not None:
+        context.save(cache)
+        if args.cache_stats:
+          print(cache.report())
+      if context.timer is not None:
+        sys.stdout.write(context.timer.format(args.stats_format) + '\n')
+      if context.memory is not None and args.mem_stats:
+        sys.stdout.write(context.memory.format(args.stats_format) + '\n')
+    except MemoryBudgetError as e:
+      # Se detiene la compilación con el informe hasta ese momento
+      sys.stdout.write(f'{e}\n{context.memory.format(args.stats_format)}\n')
+      sys.exit(1)
 
   else:
 
@@ -115,6 +384,8 @@ if __name__ == '__main__':
       while True:
         source = input('pl0 $ ')
         context.parse(source)
+        if context.diagnostics:
+          sys.stdout.write(context.report(args.diagnostics) + '\n')
         if not context.have_errors:
           for stmt in context.ast.stmts:
             context.ast = stmt
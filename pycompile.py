@@ -0,0 +1,459 @@
+# pycompile.py
+'''
+Compilación de PL0 a código de CPython
+======================================
+PythonCompiler traduce el AST ya revisado por Checker a un módulo de
+Python (un árbol del módulo ast), que se compila con compile() a un
+objeto código. Así los programas PL0 se ejecutan dentro del mismo
+proceso a la velocidad del bytecode de CPython, sin un ciclo de
+interpretación propio.
+
+  - cada Function es una función de Python; las funciones anidadas son
+    funciones anidadas de Python y las variables de las funciones que
+    las contienen se usan como variables libres (con nonlocal cuando
+    se les asigna)
+  - las variables locales empiezan en 0 o 0.0 y los vectores son
+    array('q') o array('d'); un índice negativo es un error, como en la
+    VM
+  - while/if/break se traducen directamente y and/or/not son los de
+    Python (en cortocircuito)
+  - la división entera trunca hacia cero (_pl0_divi)
+  - las conversiones int <-> float (TypeCast) usan float_to_int e
+    int_to_float de vm.py, que informan inf, nan y desbordes con VMError
+  - guardar en un vector int un entero que no cabe en 64 bits es un
+    VMError (try alrededor de la asignación)
+
+El runtime (read/write/print) se enlaza al cargar el programa
+(PyProgram.load) con la entrada y la salida dadas. compile_python
+guarda los programas compilados en un caché por el hash del fuente.
+'''
+import ast as pyast
+import builtins
+import hashlib
+import keyword
+import sys
+from array import array
+from collections import OrderedDict
+
+from model_ast import *
+from vm        import VMError, read_tokens, read_value, float_to_int, int_to_float
+
+
+class PyCompileError(Exception):
+  '''
+  El programa usa algo que no se puede traducir a Python.
+  '''
+  pass
+
+
+# Límite de recursión de Python mientras se ejecuta un programa PL0
+RECURSION_LIMIT = 20_000
+
+# Programas compilados: hash del fuente -> PyProgram
+CACHE_SIZE = 64
+_cache = OrderedDict()
+
+
+def _divi(x, y):
+  q = abs(x) // abs(y)
+  return q if (x < 0) == (y < 0) else -q
+
+
+def _newvec(typecode, size):
+  if size < 0:
+    raise VMError('Negative vector size')
+  return array(typecode, bytes(8 * size))
+
+
+def _out_of_range():
+  raise IndexError
+
+
+def _overflow():
+  raise VMError('Vector element overflow')
+
+
+def runtime(stdin=None, stdout=None):
+  # Nombres globales que usa el código generado
+  tokens = read_tokens(stdin if stdin is not None else sys.stdin)
+  return {
+    '__builtins__': builtins,
+    '_pl0_divi': _divi,
+    '_pl0_newvec': _newvec,
+    '_pl0_range': _out_of_range,
+    '_pl0_overflow': _overflow,
+    '_pl0_ftoi': float_to_int,
+    '_pl0_itof': int_to_float,
+    '_pl0_read': lambda is_float: read_value(tokens, is_float),
+    '_pl0_write': (stdout if stdout is not None else sys.stdout).write,
+  }
+
+
+# ---------------------------------------------------------------------
+#  Construcción de nodos
+# ---------------------------------------------------------------------
+
+def load(name):
+  return pyast.Name(name, pyast.Load())
+
+
+def store(name):
+  return pyast.Name(name, pyast.Store())
+
+
+def const(value):
+  return pyast.Constant(value)
+
+
+def call(name, *args):
+  return pyast.Call(load(name), list(args), [])
+
+
+BINOPS  = { '+': pyast.Add, '-': pyast.Sub, '*': pyast.Mult, '/': pyast.Div }
+COMPARE = {
+  '<': pyast.Lt, '<=': pyast.LtE, '>': pyast.Gt, '>=': pyast.GtE,
+  '==': pyast.Eq, '!=': pyast.NotEq,
+}
+
+
+@dataclass(slots=True)
+class PySymbol:
+  kind   : str               # 'var' o 'func'
+  name   : str               # nombre en Python
+  type   : str               # 'int', 'float', 'int[]', 'float[]' o tipo de retorno
+  owner  : object = None     # PyScope que la declara
+  ptypes : list = None
+
+
+class PyScope:
+
+  def __init__(self, parent=None):
+    self.parent = parent
+    self.names = {}
+    self.assigned = set()    # variables de afuera a las que se asigna (nonlocal)
+
+  def get(self, name):
+    scope = self
+    while scope is not None:
+      if name in scope.names:
+        return scope.names[name]
+      scope = scope.parent
+    return None
+
+
+def pyname(name):
+  # Los nombres de PL0 que chocan con Python o con el runtime llevan _;
+  # los calificados (funciones sacadas por lifting.py) van como _pl0_a__b
+  if '.' in name:
+    return '_pl0_' + name.replace('.', '__')
+  if keyword.iskeyword(name) or name.startswith('_pl0') or name in ('int', 'float', 'str'):
+    return name + '_'
+  return name
+
+
+class PythonCompiler(Visitor):
+  '''
+  Traduce un Program revisado a un ast.Module.
+  '''
+  @classmethod
+  def translate(cls, ast):
+    return ast.accept(cls(), PyScope())
+
+  # Declaraciones
+
+  def declare(self, n, scope):
+    if n.id in scope.names:
+      raise PyCompileError(f'Symbol {n.id} already defined')
+    ptypes = [self.var_type(param) for param in n.parameters]
+    scope.names[n.id] = PySymbol('func', pyname(n.id), n.dtype.type or 'int', scope, ptypes)
+
+  def var_type(self, var):
+    dtype = var.type.type
+    return dtype + '[]' if isinstance(var, VectorVar) else dtype
+
+  def visit(self, n: Program, scope: PyScope):
+    for func in n.functions:
+      self.declare(func, scope)
+    body = [func.accept(self, scope) for func in n.functions]
+    main = scope.names.get('main')
+    if main is None or main.kind != 'func':
+      raise PyCompileError('Main function not found')
+    return pyast.fix_missing_locations(pyast.Module(body, []))
+
+  def visit(self, n: Function, scope: PyScope):
+    sym = scope.names[n.id]
+    env = PyScope(scope)
+    self.rtype = sym.type
+    params = []
+    for param in n.parameters:
+      params.append(pyast.arg(self.local(param, env)))
+    body = []
+    nested = []
+    for var in n.variables:
+      if isinstance(var, Function):
+        self.declare(var, env)
+        nested.append(var)
+        continue
+      name = self.local(var, env)
+      if isinstance(var, VectorVar):
+        code = 'd' if var.type.type == 'float' else 'q'
+        value = call('_pl0_newvec', const(code), self.expr(var.size, env, 'int'))
+      else:
+        value = const(0.0 if var.type.type == 'float' else 0)
+      body.append(pyast.Assign([store(name)], value))
+    for var in nested:
+      body.append(var.accept(self, env))
+      self.rtype = sym.type
+    for stmt in n.statements:
+      body.extend(self.stmt(stmt, env))
+    body.append(pyast.Return(const(0.0 if sym.type == 'float' else 0)))
+    if env.assigned:
+      body.insert(0, pyast.Nonlocal(sorted(env.assigned)))
+    args = pyast.arguments([], params, None, [], [], None, [])
+    return pyast.FunctionDef(sym.name, args, body, [], None)
+
+  def local(self, var, scope):
+    if var.id in scope.names:
+      raise PyCompileError(f'Symbol {var.id} already defined')
+    sym = scope.names[var.id] = PySymbol('var', pyname(var.id), self.var_type(var), scope)
+    return sym.name
+
+  def variable(self, name, scope):
+    sym = scope.get(name)
+    if sym is None or sym.kind != 'var':
+      raise PyCompileError(f'Variable {name} not found')
+    return sym
+
+  def target(self, name, scope):
+    # Nombre al que se asigna (nonlocal si es de una función de afuera)
+    sym = self.variable(name, scope)
+    if sym.owner is not scope:
+      scope.assigned.add(sym.name)
+    return sym
+
+  # Sentencias: devuelven una lista de sentencias de Python
+
+  def stmt(self, n, scope):
+    if isinstance(n, Call):
+      # Llamada como sentencia: se descarta el valor
+      return [pyast.Expr(n.accept(self, scope)[0])]
+    return n.accept(self, scope)
+
+  def visit(self, n: Assign, scope: PyScope):
+    if isinstance(n.loct, Vector):
+      sym = self.variable(n.loct.id, scope)
+      value = self.expr(n.expr, scope, sym.type[:-2])
+      return self.store_element(sym, n.loct.index, value, scope)
+    sym = self.target(n.loct.id, scope)
+    return [pyast.Assign([store(sym.name)], self.expr(n.expr, scope, sym.type))]
+
+  def visit(self, n: OneStmt, scope: PyScope):
+    if n.key == 'print':
+      return [pyast.Expr(call('_pl0_write', const(n.value)))]
+    if n.key == 'write':
+      value, dtype = n.value.accept(self, scope)
+      if dtype == 'float':
+        text = pyast.BinOp(const('%.15g'), pyast.Mod(), value)
+      else:
+        text = call('str', value)
+      return [pyast.Expr(call('_pl0_write', text))]
+    if n.key == 'read':
+      if isinstance(n.value, Vector):
+        sym = self.variable(n.value.id, scope)
+        value = call('_pl0_read', const(sym.type == 'float[]'))
+        return self.store_element(sym, n.value.index, value, scope)
+      sym = self.target(n.value.id, scope)
+      return [pyast.Assign([store(sym.name)], call('_pl0_read', const(sym.type == 'float')))]
+    if n.key == 'return':
+      return [pyast.Return(self.expr(n.value, scope, self.rtype))]
+    raise PyCompileError(f'Unknown statement {n.key}')
+
+  def visit(self, n: DualStmt, scope: PyScope):
+    test = n.left.accept(self, scope)
+    body = self.stmt(n.right, scope) or [pyast.Pass()]
+    if n.keyLeft == 'while':
+      return [pyast.While(test, body, [])]
+    return [pyast.If(test, body, [])]
+
+  def visit(self, n: TripleStmt, scope: PyScope):
+    test = n.left.accept(self, scope)
+    then = self.stmt(n.middle, scope) or [pyast.Pass()]
+    orelse = self.stmt(n.right, scope)
+    return [pyast.If(test, then, orelse)]
+
+  def visit(self, n: Grouping, scope: PyScope):
+    body = []
+    for stmt in n.expr:
+      body.extend(self.stmt(stmt, scope))
+    return body
+
+  def visit(self, n: Single, scope: PyScope):
+    return [pyast.Break()] if n.key == 'break' else []
+
+  # Condiciones
+
+  def visit(self, n: Relation, scope: PyScope):
+    if n.rel == 'and' or n.rel == 'or':
+      op = pyast.And() if n.rel == 'and' else pyast.Or()
+      return pyast.BoolOp(op, [n.left.accept(self, scope), n.right.accept(self, scope)])
+    left, _ = n.left.accept(self, scope)
+    right, _ = n.right.accept(self, scope)
+    return pyast.Compare(left, [COMPARE[n.rel]()], [right])
+
+  def visit(self, n: Not, scope: PyScope):
+    return pyast.UnaryOp(pyast.Not(), n.rel.accept(self, scope))
+
+  # Expresiones: devuelven (nodo, tipo)
+
+  def expr(self, n, scope, dtype):
+    value, etype = n.accept(self, scope)
+    if etype != dtype:
+      return call('_pl0_itof' if dtype == 'float' else '_pl0_ftoi', value)
+    return value
+
+  def store_element(self, sym, index, value, scope):
+    # v[i] := value; array('q') no acepta enteros de más de 64 bits
+    stmt = pyast.Assign([self.element(sym, index, scope, pyast.Store())], value)
+    if sym.type != 'int[]':
+      return [stmt]
+    handler = pyast.ExceptHandler(load('OverflowError'), None, [pyast.Expr(call('_pl0_overflow'))])
+    return [pyast.Try([stmt], [handler], [], [])]
+
+  def element(self, sym, index, scope, ctx):
+    # v[i] con i >= 0 (los arrays de Python aceptan índices negativos)
+    if isinstance(index, Integer) and index.value >= 0:
+      key = const(index.value)
+    else:
+      value = self.expr(index, scope, 'int')
+      test = pyast.Compare(pyast.NamedExpr(store('_pl0_i'), value), [pyast.GtE()], [const(0)])
+      key = pyast.IfExp(test, load('_pl0_i'), call('_pl0_range'))
+    return pyast.Subscript(load(sym.name), key, ctx)
+
+  def visit(self, n: Integer, scope: PyScope):
+    return const(n.value), 'int'
+
+  def visit(self, n: Float, scope: PyScope):
+    return const(n.value), 'float'
+
+  def visit(self, n: Ident, scope: PyScope):
+    sym = self.variable(n.id, scope)
+    return load(sym.name), sym.type
+
+  def visit(self, n: Vector, scope: PyScope):
+    sym = self.variable(n.id, scope)
+    return self.element(sym, n.index, scope, pyast.Load()), sym.type[:-2]
+
+  def visit(self, n: Binary, scope: PyScope):
+    left, ltype = n.left.accept(self, scope)
+    right, rtype = n.right.accept(self, scope)
+    dtype = 'float' if 'float' in (ltype, rtype) else 'int'
+    if n.op == '/' and dtype == 'int':
+      return call('_pl0_divi', left, right), dtype
+    return pyast.BinOp(left, BINOPS[n.op](), right), dtype
+
+  def visit(self, n: TypeCast, scope: PyScope):
+    return self.expr(n.expr, scope, n.op), n.op
+
+  def visit(self, n: Unary, scope: PyScope):
+    value, dtype = n.expr.accept(self, scope)
+    if n.op != '-':
+      return value, dtype
+    return pyast.UnaryOp(pyast.USub(), value), dtype
+
+  def visit(self, n: Call, scope: PyScope):
+    sym = scope.get(n.id)
+    if sym is None or sym.kind != 'func':
+      raise PyCompileError(f'Function {n.id} not found')
+    args = [self.expr(arg, scope, ptype) for arg, ptype in zip(n.expr, sym.ptypes)]
+    return pyast.Call(load(sym.name), args, []), sym.type
+
+
+# ---------------------------------------------------------------------
+#  Programas compilados
+# ---------------------------------------------------------------------
+
+class PyProgram:
+  '''
+  Programa PL0 compilado a un objeto código de Python. functions tiene
+  el nombre en Python de cada función de primer nivel.
+  '''
+  def __init__(self, module, functions, filename='<pl0>'):
+    self.module = module
+    self.functions = functions
+    self.code = compile(module, filename, 'exec')
+
+  @property
+  def source(self):
+    return pyast.unparse(self.module) + '\n'
+
+  def load(self, stdin=None, stdout=None):
+    '''
+    Ejecuta el módulo con el runtime enlazado a stdin/stdout y devuelve
+    un PL0Module con las funciones.
+    '''
+    namespace = runtime(stdin, stdout)
+    exec(self.code, namespace)
+    return PL0Module({ name: namespace[py] for name, py in self.functions.items() })
+
+  def run(self, stdin=None, stdout=None, name='main', *args):
+    return getattr(self.load(stdin, stdout), name)(*args)
+
+
+class PL0Module:
+  '''
+  Funciones de un programa cargado. Cada una se llama como una función
+  de Python (los vectores son array('q') o array('d')) y los errores en
+  tiempo de ejecución se informan con VMError.
+  '''
+  def __init__(self, functions):
+    self._functions = functions
+
+  def __getattr__(self, name):
+    try:
+      func = self._functions[name]
+    except KeyError:
+      raise AttributeError(name) from None
+    def wrapper(*args):
+      return call_pl0(func, args)
+    wrapper.__name__ = name
+    return wrapper
+
+  def __getitem__(self, name):
+    return self.__getattr__(name)
+
+  def __dir__(self):
+    return list(self._functions)
+
+
+def call_pl0(func, args):
+  limit = sys.getrecursionlimit()
+  sys.setrecursionlimit(max(limit, RECURSION_LIMIT))
+  try:
+    return func(*args)
+  except ZeroDivisionError:
+    raise VMError('Division by zero') from None
+  except IndexError:
+    raise VMError('Vector index out of range') from None
+  except RecursionError:
+    raise VMError('Call stack overflow') from None
+  finally:
+    sys.setrecursionlimit(limit)
+
+
+def compile_python(ast, source=None):
+  '''
+  PyProgram de un AST ya revisado. Si se da el fuente, el resultado se
+  guarda en un caché por su hash y se reutiliza.
+  '''
+  key = hashlib.sha256(source.encode('utf-8')).hexdigest() if source is not None else None
+  if key in _cache:
+    _cache.move_to_end(key)
+    return _cache[key]
+  module = PythonCompiler.translate(ast)
+  functions = { func.id: pyname(func.id) for func in ast.functions }
+  program = PyProgram(module, functions)
+  if key is not None:
+    _cache[key] = program
+    if len(_cache) > CACHE_SIZE:
+      _cache.popitem(last=False)
+  return program
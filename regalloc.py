@@ -0,0 +1,284 @@
+# regalloc.py
+'''
+Asignación de registros por barrido lineal (linear scan)
+========================================================
+Asigna los registros virtuales de una IRFunction (sin límite) a los
+registros de una máquina (Machine) a partir de sus intervalos de vida:
+
+  1. Las instrucciones se numeran en el orden de los bloques. Con los
+     registros vivos de cada bloque (dataflow.liveness) cada registro
+     virtual recibe un intervalo [start, end] que cubre todos los
+     puntos donde está vivo.
+  2. Los intervalos se recorren por su inicio. Los que ya terminaron
+     devuelven su registro; el intervalo actual toma el registro libre
+     más bajo de su clase. Si no hay, se desaloja (spill) el intervalo
+     activo que termina más tarde, o el actual si termina después.
+  3. Convención de llamadas: un intervalo que sigue vivo después de un
+     CALL sólo puede ir en un registro que la llamada preserva
+     (callee-saved); si no hay, va a memoria.
+
+Los valores desalojados reciben una celda de memoria (spill slot); las
+celdas también se reutilizan entre intervalos que no se solapan.
+
+Máquinas:
+
+  X86_64   registros de propósito general y xmm del ABI System V (sin
+           rax, rsp, rbp ni los registros temporales de la traducción);
+           los xmm no se preservan en las llamadas
+  VM       la VM de registros (vm.py): registros ilimitados y cada
+           llamada tiene su propio marco, así que no hay desalojos y la
+           asignación sólo compacta el marco
+
+Las variables que usan las funciones anidadas (IRFunction.captured) no
+se asignan: viven en el registro de activación de la función.
+'''
+from dataclasses import dataclass, field
+from typing import Dict, Tuple
+
+from dataflow import instr_uses, liveness
+from ircode   import Op
+
+
+@dataclass(slots=True, frozen=True)
+class Machine:
+  name        : str
+  int_regs    : Tuple[str, ...] = ()
+  float_regs  : Tuple[str, ...] = ()
+  callee_saved: frozenset = frozenset()
+  unlimited   : bool = False        # registros ilimitados de una sola clase
+
+  def regs(self, cls):
+    return self.float_regs if cls == 'float' else self.int_regs
+
+
+X86_64 = Machine(
+  'x86-64',
+  int_regs=('rbx', 'r12', 'r13', 'r14', 'r15', 'rcx', 'rdx', 'rsi', 'rdi', 'r8', 'r9', 'r10'),
+  float_regs=tuple(f'xmm{k}' for k in range(1, 14)),
+  callee_saved=frozenset(('rbx', 'r12', 'r13', 'r14', 'r15')))
+
+VM_MACHINE = Machine('vm', unlimited=True)
+
+
+def reg_class(dtype):
+  # Clase de registro de un tipo del IR (los vectores son referencias)
+  return 'float' if dtype == 'float' else 'int'
+
+
+@dataclass(slots=True)
+class Interval:
+  reg    : int
+  start  : int
+  end    : int
+  cls    : str
+  calls  : bool = False        # sigue vivo después de una llamada
+  uses   : int = 0
+  defs   : int = 0
+  phys   : int = None          # número de registro de la máquina
+  slot   : int = None          # celda de memoria si se desalojó
+
+
+def number(func):
+  # Posición de la primera y la última instrucción de cada bloque
+  bounds, pos = {}, 0
+  for block in func.blocks:
+    bounds[block.label] = (pos, pos + len(block.instrs) - 1)
+    pos += len(block.instrs)
+  return bounds
+
+
+def live_intervals(func, exclude=()):
+  '''
+  Intervalos de vida de los registros de func (salvo los de exclude y
+  los capturados), ordenados por inicio. Devuelve (intervalos,
+  registros vivos a la entrada).
+  '''
+  live_in, live_out = liveness(func)
+  bounds = number(func)
+  skip = set(exclude) | func.captured
+  ranges = {}
+  counts = {}
+
+  def extend(reg, pos):
+    if reg in skip:
+      return
+    lo, hi = ranges.get(reg, (pos, pos))
+    ranges[reg] = (min(lo, pos), max(hi, pos))
+
+  for k in range(func.nparams):
+    extend(k, 0)
+  calls = []
+  for block in func.blocks:
+    first, last = bounds[block.label]
+    for reg in live_in[block.label]:
+      extend(reg, first)
+    for reg in live_out[block.label]:
+      extend(reg, last)
+    for pos, instr in enumerate(block.instrs, first):
+      for reg in instr_uses(func, instr):
+        extend(reg, pos)
+        counts[reg, 'u'] = counts.get((reg, 'u'), 0) + 1
+      dst = instr.defs()
+      if dst is not None:
+        extend(dst, pos)
+        counts[dst, 'd'] = counts.get((dst, 'd'), 0) + 1
+      if instr.op is Op.CALL:
+        calls.append(pos)
+
+  intervals = []
+  for reg, (start, end) in ranges.items():
+    interval = Interval(reg, start, end, reg_class(func.regtypes[reg]),
+                        uses=counts.get((reg, 'u'), 0), defs=counts.get((reg, 'd'), 0))
+    interval.calls = any(start < pos < end for pos in calls)
+    intervals.append(interval)
+  intervals.sort(key=lambda iv: (iv.start, iv.reg))
+  entry = live_in[func.blocks[0].label] - skip if func.blocks else set()
+  return intervals, entry
+
+
+@dataclass(slots=True)
+class SpillStats:
+  function  : str
+  intervals : int = 0
+  spilled   : int = 0
+  slots     : int = 0
+  loads     : int = 0          # usos de valores desalojados
+  stores    : int = 0          # definiciones de valores desalojados
+  registers : int = 0          # registros de la máquina usados
+  pressure  : int = 0          # máximo de intervalos vivos a la vez
+  vregs     : int = 0          # registros virtuales de la función
+
+
+@dataclass(slots=True)
+class Allocation:
+  '''
+  Resultado de asignar una función: para cada registro virtual, su
+  registro de la máquina (phys) o su celda de memoria (slot).
+  '''
+  machine   : Machine
+  intervals : Dict[int, Interval] = field(default_factory=dict)
+  zeroed    : set = field(default_factory=set)    # vivos a la entrada (valen 0)
+  stats     : SpillStats = None
+
+  def phys(self, reg):
+    iv = self.intervals.get(reg)
+    return None if iv is None else iv.phys
+
+  def slot(self, reg):
+    iv = self.intervals.get(reg)
+    return None if iv is None else iv.slot
+
+  @property
+  def nphys(self):
+    return 1 + max((iv.phys for iv in self.intervals.values() if iv.phys is not None), default=-1)
+
+  def name(self, reg):
+    iv = self.intervals[reg]
+    if iv.slot is not None:
+      return f'[spill {iv.slot}]'
+    if self.machine.unlimited:
+      return f'R{iv.phys}'
+    return self.machine.regs(iv.cls)[iv.phys]
+
+
+class LinearScan:
+
+  def __init__(self, machine):
+    self.machine = machine
+
+  def allocate(self, func, exclude=()):
+    intervals, entry = live_intervals(func, exclude)
+    alloc = Allocation(self.machine, { iv.reg: iv for iv in intervals }, entry)
+    stats = alloc.stats = SpillStats(func.qualname, len(intervals), vregs=func.nregs)
+    active = []
+    free_slots = { 'int': [], 'float': [] }
+    nslots = 0
+    used = set()
+    if self.machine.unlimited:
+      free = { 'int': [] }
+    else:
+      free = { cls: list(range(len(self.machine.regs(cls)))) for cls in ('int', 'float') }
+
+    def release(iv):
+      free[self.cls(iv)].append(iv.phys)
+
+    spilled = []
+    for iv in intervals:
+      # Los intervalos que terminaron antes de éste liberan su registro
+      # o su celda
+      for old in [a for a in active if a.end < iv.start]:
+        active.remove(old)
+        release(old)
+      for old in [a for a in spilled if a.end < iv.start]:
+        spilled.remove(old)
+        free_slots[old.cls].append(old.slot)
+      cls = self.cls(iv)
+      candidates = [p for p in free[cls] if self.allowed(iv, p)]
+      if self.machine.unlimited and not candidates:
+        candidates = [len(used)]
+        free[cls].append(len(used))
+      if candidates:
+        iv.phys = min(candidates)
+        free[cls].remove(iv.phys)
+        used.add((cls, iv.phys))
+        active.append(iv)
+      else:
+        victims = [a for a in active if self.cls(a) == cls and self.allowed(iv, a.phys)]
+        victim = max(victims, key=lambda a: (a.end, a.reg), default=None)
+        if victim is not None and victim.end > iv.end:
+          iv.phys, victim.phys = victim.phys, None
+          active.remove(victim)
+          active.append(iv)
+          spill = victim
+        else:
+          spill = iv
+        if free_slots[spill.cls]:
+          spill.slot = free_slots[spill.cls].pop()
+        else:
+          spill.slot = nslots
+          nslots += 1
+        spilled.append(spill)
+        stats.spilled += 1
+        stats.loads += spill.uses
+        stats.stores += spill.defs
+      stats.pressure = max(stats.pressure, len(active) + len(spilled))
+    stats.slots = nslots
+    stats.registers = len(used)
+    return alloc
+
+  def cls(self, iv):
+    return 'int' if self.machine.unlimited else iv.cls
+
+  def allowed(self, iv, phys):
+    # Convención de llamadas: lo que cruza un CALL va en un registro
+    # que la llamada preserva
+    if not iv.calls or self.machine.unlimited:
+      return True
+    return self.machine.regs(iv.cls)[phys] in self.machine.callee_saved
+
+
+def allocate(func, machine=X86_64, exclude=()):
+  '''
+  Asigna los registros de func en machine y devuelve una Allocation.
+  '''
+  return LinearScan(machine).allocate(func, exclude)
+
+
+class AllocReport:
+  '''
+  Estadísticas de desalojo por función de una asignación de registros.
+  '''
+  def __init__(self, machine):
+    self.machine = machine
+    self.functions = []
+
+  def add(self, stats):
+    self.functions.append(stats)
+
+  def format(self):
+    total = sum(s.spilled for s in self.functions)
+    lines = [f'register allocation ({self.machine.name}): {total} spilled intervals']
+    for s in self.functions:
+      lines.append(f'  {s.function:12} vregs {s.vregs:4} regs {s.registers:3} pressure {s.pressure:3} '
+                   f'spilled {s.spilled:3} slots {s.slots:3} ld/st {s.loads}/{s.stores}')
+    return '\n'.join(lines)
@@ -0,0 +1,242 @@
+# resolver.py
+'''
+Resolución de nombres
+=====================
+Resolver recorre una vez el AST y reemplaza la búsqueda por nombre
+(Symtab.get sube por la cadena de diccionarios en cada uso) por
+direcciones fijas (depth, slot):
+
+  - Function: depth es su nivel de anidamiento (0 para las funciones
+    del programa, 1 para las declaradas en su varList, ...) y slot el
+    índice de su Frame en la lista que devuelve resolve()
+  - Var, VectorVar, Ident y Vector: depth de la función que declara la
+    variable y slot su posición en el marco de esa función
+  - Call: depth y slot de la función llamada
+
+Cada Frame es la disposición fija del marco de una función: primero
+los parámetros y después las variables locales, en el orden en que se
+declaran. Las funciones anidadas no ocupan lugar en el marco.
+
+Una variable con depth menor que el de la función que la usa está en
+el marco de una función que la contiene, depth - n.depth niveles
+afuera (por el enlace estático o en display[n.depth]). Frame.captured
+y Frame.free registran esos accesos para los backends.
+'''
+from dataclasses import dataclass, field
+
+from model_ast import *
+
+
+class ResolveError(Exception):
+  '''
+  Un nombre no está declarado, o está declarado dos veces en la misma
+  función.
+  '''
+  pass
+
+
+@dataclass(slots=True)
+class Frame:
+  '''
+  Marco de una función: names[k] y types[k] ('int', 'float[]', ...)
+  describen la posición k. captured son las posiciones que usan las
+  funciones anidadas y free las variables (depth, slot) de funciones
+  externas que usa esta función. calls son los slots de las funciones
+  que llama y sites los nodos Call que la llaman a ella.
+  '''
+  name     : str                # nombre calificado: externa.interna
+  depth    : int
+  node     : Function = field(repr=False)
+  parent   : 'Frame' = field(default=None, repr=False)
+  nparams  : int = 0
+  names    : list = field(default_factory=list)
+  types    : list = field(default_factory=list)
+  nested   : list = field(default_factory=list)
+  captured : set = field(default_factory=set)
+  free     : set = field(default_factory=set)
+  calls    : set = field(default_factory=set)
+  sites    : list = field(default_factory=list, repr=False)
+
+  @property
+  def size(self):
+    return len(self.names)
+
+  def add(self, name, dtype):
+    self.names.append(name)
+    self.types.append(dtype)
+    return len(self.names) - 1
+
+  def outer(self, depth):
+    # Frame de la función (que contiene a ésta) con ese depth
+    frame = self
+    while frame.depth > depth:
+      frame = frame.parent
+    return frame
+
+  def format(self):
+    cells = []
+    for k, (name, dtype) in enumerate(zip(self.names, self.types)):
+      mark = '*' if k in self.captured else ''
+      cells.append(f'{k}:{name}{mark}:{dtype}')
+    return f'{self.name} (depth {self.depth}) [' + ' '.join(cells) + ']'
+
+
+class Scope:
+
+  def __init__(self, depth, frame=None, parent=None):
+    self.depth = depth
+    self.frame = frame
+    self.parent = parent
+    self.names = {}
+
+  def get(self, name):
+    scope = self
+    while scope is not None:
+      node = scope.names.get(name)
+      if node is not None:
+        return node
+      scope = scope.parent
+    return None
+
+
+def var_type(var):
+  return var.type.type + ('[]' if isinstance(var, VectorVar) else '')
+
+
+class Resolver(Visitor):
+
+  def __init__(self):
+    self.frames = []
+
+  @classmethod
+  def annotate(cls, ast):
+    vis = cls()
+    ast.accept(vis, Scope(-1))
+    return vis.frames
+
+  # Declaraciones
+
+  def declare(self, n, scope):
+    if n.id in scope.names:
+      raise ResolveError(f'Symbol {n.id} already defined')
+    n.depth = scope.depth + 1
+    n.slot = len(self.frames)
+    name = n.id if scope.frame is None else f'{scope.frame.name}.{n.id}'
+    frame = Frame(name, n.depth, n, scope.frame)
+    if scope.frame is not None:
+      scope.frame.nested.append(n.slot)
+    self.frames.append(frame)
+    scope.names[n.id] = n
+
+  def local(self, n, scope):
+    if n.id in scope.names:
+      raise ResolveError(f'Symbol {n.id} already defined')
+    n.depth = scope.depth
+    n.slot = scope.frame.add(n.id, var_type(n))
+    scope.names[n.id] = n
+
+  def visit(self, n: Program, scope: Scope):
+    for func in n.functions:
+      self.declare(func, scope)
+    for func in n.functions:
+      func.accept(self, scope)
+
+  def visit(self, n: Function, scope: Scope):
+    frame = self.frames[n.slot]
+    env = Scope(n.depth, frame, scope)
+    for param in n.parameters:
+      self.local(param, env)
+    frame.nparams = len(n.parameters)
+    nested = []
+    for var in n.variables:
+      if isinstance(var, Function):
+        self.declare(var, env)
+        nested.append(var)
+      else:
+        self.local(var, env)
+    for var in n.variables:
+      if isinstance(var, VectorVar):
+        var.size.accept(self, env)
+    for stmt in n.statements:
+      stmt.accept(self, env)
+    for var in nested:
+      var.accept(self, env)
+
+  # Referencias
+
+  def variable(self, n, scope):
+    var = scope.get(n.id)
+    if not isinstance(var, Var):
+      raise ResolveError(f'Variable {n.id} not found')
+    n.depth, n.slot = var.depth, var.slot
+    if var.depth < scope.depth:
+      scope.frame.outer(var.depth).captured.add(var.slot)
+      scope.frame.free.add((var.depth, var.slot))
+
+  def visit(self, n: Ident, scope: Scope):
+    self.variable(n, scope)
+
+  def visit(self, n: Vector, scope: Scope):
+    self.variable(n, scope)
+    n.index.accept(self, scope)
+
+  def visit(self, n: Call, scope: Scope):
+    func = scope.get(n.id)
+    if not isinstance(func, Function):
+      raise ResolveError(f'Function {n.id} not found')
+    n.depth, n.slot = func.depth, func.slot
+    scope.frame.calls.add(func.slot)
+    self.frames[func.slot].sites.append(n)
+    for arg in n.expr:
+      arg.accept(self, scope)
+
+  # Sentencias y expresiones: sólo se recorren
+
+  def visit(self, n: Assign, scope: Scope):
+    n.loct.accept(self, scope)
+    n.expr.accept(self, scope)
+
+  def visit(self, n: OneStmt, scope: Scope):
+    if not isinstance(n.value, str):
+      n.value.accept(self, scope)
+
+  def visit(self, n: DualStmt, scope: Scope):
+    n.left.accept(self, scope)
+    n.right.accept(self, scope)
+
+  def visit(self, n: TripleStmt, scope: Scope):
+    n.left.accept(self, scope)
+    n.middle.accept(self, scope)
+    n.right.accept(self, scope)
+
+  def visit(self, n: Grouping, scope: Scope):
+    for stmt in n.expr:
+      stmt.accept(self, scope)
+
+  def visit(self, n: Single, scope: Scope):
+    pass
+
+  def visit(self, n: Relation, scope: Scope):
+    n.left.accept(self, scope)
+    n.right.accept(self, scope)
+
+  def visit(self, n: Not, scope: Scope):
+    n.rel.accept(self, scope)
+
+  def visit(self, n: Binary, scope: Scope):
+    n.left.accept(self, scope)
+    n.right.accept(self, scope)
+
+  def visit(self, n: Unary, scope: Scope):
+    n.expr.accept(self, scope)
+
+  def visit(self, n: Literal, scope: Scope):
+    pass
+
+
+def resolve(ast):
+  '''
+  Anota el AST con direcciones (depth, slot) y devuelve la lista de
+  Frame, uno por función (Function.slot es su índice).
+  '''
+  return Resolver.annotate(ast)
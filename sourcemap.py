@@ -0,0 +1,133 @@
+# sourcemap.py
+'''
+Posiciones en el fuente y diagnósticos
+======================================
+SourceMap se construye una vez por fuente y guarda dónde empieza cada
+línea; el número de línea y la columna de un desplazamiento se buscan
+con bisect, sin recorrer el texto.
+
+Diagnostics guarda los errores como registros compactos (mensaje,
+desplazamientos de inicio y fin, y la línea si se conoce) sin darles
+formato. Se convierten en texto (la línea del fuente, una marca ^^^ bajo
+el error y el mensaje) o en JSON todos juntos, sólo cuando se piden: el
+costo de informar un error no depende del largo del fuente ni de la
+línea.
+'''
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+import json
+import re
+
+_newline = re.compile('\n')
+
+
+class SourceMap:
+
+  def __init__(self, source):
+    self.source = source
+    self.starts = array('q', [0])
+    self.starts.extend(m.end() for m in _newline.finditer(source))
+
+  def line(self, offset):
+    # Número de línea (desde 1) del desplazamiento offset
+    return bisect_right(self.starts, offset)
+
+  def column(self, offset):
+    # Columna (desde 1)
+    return offset - self.starts[self.line(offset) - 1] + 1
+
+  def line_span(self, lineno):
+    # (inicio, fin) del texto de la línea, sin el '\n'
+    start = self.starts[lineno - 1]
+    if lineno < len(self.starts):
+      return start, self.starts[lineno] - 1
+    return start, len(self.source)
+
+  def line_text(self, lineno):
+    start, end = self.line_span(lineno)
+    return self.source[start:end]
+
+
+@dataclass(slots=True)
+class Diagnostic:
+  message  : str
+  start    : int = None     # desplazamiento en el fuente (None: sin posición)
+  end      : int = None
+  lineno   : int = None     # si no hay fuente (p. ej. Context.parse_file)
+  severity : str = 'error'
+
+
+class Diagnostics:
+
+  def __init__(self):
+    self.records = []
+
+  def __len__(self):
+    return len(self.records)
+
+  def __iter__(self):
+    return iter(self.records)
+
+  def add(self, message, start=None, end=None, lineno=None, severity='error'):
+    self.records.append(Diagnostic(message, start, end, lineno, severity))
+
+  def clear(self):
+    self.records.clear()
+
+  def locate(self, sourcemap, record):
+    # (línea, columna, línea final, columna final); columnas None si no
+    # hay fuente
+    if record.start is None or sourcemap is None:
+      return record.lineno, None, record.lineno, None
+    end = max(record.start, record.end if record.end is not None else record.start)
+    return (sourcemap.line(record.start), sourcemap.column(record.start),
+            sourcemap.line(end), sourcemap.column(end))
+
+  def format(self, sourcemap=None, style='text'):
+    '''
+    Los diagnósticos como texto (style='text', o 'short': una línea
+    línea:columna: mensaje por error) o como un arreglo JSON ('json').
+    '''
+    if style == 'json':
+      return json.dumps([self.as_dict(sourcemap, record) for record in self.records], indent=1)
+    if style == 'short':
+      return '\n'.join(self.format_short(sourcemap, record) for record in self.records)
+    lines = []
+    for record in self.records:
+      lines.extend(self.format_text(sourcemap, record))
+    return '\n'.join(lines)
+
+  def as_dict(self, sourcemap, record):
+    lineno, column, end_line, end_column = self.locate(sourcemap, record)
+    return {
+      'severity'   : record.severity,
+      'message'    : record.message,
+      'line'       : lineno,
+      'column'     : column,
+      'end_line'   : end_line,
+      'end_column' : end_column,
+      'start'      : record.start,
+      'end'        : record.end,
+    }
+
+  def format_short(self, sourcemap, record):
+    lineno, column, _, _ = self.locate(sourcemap, record)
+    if lineno is None:
+      return record.message
+    if column is None:
+      return f'{lineno}: {record.message}'
+    return f'{lineno}:{column}: {record.message}'
+
+  def format_text(self, sourcemap, record):
+    lineno, column, _, _ = self.locate(sourcemap, record)
+    if lineno is None:
+      return [record.message]
+    if column is None:
+      return [f'{lineno}: {record.message}']
+    # La marca llega, como mucho, hasta el fin de la primera línea
+    start, end = sourcemap.line_span(lineno)
+    stop = min(record.end if record.end is not None else record.start, end)
+    width = max(1, stop - record.start)
+    return ['', sourcemap.source[start:end], ' ' * (column - 1) + '^' * width,
+            f'{lineno}: {record.message}']
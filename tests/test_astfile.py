@@ -0,0 +1,67 @@
+# test_astfile.py
+'''
+astfile.dump/load: el AST reconstruido es igual al original y se
+ejecuta igual.
+'''
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import astfile
+from checker    import Checker
+from interp     import Interpreter
+from parser_pl0 import gen_ast
+
+
+SOURCE = '''fun big(n: int)
+  s: int;
+begin
+  s := 99999999999999999999;
+  if n > 0 then s := s - 100000000000000000000;
+  return s + n
+end
+fun main()
+  x: float;
+  v: int[3];
+begin
+  x := 2500.0;
+  v[0] := big(1);
+  write(v[0]); print(" ");
+  write(9223372036854775807 + 1); print(" ");
+  write(-9223372036854775808); print(" ");
+  write(x * -0.5)
+end
+'''
+
+
+def run(ast):
+  stdout = io.StringIO()
+  Interpreter.interpret(ast, io.StringIO(''), stdout)
+  return stdout.getvalue()
+
+
+def test_round_trip(tmp_path):
+  ast = gen_ast(SOURCE)
+  Checker.check(ast)
+  filename = tmp_path / 'big.ast'
+  astfile.dump(ast, filename)
+  with astfile.load(filename) as loaded:
+    copy = loaded.node()
+    assert copy == ast
+    assert run(copy) == run(ast) == '0 9223372036854775808 -9223372036854775808 -1250'
+    assert loaded.function('big') == ast.functions[0]
+
+
+def test_unsupported_constant_leaves_no_file(tmp_path):
+  ast = gen_ast(SOURCE)
+  ast.functions[0].id = object()
+  filename = tmp_path / 'bad.ast'
+  try:
+    astfile.dump(ast, filename)
+  except astfile.AstFileError:
+    pass
+  else:
+    raise AssertionError('dump accepted an unsupported constant')
+  assert not filename.exists()
@@ -0,0 +1,124 @@
+# test_batch.py
+'''
+Compilación en batch: el informe es el mismo en serie y en paralelo,
+los errores de cada archivo son los de compilarlo solo, y lo que el
+batch deja en el caché se ejecuta igual que el intérprete del AST.
+'''
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pl0
+from batch     import expand, run_batch
+from context   import Context
+from diskcache import DiskCache
+
+
+PROGRAMS = {
+  'fib.pl0': '''fun fib(n: int)
+begin
+  if n < 2 then return n;
+  return fib(n - 1) + fib(n - 2)
+end
+fun main()
+  n: int;
+begin
+  read(n);
+  write(fib(n))
+end
+''',
+  'scale.pl0': '''fun main()
+  v: float[3];
+  i: int;
+  fun scale(k: float)
+  begin
+    v[i] := v[i] * k
+  end;
+begin
+  read(v[0]); read(v[1]); read(v[2]);
+  i := 0;
+  while i < 3 do
+  begin
+    scale(float(i) + 0.5);
+    write(v[i]); print(" ");
+    i := i + 1
+  end
+end
+''',
+  'syntax.pl0': 'fun main()\nbegin\n  write(1 +)\nend\n',
+  'types.pl0': 'fun main()\n  x: int;\nbegin\n  x := 2.5\nend\n',
+}
+
+STDIN = '10 -2.5 4'
+
+
+def write_programs(path):
+  os.makedirs(path, exist_ok=True)
+  for name, source in PROGRAMS.items():
+    with open(os.path.join(path, name), 'w', encoding='utf-8') as f:
+      f.write(source)
+
+
+def compiles(source):
+  context = Context()
+  context.parse(source)
+  try:
+    context.run(opt_level=2)
+  except Exception:
+    return False
+  return not context.have_errors
+
+
+def test_serial_and_parallel(tmp_path):
+  write_programs(str(tmp_path))
+  serial = run_batch([str(tmp_path)], 1, 2, True)
+  parallel = run_batch([str(tmp_path)], 2, 2, True)
+  names = sorted(PROGRAMS)
+  for report in (serial, parallel):
+    assert [os.path.basename(res.filename) for res in report.results] == names
+    assert [res.ok for res in report.results] == [compiles(PROGRAMS[name]) for name in names]
+    assert report.failed == 2
+  assert [res.diagnostics for res in serial.results] == [res.diagnostics for res in parallel.results]
+
+
+def test_cached_programs_match_ast(tmp_path):
+  write_programs(str(tmp_path / 'src'))
+  cache_dir = str(tmp_path / 'cache')
+  run_batch([str(tmp_path / 'src')], 2, 2, True, cache_dir)
+  cache = DiskCache(cache_dir)
+  for name in ('fib.pl0', 'scale.pl0'):
+    context = Context()
+    assert context.parse_cached(PROGRAMS[name], cache, ('O', 2))
+    assert ('bytecode', 2) in context.artifacts
+    output, expected = io.StringIO(), io.StringIO()
+    context.run('vm', io.StringIO(STDIN), output, 2)
+    context.run('ast', io.StringIO(STDIN), expected)
+    assert output.getvalue() == expected.getvalue(), name
+
+
+def test_expand_only_programs(tmp_path):
+  write_programs(str(tmp_path))
+  (tmp_path / 'notes.txt').write_text('x')
+  (tmp_path / 'dir.pl0').mkdir()
+  missing = []
+  found = expand([str(tmp_path / '*'), str(tmp_path / '*.txt')], missing)
+  assert [os.path.basename(name) for name in found] == sorted(PROGRAMS)
+  assert missing == [str(tmp_path / '*.txt')]
+
+
+@pytest.mark.parametrize('flags', [['-R'], ['-S'], ['-o', 'out'], ['-a'], ['-I']])
+def test_single_file_flags_rejected(tmp_path, monkeypatch, capsys, flags):
+  write_programs(str(tmp_path))
+  inputs = [str(tmp_path / 'fib.pl0'), str(tmp_path / 'scale.pl0')]
+  for args in (inputs, [str(tmp_path)]):
+    monkeypatch.setattr(sys, 'argv', ['pl0.py'] + flags + args)
+    with pytest.raises(SystemExit) as exit:
+      pl0.parse_args()
+    assert exit.value.code == 2
+    assert flags[0] in capsys.readouterr().err
+  monkeypatch.setattr(sys, 'argv', ['pl0.py'] + flags + inputs[:1])
+  assert pl0.parse_args().input == inputs[:1]
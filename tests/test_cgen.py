@@ -0,0 +1,58 @@
+# test_cgen.py
+'''
+Ejecutables generados a través de C (-o) contra el intérprete del AST.
+Se salta si no hay un compilador de C.
+'''
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cgen    import NativeError, compiler
+from context import Context
+
+PROGRAMS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'programs')
+
+INPUTS = { 'fib': '12', 'matrix': '6', 'nested': '3', 'scan': '200', 'sort': '60' }
+
+try:
+  compiler()
+except NativeError:
+  pytest.skip('no C compiler', allow_module_level=True)
+
+
+def interpret(source, stdin):
+  context = Context()
+  context.parse(source)
+  stdout = io.StringIO()
+  context.run('ast', io.StringIO(stdin), stdout)
+  return stdout.getvalue()
+
+
+def native(source, stdin, opt_level, output):
+  context = Context()
+  context.parse(source)
+  assert context.native(str(output), opt_level=opt_level)
+  return subprocess.run([str(output)], input=stdin, capture_output=True, text=True)
+
+
+@pytest.mark.parametrize('name', sorted(INPUTS))
+@pytest.mark.parametrize('opt_level', [0, 2])
+def test_programs_match_ast(name, opt_level, tmp_path):
+  with open(os.path.join(PROGRAMS, name + '.pl0'), encoding='utf-8') as f:
+    source = f.read()
+  proc = native(source, INPUTS[name], opt_level, tmp_path / name)
+  assert proc.returncode == 0
+  assert proc.stdout == interpret(source, INPUTS[name])
+
+
+def test_runtime_error(tmp_path):
+  source = 'fun main()\n  v: int[2];\n  i: int;\nbegin\n  read(i);\n  write(1); v[i] := 1\nend\n'
+  proc = native(source, '2', 1, tmp_path / 'error')
+  assert proc.returncode == 1
+  assert proc.stdout == '1'
+  assert 'vector index out of range' in proc.stderr
@@ -0,0 +1,108 @@
+# test_closures.py
+'''
+Programas compilados a closures (engine 'closure') contra el intérprete
+del AST: la misma salida y los mismos errores de ejecución.
+'''
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context import Context
+from vm      import VMError
+
+
+def run(source, engine, stdin=''):
+  context = Context()
+  context.parse(source)
+  assert not context.have_errors
+  stdout = io.StringIO()
+  try:
+    context.run(engine, io.StringIO(stdin), stdout)
+  except VMError as e:
+    return stdout.getvalue(), str(e)
+  return stdout.getvalue(), None
+
+
+PROGRAMS = [
+  # enlaces estáticos de varios niveles y recursión de funciones anidadas
+  ('''fun main()
+  n: int;
+  acc: int;
+  fun outer(a: int)
+    b: int;
+    fun middle(c: int)
+      fun inner(d: int)
+      begin
+        acc := acc + a * 100 + b * 10 + c + d;
+        if d > 0 then inner(d - 1)
+      end;
+    begin
+      inner(c);
+      if c > 0 then middle(c - 1)
+    end;
+  begin
+    b := a + 1;
+    middle(a)
+  end;
+begin
+  read(n);
+  acc := 0;
+  outer(n);
+  write(acc)
+end
+''', '4', None),
+  # cada forma de operador: local y constante, dos locales, expresión
+  # y constante; llamadas con 0, 1, 2 y 3 argumentos
+  ('''fun zero()
+begin
+  return 7
+end
+fun one(x: float)
+begin
+  return x * 2.0 - 1.0
+end
+fun two(x: int, y: int)
+begin
+  return x / y + x - y * 3
+end
+fun three(x: int, y: float, z: int)
+begin
+  return float(x + z) / y
+end
+fun main()
+  i: int;
+  j: int;
+  f: float;
+  v: float[4];
+begin
+  read(i); read(j);
+  f := float(i) + 0.25;
+  v[0] := one(f);
+  v[1] := three(i, f, j);
+  v[2] := float(two(i, j) * zero() - (i + j) * 2 + -(i - 3));
+  v[3] := float(int(f * float(j))) / 2.0;
+  write(v[0] + v[1] - v[2] * v[3]); print(" ");
+  write(-7 / 2 + 10 / 3 * (0 - 9) / 4); print(" ");
+  write(int(-2.5) + int(3.75) * 2)
+end
+''', '9 -4', None),
+  # constantes que no se pueden plegar porque fallan al ejecutar
+  ('fun main()\nbegin\n  write(1);\n  write(int(' + '9' * 310 + '.0 * 2.0))\nend\n', '', 'float to int overflow'),
+  ('fun main()\nbegin\n  write(int(float(' + '9' * 310 + ')))\nend\n', '', 'int to float overflow'),
+  ('fun main()\nbegin\n  write(2);\n  write(7 / 0)\nend\n', '', 'Division by zero'),
+  ('fun main()\n  v: int[2];\n  i: int;\nbegin\n  read(i);\n  v[i] := 1\nend\n', '2', 'Vector index out of range'),
+  ('fun main()\n  x: int;\n  v: int[2];\nbegin\n  read(x);\n  v[1] := x\nend\n', '9223372036854775808',
+   'Vector element overflow'),
+  ('fun main()\n  x: float;\nbegin\n  read(x)\nend\n', '', 'read: end of input'),
+]
+
+
+@pytest.mark.parametrize('source, stdin, error', PROGRAMS)
+def test_closures_match_ast(source, stdin, error):
+  expected = run(source, 'ast', stdin)
+  assert expected[1] == error
+  assert run(source, 'closure', stdin) == expected
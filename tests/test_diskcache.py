@@ -0,0 +1,94 @@
+# test_diskcache.py
+'''
+Caché de compilación en disco: un programa recuperado del caché se
+ejecuta igual que el compilado desde el fuente (contra el intérprete
+del AST), y las entradas dañadas se descartan.
+'''
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context   import Context
+from diskcache import DiskCache
+
+
+SOURCE = '''fun main()
+  v: float[8];
+  i: int;
+  s: float;
+  fun norm(x: float)
+  begin
+    if x < 0.0 then return -x;
+    return x
+  end;
+begin
+  i := 0;
+  while i < 8 do
+  begin
+    read(v[i]);
+    i := i + 1
+  end;
+  s := 0.0;
+  i := 0;
+  while i < 8 do
+  begin
+    s := s + norm(v[i]) * float(i + 1);
+    i := i + 1
+  end;
+  write(s); print(" "); write(int(s) / 3)
+end
+'''
+
+STDIN = '1.5 -2 3 -4.25 0 6 -7 8.5'
+
+
+def expected():
+  context = Context()
+  context.parse(SOURCE)
+  stdout = io.StringIO()
+  context.run('ast', io.StringIO(STDIN), stdout)
+  return stdout.getvalue()
+
+
+def run(context, engine, opt_level):
+  stdout = io.StringIO()
+  context.run(engine, io.StringIO(STDIN), stdout, opt_level)
+  return stdout.getvalue()
+
+
+@pytest.mark.parametrize('opt_level', [None, 0, 2])
+def test_cached_program_matches_ast(tmp_path, opt_level):
+  cache = DiskCache(str(tmp_path))
+  flags = ('O', opt_level)
+  context = Context()
+  assert not context.parse_cached(SOURCE, cache, flags)
+  assert run(context, 'vm', opt_level) == expected()
+  assert context.save(cache)
+
+  context = Context()
+  assert context.parse_cached(SOURCE, cache, flags)
+  for engine in ('vm', 'closure', 'py', 'ast'):
+    assert run(context, engine, opt_level) == expected(), engine
+  assert not context.save(cache)
+  assert (cache.stats.hits, cache.stats.misses, cache.stats.writes) == (1, 1, 1)
+
+
+def test_damaged_entry(tmp_path):
+  cache = DiskCache(str(tmp_path))
+  context = Context()
+  context.parse_cached(SOURCE, cache)
+  context.run()
+  context.save(cache)
+  key = cache.key(SOURCE)
+  with open(cache.filename(key), 'r+b') as f:
+    f.truncate(10)
+  context = Context()
+  assert not context.parse_cached(SOURCE, cache)
+  assert run(context, 'vm', None) == expected()
+  assert cache.stats.errors == 1
+  assert not os.path.exists(cache.filename(key))
+  assert cache.key(SOURCE, ('O', 1)) != key
@@ -0,0 +1,47 @@
+# test_fastlex.py
+'''
+fastlex (completo y por trozos) contra LexerForPL0: los mismos tokens
+y los mismos errores.
+'''
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fastlex
+from lexer_pl0 import LexerForPL0
+from sourcemap import Diagnostics
+
+
+CASES = [
+  '007', '0', '10', '1e5', '12e+5', '2.0e3', '2.05e3', '10.25e10', '05e3',
+  '0.5', '5.', '.5', '00.5', '01.5', '1.e5', '0x1F', '1_000', 'x1e5',
+  '/* open', 'a /* b', '"abc', '""', 'x $y z', 'a$$ b', '!x != y',
+  'a:=b:c', 'fun funx int_ x', 'a \f b',
+  'fun main()\n  x: float;\nbegin\n  /* two\n lines */ x := 2.5 * 007;\n  print("a\\n")\nend\n',
+]
+
+
+def sly_tokens(source):
+  lexer = LexerForPL0()
+  lexer.diagnostics = Diagnostics()
+  tokens = [(t.type, t.value, t.lineno, t.index) for t in lexer.tokenize(source)]
+  return tokens, list(lexer.diagnostics)
+
+
+def fast_tokens(source, chunk_size=None):
+  diagnostics = Diagnostics()
+  if chunk_size is None:
+    tokens = fastlex.tokenize(source, diagnostics).tokens()
+  else:
+    chunks = (source[k:k + chunk_size] for k in range(0, len(source), chunk_size))
+    tokens = fastlex.stream_tokens(chunks, diagnostics)
+  return [(t.type, t.value, t.lineno, t.index) for t in tokens], list(diagnostics)
+
+
+def test_same_tokens_as_sly():
+  for source in CASES:
+    expected = sly_tokens(source)
+    assert fast_tokens(source) == expected, source
+    for chunk_size in (1, 4, 7):
+      assert fast_tokens(source, chunk_size) == expected, (source, chunk_size)
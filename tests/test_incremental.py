@@ -0,0 +1,51 @@
+# test_incremental.py
+'''
+Context.parse incremental contra la revisión completa de un Context
+nuevo.
+'''
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context import Context
+
+
+SOURCE = '''fun g(x: int)
+begin
+  return x
+end
+fun f(n: int)
+  t: int;
+begin
+  if n > 0 then
+    t := f(n-1);
+  write(g(n));
+  return 1.0
+end
+fun main()
+  a: float;
+begin
+  a := f(3); write(g(1))
+end
+'''
+
+
+def check(context, source):
+  try:
+    context.parse(source)
+    return ('ok', context.run())
+  except Exception as e:
+    return ('error', str(e))
+
+
+def test_signature_only_edit():
+  # Sólo cambia la firma de g: f (el mismo texto) se vuelve a revisar
+  edited = SOURCE.replace('return x\n', 'return float(x)\n')
+  context = Context()
+  assert check(context, SOURCE) == check(Context(), SOURCE)
+  assert check(context, edited) == check(Context(), edited)
+  assert context.incremental and context.units.parsed == 1
+  # Y sigue igual en los parse siguientes
+  assert check(context, edited) == check(Context(), edited)
+  assert check(context, SOURCE) == check(Context(), SOURCE)
@@ -0,0 +1,83 @@
+# test_ircode.py
+'''
+Programas compilados a través del código intermedio (VM con -O0, -O1 y
+-O2) contra el intérprete del AST.
+'''
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context import Context
+from ircode  import IRFunction
+
+
+def run(source, engine, opt_level=None):
+  context = Context()
+  context.parse(source)
+  assert not context.have_errors
+  stdout = io.StringIO()
+  context.run(engine, io.StringIO(''), stdout, opt_level)
+  return stdout.getvalue()
+
+
+def same_as_ast(source):
+  expected = run(source, 'ast')
+  for opt_level in (0, 1, 2):
+    assert run(source, 'vm', opt_level) == expected, opt_level
+  return expected
+
+
+def test_signed_zero_constants():
+  func = IRFunction('f', 0)
+  assert func.const(0.0) != func.const(-0.0)
+  assert func.const(0.0) == func.const(0.0)
+  assert func.const(0) != func.const(0.0)
+
+
+def test_signed_zero():
+  source = '''fun main()
+  x: float;
+  y: float;
+begin
+  x := 0.0;
+  y := -0.0 * 1.0;
+  write(-x); print(" ");
+  write(y * 0.0); print(" ");
+  write(y / 2.0); print(" ");
+  write(x + y)
+end
+'''
+  assert same_as_ast(source) == '-0 -0 -0 0'
+
+
+def test_loops_and_calls():
+  source = '''fun fact(n: int)
+begin
+  if n < 2 then return 1;
+  return n * fact(n - 1)
+end
+fun main()
+  v: float[10];
+  i: int;
+  s: float;
+begin
+  i := 0;
+  while i < 10 do
+  begin
+    v[i] := float(fact(i)) / 3.0;
+    i := i + 1
+  end;
+  s := 0.0;
+  i := 9;
+  while i >= 0 do
+  begin
+    if i == 4 then break;
+    s := s + v[i];
+    i := i - 1
+  end;
+  write(s); print(" "); write(i / 3); print(" "); write(-7 / 2)
+end
+'''
+  same_as_ast(source)
@@ -0,0 +1,91 @@
+# test_lifting.py
+'''
+Lambda lifting (lifting.py): qué funciones anidadas se sacan y que el
+programa resultante da la misma salida en todos los backends que el
+intérprete del AST sobre el programa original.
+'''
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context import Context
+
+
+# gcd (con su step) y ratio no usan variables externas: se sacan.
+# add usa sum de main y twice llama a add: se quedan.
+SOURCE = '''fun main()
+  n: int;
+  sum: int;
+  fun gcd(a: int, b: int)
+    fun step(x: int, y: int)
+    begin
+      return x - x / y * y
+    end;
+  begin
+    if b == 0 then return a;
+    return gcd(b, step(a, b))
+  end;
+  fun ratio(a: int, b: int)
+  begin
+    return float(a / gcd(a, b)) / float(b / gcd(a, b))
+  end;
+  fun add(k: int)
+  begin
+    sum := sum + k
+  end;
+  fun twice(k: int)
+  begin
+    add(k);
+    add(gcd(k, 12))
+  end;
+begin
+  read(n);
+  sum := 0;
+  while n > 0 do
+  begin
+    twice(n);
+    write(ratio(n * 6, 8)); print(" ");
+    n := n - 1
+  end;
+  write(sum)
+end
+'''
+
+INPUTS = ['0', '1', '9', '24']
+
+
+def expected(stdin):
+  context = Context()
+  context.parse(SOURCE)
+  stdout = io.StringIO()
+  context.run('ast', io.StringIO(stdin), stdout)
+  return stdout.getvalue()
+
+
+def lifted_context():
+  context = Context()
+  context.parse(SOURCE)
+  assert not context.have_errors
+  context.run(opt_level=1)
+  return context
+
+
+def test_lifted_functions():
+  context = lifted_context()
+  assert context.lifted == ['main.gcd', 'main.gcd.step', 'main.ratio']
+  assert [func.id for func in context.ast.functions] == ['main.gcd.step', 'main.gcd', 'main.ratio', 'main']
+  assert [frame.name for frame in context.frames if frame.depth > 0] == ['main.add', 'main.twice']
+
+
+@pytest.mark.parametrize('engine, opt_level', [
+  ('vm', 1), ('vm', 2), ('vm', None), ('closure', None), ('py', None), ('ast', None)])
+def test_lifted_program_matches_ast(engine, opt_level):
+  context = lifted_context()
+  for stdin in INPUTS:
+    stdout = io.StringIO()
+    context.run(engine, io.StringIO(stdin), stdout, opt_level)
+    assert stdout.getvalue() == expected(stdin), stdin
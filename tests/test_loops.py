@@ -0,0 +1,76 @@
+# test_loops.py
+'''
+licm y strength (loops.py) en -O2: los ciclos se transforman y la VM
+da la misma salida que el intérprete del AST.
+'''
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context import Context
+from loops   import find_loops
+
+
+SOURCE = '''fun main()
+  v: int[100];
+  w: float[100];
+  i: int;
+  j: int;
+  n: int;
+  k: int;
+  s: int;
+  f: float;
+begin
+  read(n);
+  read(k);
+  i := 0;
+  while i < n do
+  begin
+    v[i] := i * 8 + k * k;
+    w[i] := float(i) * 0.5;
+    i := i + 1
+  end;
+  s := 0;
+  f := 0.0;
+  i := 0;
+  while i < n do
+  begin
+    j := 0;
+    while j < i do
+    begin
+      if j / 2 * 2 == j then s := s + v[j] * 3 - n / k else s := s - 1;
+      j := j + 1
+    end;
+    f := f + w[i] / float(k);
+    if s > 100000 then break;
+    i := i + 1
+  end;
+  write(s); print(" "); write(f); print(" "); write(i)
+end
+'''
+
+
+def run(engine, stdin, opt_level=None):
+  context = Context()
+  context.parse(SOURCE)
+  stdout = io.StringIO()
+  context.run(engine, io.StringIO(stdin), stdout, opt_level)
+  return stdout.getvalue(), context
+
+
+def test_loops_found():
+  _, context = run('vm', '10 3', 0)
+  func = context.ircode(0).functions[0]
+  assert len(find_loops(func)) == 3
+
+
+def test_licm_and_strength_match_ast():
+  for stdin in ('10 3', '100 7', '0 1', '100 1'):
+    expected, _ = run('ast', stdin)
+    output, context = run('vm', stdin, 2)
+    assert output == expected, stdin
+  report = context.opt_report
+  assert report.changed['licm'] > 0
+  assert report.changed['strength'] > 0
@@ -0,0 +1,97 @@
+# test_optimizer.py
+'''
+Programas ejecutados en la VM con -O1 y -O2 contra -O0: la misma salida
+y los mismos errores.
+'''
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context import Context
+from vm      import VMError
+
+
+def run(source, opt_level, stdin=''):
+  context = Context()
+  context.parse(source)
+  assert not context.have_errors
+  stdout = io.StringIO()
+  try:
+    context.execute(io.StringIO(stdin), stdout, opt_level)
+  except VMError as e:
+    return stdout.getvalue(), str(e)
+  return stdout.getvalue(), None
+
+
+def same_at_all_levels(source, stdin=''):
+  expected = run(source, 0, stdin)
+  for opt_level in (1, 2):
+    assert run(source, opt_level, stdin) == expected, opt_level
+  return expected
+
+
+def test_float_to_int_overflow():
+  # int() de un float infinito: error al ejecutar, no al plegar
+  big = ' * '.join(['10000000000.0'] * 32)
+  source = f'''fun main()
+  x: float;
+begin
+  x := {big};
+  if 1 < 2 then write(int(x))
+end
+'''
+  output, error = same_at_all_levels(source)
+  assert error is not None
+
+
+def test_float_identities_with_signed_zero():
+  # x viene de la entrada: no se puede plegar
+  exprs = ['x + 0.0', '0.0 + x', 'x - 0.0', 'x + -0.0', '-0.0 + x', 'x - -0.0',
+           'x * 1.0', '1.0 * x', 'x / 1.0', 'x * 0.0', '0.0 - x']
+  body = '; print(" "); '.join(f'write({expr})' for expr in exprs)
+  source = f'''fun main()
+  x: float;
+begin
+  read(x);
+  {body}
+end
+'''
+  for stdin in ('0.0', '-0.0', '2.5'):
+    output, error = same_at_all_levels(source, stdin)
+    assert error is None
+  assert run(source, 2, '-0.0')[0] == '0 0 -0 -0 -0 0 -0 -0 -0 -0 0'
+
+
+def test_loops_and_vectors():
+  source = '''fun sum(n: int)
+  v: int[100];
+  i: int;
+  s: int;
+begin
+  i := 0;
+  while i < n do
+  begin
+    v[i] := i * 4 + 1;
+    i := i + 1
+  end;
+  s := 0;
+  i := 0;
+  while i < n do
+  begin
+    s := s + v[i] * 2 - 0;
+    i := i + 1
+  end;
+  return s
+end
+fun main()
+  n: int;
+begin
+  read(n);
+  write(sum(n)); print(" "); write(sum(n) / 7 * 1 + 0)
+end
+'''
+  assert same_at_all_levels(source, '50') == ('9900 1414', None)
+  output, error = same_at_all_levels(source, '200')
+  assert error is not None
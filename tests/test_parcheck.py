@@ -0,0 +1,55 @@
+# test_parcheck.py
+'''
+check_parallel contra Checker.check: los mismos dtype en el AST, sin
+volver a la revisión en serie.
+'''
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parcheck
+from checker    import Checker
+from model_ast  import walk
+from parser_pl0 import gen_ast
+
+
+def gen_source(nfuncs):
+  # Funciones recursivas con return int y float y una función anidada
+  funcs = []
+  for k in range(nfuncs):
+    call = f'f{k - 1}(n)' if k else 'n'
+    ret = 'float(y)' if k % 3 == 0 else 'y * 2'
+    funcs.append(f'''fun f{k}(n: int)
+  y: int;
+  fun inner(m: int)
+  begin
+    if m < 1 then return 0;
+    return m + inner(m - 1)
+  end;
+begin
+  if n < 1 then return {ret};
+  y := int(f{k}(n - 1)) + inner(n);
+  y := y + int({call});
+  return {ret}
+end
+''')
+  funcs.append(f'fun main()\n  a: float;\nbegin\n  a := float(f{nfuncs - 1}(3));\n  write(a)\nend\n')
+  return '\n'.join(funcs)
+
+
+def dtypes(ast):
+  return [(type(node).__name__, getattr(node, 'dtype', None)) for node in walk(ast)]
+
+
+def test_parallel_matches_serial(monkeypatch):
+  source = gen_source(parcheck.MIN_FUNCTIONS + 4)
+  expected = gen_ast(source)
+  result = Checker.check(expected)
+
+  def serial(ast, initial):
+    raise AssertionError('check_parallel fell back to the serial check')
+  monkeypatch.setattr(parcheck, 'serial', serial)
+  ast = gen_ast(source)
+  assert parcheck.check_parallel(ast, 2) == result
+  assert dtypes(ast) == dtypes(expected)
@@ -0,0 +1,37 @@
+# test_parser_tables.py
+'''
+Tablas del parser en disco: se leen de vuelta si la firma coincide, y
+una escritura que falla no deja el archivo temporal.
+'''
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parser_pl0
+from parser_pl0 import ParserForPL0, read_tables, write_tables
+
+
+def test_round_trip(tmp_path):
+  lrtable = ParserForPL0.build_tables()
+  filename = str(tmp_path / 'tables' / 'parser.tab')
+  write_tables(filename, 'sig', lrtable)
+  tables = read_tables(filename, 'sig')
+  assert tables.lr_action == lrtable.lr_action
+  assert tables.lr_goto == lrtable.lr_goto
+  assert read_tables(filename, 'other') is None
+
+
+@pytest.mark.parametrize('module, name, error', [
+  (parser_pl0.os, 'replace', OSError),
+  (parser_pl0.marshal, 'dump', ValueError),
+])
+def test_failed_write_leaves_no_temporary(tmp_path, monkeypatch, module, name, error):
+  lrtable = ParserForPL0.build_tables()
+  def fail(*args):
+    raise error('fail')
+  monkeypatch.setattr(module, name, fail)
+  write_tables(str(tmp_path / 'parser.tab'), 'sig', lrtable)
+  assert os.listdir(tmp_path) == []
@@ -0,0 +1,123 @@
+# test_pycompile.py
+'''
+Programas compilados a código de CPython (engine 'py') contra el
+intérprete del AST: la misma salida y los mismos errores de ejecución.
+'''
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context import Context
+from vm      import VMError
+
+
+def run(source, engine, stdin=''):
+  context = Context()
+  context.parse(source)
+  assert not context.have_errors
+  stdout = io.StringIO()
+  try:
+    context.run(engine, io.StringIO(stdin), stdout)
+  except VMError as e:
+    return stdout.getvalue(), str(e)
+  return stdout.getvalue(), None
+
+
+PROGRAMS = [
+  # funciones anidadas que asignan variables de la que las contiene
+  ('''fun main()
+  n: int;
+  total: int;
+  scale: float;
+  fun add(k: int)
+    fun bump()
+    begin
+      total := total + k;
+      scale := scale * 1.5
+    end;
+  begin
+    bump();
+    if k > 0 then add(k - 1)
+  end;
+begin
+  read(n);
+  total := 0;
+  scale := 1.0;
+  add(n);
+  write(total); print(" "); write(scale)
+end
+''', '6', None),
+  # nombres que chocan con Python o con el runtime
+  ('''fun lambda(None: int, str: float)
+  _pl0_read: int;
+begin
+  _pl0_read := None * 3;
+  return int(str) + _pl0_read
+end
+fun main()
+  class: int[4];
+  def: int;
+begin
+  def := 0;
+  while def < 4 do
+  begin
+    class[def] := lambda(def, float(def) / 2.0);
+    def := def + 1
+  end;
+  write(class[3] - 7 / -2); print(" "); write(-7.0 / 2.0)
+end
+''', '', None),
+  # while anidados con break y and/or en cortocircuito
+  ('''fun main()
+  v: int[10];
+  i: int;
+  j: int;
+  s: int;
+begin
+  i := 0;
+  while i < 10 do
+  begin
+    v[i] := (i * 7) / 3;
+    i := i + 1
+  end;
+  s := 0;
+  i := 0;
+  while i < 10 do
+  begin
+    j := i;
+    while 1 == 1 do
+    begin
+      if j >= 10 or v[j] > 15 then break;
+      s := s + v[j];
+      j := j + 1
+    end;
+    if i > 2 and s > 100 then break;
+    i := i + 1
+  end;
+  write(s); print(" "); write(i)
+end
+''', '', None),
+  ('fun main()\n  x: int;\nbegin\n  x := 0;\n  write(1 / x)\nend\n', '', 'Division by zero'),
+  ('fun main()\n  v: int[2];\nbegin\n  write(v[0 - 1])\nend\n', '', 'Vector index out of range'),
+  ('fun main()\n  v: int[2];\nbegin\n  v[0] := 99999999999999999999\nend\n', '', 'Vector element overflow'),
+  ('fun main()\n  x: float;\nbegin\n  read(x);\n  write(int(x * x))\nend\n', '1e200', 'float to int overflow'),
+  ('fun main()\n  x: int;\nbegin\n  read(x)\nend\n', 'abc', 'read: invalid number'),
+]
+
+
+@pytest.mark.parametrize('source, stdin, error', PROGRAMS)
+def test_py_matches_ast(source, stdin, error):
+  expected = run(source, 'ast', stdin)
+  assert expected[1] == error
+  assert run(source, 'py', stdin) == expected
+
+
+def test_functions():
+  context = Context()
+  context.parse(PROGRAMS[1][0])
+  module = context.functions()
+  assert getattr(module, 'lambda')(5, 2.5) == 17
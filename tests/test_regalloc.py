@@ -0,0 +1,93 @@
+# test_regalloc.py
+'''
+Asignación de registros con más valores vivos que registros de la
+máquina: la VM (-O1/-O2) y el ejecutable dan la misma salida que el
+intérprete del AST, y dos intervalos que se solapan nunca comparten
+registro ni celda.
+'''
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cgen     import NativeError, compiler
+from context  import Context
+from regalloc import VM_MACHINE, X86_64, allocate
+
+
+N = 16
+
+SOURCE = '''fun twice(x: int)
+begin
+  return x * 2
+end
+fun main()
+  n: int;
+''' + ''.join(f'  a{k}: int;\n  f{k}: float;\n' for k in range(N)) + '''begin
+  read(n);
+''' + ''.join(f'  a{k} := n * {k + 1} - {k};\n  f{k} := float(n) / {k + 2}.0;\n' for k in range(N)) + '''  n := twice(n);
+  write(n''' + ''.join(f' + a{k} * {k % 3 + 1}' for k in range(N)) + '''); print(" ");
+  write(0.0''' + ''.join(f' + f{k}' for k in range(N)) + ''')
+end
+'''
+
+INPUTS = ['0', '7', '-123', '100000']
+
+
+def run(engine, stdin, opt_level=None):
+  context = Context()
+  context.parse(SOURCE)
+  assert not context.have_errors
+  stdout = io.StringIO()
+  context.run(engine, io.StringIO(stdin), stdout, opt_level)
+  return stdout.getvalue()
+
+
+@pytest.mark.parametrize('opt_level', [0, 1, 2])
+def test_vm_matches_ast(opt_level):
+  for stdin in INPUTS:
+    assert run('vm', stdin, opt_level) == run('ast', stdin), stdin
+
+
+def overlap(a, b):
+  return a.start <= b.end and b.start <= a.end
+
+
+@pytest.mark.parametrize('machine', [X86_64, VM_MACHINE])
+def test_no_shared_locations(machine):
+  context = Context()
+  context.parse(SOURCE)
+  spilled = 0
+  for func in context.ircode(1).functions:
+    alloc = allocate(func, machine)
+    intervals = list(alloc.intervals.values())
+    for k, a in enumerate(intervals):
+      assert (a.phys is None) != (a.slot is None)
+      if a.calls and a.phys is not None and not machine.unlimited:
+        assert machine.regs(a.cls)[a.phys] in machine.callee_saved
+      for b in intervals[k + 1:]:
+        if overlap(a, b) and (machine.unlimited or a.cls == b.cls):
+          assert a.phys is None or a.phys != b.phys
+          assert a.slot is None or a.slot != b.slot
+    spilled += alloc.stats.spilled
+  assert (spilled > 0) == (machine is X86_64)
+
+
+def test_native_matches_ast(tmp_path):
+  try:
+    compiler()
+  except NativeError:
+    pytest.skip('no C compiler')
+  context = Context()
+  context.parse(SOURCE)
+  output = str(tmp_path / 'pressure')
+  assert context.native(output, opt_level=1)
+  assert sum(s.spilled for s in context.regalloc.functions) > 0
+  for stdin in INPUTS:
+    proc = subprocess.run([output], input=stdin, capture_output=True, text=True)
+    assert proc.returncode == 0
+    assert proc.stdout == run('ast', stdin), stdin
@@ -0,0 +1,86 @@
+# test_resolver.py
+'''
+resolve(): direcciones (depth, slot) y marcos de cada función, y los
+backends que las usan (VM, closures, Python) contra el intérprete del
+AST, que sigue buscando por nombre.
+'''
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context   import Context
+from model_ast import Ident, walk
+from resolver  import resolve
+
+
+# x se declara en tres niveles; count usa la x de main y la n de walk
+SOURCE = '''fun sq(x: int)
+begin
+  return x * x
+end
+fun main()
+  x: int;
+  total: float;
+  fun walk(n: int)
+    x: float;
+    fun count(k: int)
+      x: int;
+    begin
+      x := k + n;
+      total := total + float(x);
+      if k > 0 then count(k - 1)
+    end;
+  begin
+    x := float(n) / 4.0;
+    count(n);
+    total := total + x
+  end;
+begin
+  read(x);
+  total := 0.0;
+  while x > 0 do
+  begin
+    walk(sq(x));
+    x := x - 1
+  end;
+  write(total)
+end
+'''
+
+
+def run(engine, stdin, opt_level=None):
+  context = Context()
+  context.parse(SOURCE)
+  assert not context.have_errors
+  stdout = io.StringIO()
+  context.run(engine, io.StringIO(stdin), stdout, opt_level)
+  return stdout.getvalue()
+
+
+def test_frames():
+  context = Context()
+  context.parse(SOURCE)
+  frames = resolve(context.ast)
+  assert [frame.format() for frame in frames] == [
+    'sq (depth 0) [0:x:int]',
+    'main (depth 0) [0:x:int 1:total*:float]',
+    'main.walk (depth 1) [0:n*:int 1:x:float]',
+    'main.walk.count (depth 2) [0:k:int 1:x:int]',
+  ]
+  main_frame, walk_frame, count_frame = frames[1:]
+  assert main_frame.nested == [2] and walk_frame.nested == [3]
+  assert count_frame.free == {(0, 1), (1, 0)}
+  assert count_frame.calls == {3} and walk_frame.calls == {3} and main_frame.calls == {0, 2}
+  # cada x apunta a la declaración más cercana
+  idents = [n for n in walk(context.ast) if isinstance(n, Ident) and n.id == 'x']
+  assert {(n.depth, n.slot) for n in idents} == {(0, 0), (1, 1), (2, 1)}
+
+
+@pytest.mark.parametrize('engine', ['vm', 'closure', 'py'])
+def test_backends_match_ast(engine):
+  for stdin in ('0', '1', '3', '5'):
+    assert run(engine, stdin) == run('ast', stdin), stdin
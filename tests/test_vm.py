@@ -0,0 +1,92 @@
+# test_vm.py
+'''
+La VM (bytecode directo desde el AST) contra el intérprete del AST: la
+misma salida y los mismos errores de ejecución, cada uno con su VMError.
+'''
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context import Context
+from vm      import VMError
+
+
+def run(source, engine, stdin=''):
+  context = Context()
+  context.parse(source)
+  assert not context.have_errors
+  stdout = io.StringIO()
+  try:
+    context.run(engine, io.StringIO(stdin), stdout)
+  except VMError as e:
+    return stdout.getvalue(), str(e)
+  return stdout.getvalue(), None
+
+
+PROGRAMS = [
+  ('''fun fib(n: int)
+begin
+  if n < 2 then return n;
+  return fib(n - 1) + fib(n - 2)
+end
+fun main()
+  i: int;
+begin
+  i := 0;
+  while i < 15 do
+  begin
+    write(fib(i)); print(" ");
+    i := i + 1
+  end
+end
+''', '', None),
+  ('''fun main()
+  v: float[5];
+  i: int;
+  s: float;
+  fun scale(k: float)
+  begin
+    s := s * k
+  end;
+begin
+  i := 0;
+  while i < 5 do
+  begin
+    read(v[i]);
+    i := i + 1
+  end;
+  s := 1.0;
+  i := 0;
+  while i < 5 do
+  begin
+    if v[i] > 0.0 and not v[i] == 2.0 then scale(v[i]) else skip;
+    i := i + 1
+  end;
+  write(s); print(" "); write(-7 / 2); print(" "); write(int(-7.9))
+end
+''', '1.5 2.0 -3 4 0.25', None),
+]
+
+ERRORS = [
+  ('fun main()\n  x: int;\nbegin\n  read(x)\nend\n', 'abc', 'read: invalid number'),
+  ('fun main()\n  x: float;\nbegin\n  read(x)\nend\n', '', 'read: end of input'),
+  ('fun main()\n  v: int[2];\nbegin\n  read(v[1])\nend\n', '99999999999999999999', 'Vector element overflow'),
+  ('fun main()\n  v: int[2];\nbegin\n  v[0] := 99999999999999999999\nend\n', '', 'Vector element overflow'),
+  ('fun main()\n  v: int[2];\nbegin\n  v[2] := 1\nend\n', '', 'Vector index out of range'),
+  ('fun main()\n  v: int[2];\nbegin\n  write(v[0 - 1])\nend\n', '', 'Vector index out of range'),
+  ('fun main()\n  x: int;\nbegin\n  x := 0;\n  write(1 / x)\nend\n', '', 'Division by zero'),
+  ('fun main()\n  x: float;\nbegin\n  read(x);\n  write(int(x * x))\nend\n', '1e200', 'float to int overflow'),
+  ('fun main()\n  x: float;\nbegin\n  read(x);\n  x := x * x;\n  write(int(x - x))\nend\n', '1e200', 'float to int of nan'),
+  ('fun main()\n  x: int;\nbegin\n  read(x);\n  write(float(x * x))\nend\n', '1' + '0' * 200, 'int to float overflow'),
+]
+
+
+@pytest.mark.parametrize('source, stdin, error', PROGRAMS + ERRORS)
+def test_vm_matches_ast(source, stdin, error):
+  expected = run(source, 'ast', stdin)
+  assert expected[1] == error
+  assert run(source, 'vm', stdin) == expected
@@ -0,0 +1,170 @@
+# timing.py
+'''
+Tiempo de cada fase del compilador
+==================================
+PassTimer mide con perf_counter_ns cada fase por la que pasa un Context
+(context.timer = PassTimer()): tablas del parser, lexer, parser,
+checker y las fases siguientes (resolve, lift, ircode, optimize,
+bytecode, cgen, ...). El tiempo de una fase es exclusivo: no incluye el
+de las fases anidadas en ella, así que los tiempos suman el total. En
+particular el lexer, que el parser consume token por token, se mide
+aparte (tokens) y se descuenta del parser.
+
+Además de los tiempos guarda cuentas (tokens, nodos del AST, símbolos
+declarados) y de ellas calcula el rendimiento (tokens/s, nodes/s). El
+informe es una tabla de texto o JSON; callback(pass_, ns), si se da, se
+llama al terminar cada fase.
+'''
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import json
+from time import perf_counter_ns
+
+from model_ast import *
+
+
+@dataclass(slots=True)
+class Pass:
+  name   : str
+  ns     : int = 0
+  calls  : int = 0
+  counts : dict = field(default_factory=dict)
+
+  def throughput(self):
+    # Unidades por segundo de cada cuenta
+    if not self.ns:
+      return {}
+    return { f'{key}/s': value * 1e9 / self.ns for key, value in self.counts.items() }
+
+
+def census(ast):
+  '''
+  (nodos, símbolos) del AST: los símbolos son las funciones, parámetros
+  y variables declarados.
+  '''
+  nodes = symbols = 0
+  for node in walk(ast):
+    nodes += 1
+    if isinstance(node, (Function, Var)):
+      symbols += 1
+  return nodes, symbols
+
+
+class ProbedLexer:
+  '''
+  Lexer cuyos tokens pasan por probe.tokens (un PassTimer o un
+  memstats.MemoryTracker), para Units.parse, que llama a tokenize una
+  vez por función.
+  '''
+  def __init__(self, lexer, probe):
+    self.lexer = lexer
+    self.probe = probe
+
+  @property
+  def diagnostics(self):
+    return self.lexer.diagnostics
+
+  def tokenize(self, *args, **kwargs):
+    return self.probe.tokens(self.lexer.tokenize(*args, **kwargs))
+
+
+class PassTimer:
+
+  def __init__(self, callback=None):
+    self.passes = {}        # nombre -> Pass, en el orden de la primera vez
+    self.stack = []         # por fase abierta: ns de sus fases anidadas
+    self.callback = callback
+
+  def get(self, name):
+    pass_ = self.passes.get(name)
+    if pass_ is None:
+      pass_ = self.passes[name] = Pass(name)
+    return pass_
+
+  @contextmanager
+  def phase(self, name):
+    self.stack.append(0)
+    t0 = perf_counter_ns()
+    try:
+      yield self.get(name)
+    finally:
+      elapsed = perf_counter_ns() - t0
+      self.add(name, elapsed - self.stack.pop())
+      if self.stack:
+        self.stack[-1] += elapsed
+
+  def add(self, name, ns, **counts):
+    # Fase medida afuera (ya sin sus fases anidadas)
+    pass_ = self.get(name)
+    pass_.ns += ns
+    pass_.calls += 1
+    self.count(name, **counts)
+    if self.callback is not None:
+      self.callback(pass_, ns)
+
+  def count(self, name, **counts):
+    pass_ = self.get(name)
+    for key, value in counts.items():
+      pass_.counts[key] = pass_.counts.get(key, 0) + value
+
+  def tokens(self, tokens, name='lex'):
+    '''
+    Los mismos tokens, midiendo el tiempo de producir cada uno (que se
+    descuenta de la fase que los consume) y contándolos.
+    '''
+    lex = self.get(name)
+    lex.calls += 1
+    stack = self.stack
+    clock = perf_counter_ns
+    it = iter(tokens)
+    ntokens = 0
+    try:
+      while True:
+        t0 = clock()
+        tok = next(it, None)
+        elapsed = clock() - t0
+        lex.ns += elapsed
+        if stack:
+          stack[-1] += elapsed
+        if tok is None:
+          return
+        ntokens += 1
+        yield tok
+    finally:
+      lex.counts['tokens'] = lex.counts.get('tokens', 0) + ntokens
+
+  def total(self):
+    return sum(pass_.ns for pass_ in self.passes.values())
+
+  def totals(self):
+    # Cuentas del programa (el máximo de cada una entre las fases)
+    found = {}
+    for pass_ in self.passes.values():
+      for key, value in pass_.counts.items():
+        found[key] = max(found.get(key, 0), value)
+    return found
+
+  def as_dict(self):
+    return {
+      'total_ns' : self.total(),
+      'counts'   : self.totals(),
+      'passes'   : [{ 'name': p.name, 'ns': p.ns, 'calls': p.calls, 'counts': p.counts,
+                      'throughput': p.throughput() } for p in self.passes.values()],
+    }
+
+  def format(self, style='text'):
+    '''
+    Informe como tabla de texto o como JSON (style='json').
+    '''
+    if style == 'json':
+      return json.dumps(self.as_dict(), indent=1)
+    total = self.total()
+    lines = [f'{"pass":<12} {"ms":>10} {"%":>6} {"calls":>6}  counts']
+    for p in self.passes.values():
+      share = 100 * p.ns / total if total else 0.0
+      rates = p.throughput()
+      counts = ', '.join(f'{value} {key} ({rates[key + "/s"]:,.0f}/s)' if key + '/s' in rates
+                         else f'{value} {key}' for key, value in p.counts.items())
+      lines.append(f'{p.name:<12} {p.ns / 1e6:10.3f} {share:6.1f} {p.calls:6}  {counts}'.rstrip())
+    lines.append(f'{"total":<12} {total / 1e6:10.3f}')
+    return '\n'.join(lines)
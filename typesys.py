@@ -2,19 +2,108 @@
 '''
 Tipos del sistema
 =================
-Este archivo implementa características básicas del sistema de tipos. Aquí hay mucha flexibilidad posible, pero la mejor estrategia podría ser no pensar demasiado en el problema. Al menos no al principio. Estos son los requisitos básicos mínimos:
+Los tipos son objetos internados: hay un solo objeto Type por tipo, así
+que dos tipos se comparan por identidad (int != float) y cada uno tiene
+un id entero pequeño y denso. Los tipos son:
+
+1. Los escalares int, float y bool (y string, el de las cadenas de print)
+2. Los vectores vector(T), por ejemplo int[]
+3. Las firmas de funciones function((T1, T2, ...), R)
+
+Las reglas de los operadores se escriben como tablas con los nombres de
+los tipos (_binary_ops, _unary_ops) y al importar el módulo se
+convierten en matrices densas operador x tipo (x tipo), indexadas por
+el id del operador y los id de los tipos. check_binary_op y
+check_unary_op son entonces un par de índices en una tupla, sin armar
+claves ni buscar en diccionarios.
+
+Las relaciones (<, ==, ...) dan bool; and/or sólo aceptan bool y not
+sólo bool. int y float no se mezclan: la conversión es explícita con
+int(...) y float(...).
+'''
 
-1. Los tipos tienen identidad (por ejemplo, como mínimo un nombre como 'int', 'float', etc.)
-2. Los tipos tienen que ser comparables. (por ejemplo, int != flotante).
-3. Los tipos admiten diferentes operadores (p. ej., +, -, *, /, etc.)
+class Type:
+  '''
+  Tipo internado. elem es el tipo de los elementos de un vector; params
+  y result los de una firma de función.
+  '''
+  __slots__ = ('id', 'name', 'elem', 'params', 'result')
 
-Una forma de lograr todos estos objetivos es comenzar con algún tipo de enfoque basado en tablas. No es lo más sofisticado, pero funcionará como punto de partida.
-Puedes regresar y refactorizar el sistema de tipos más tarde.
-'''
+  def __init__(self, id, name, elem=None, params=None, result=None):
+    self.id = id
+    self.name = name
+    self.elem = elem
+    self.params = params
+    self.result = result
+
+  def __repr__(self):
+    return f'Type({self.name})'
+
+  def __str__(self):
+    return self.name
+
+  def __reduce__(self):
+    # Al deserializar se vuelve al objeto internado
+    if self.elem is not None:
+      return (vector, (self.elem,))
+    if self.params is not None:
+      return (function, (self.params, self.result))
+    return (lookup_type, (self.name,))
+
+
+_types = []         # id -> Type
+_interned = {}      # clave -> Type
+
+
+def _intern(key, name, **parts):
+  dtype = _interned.get(key)
+  if dtype is None:
+    dtype = _interned[key] = Type(len(_types), name, **parts)
+    _types.append(dtype)
+  return dtype
+
+
+INT    = _intern('int', 'int')
+FLOAT  = _intern('float', 'float')
+BOOL   = _intern('bool', 'bool')
+STRING = _intern('string', 'string')
+
+# Los tipos con id menor que NSCALAR son los únicos que pueden ser
+# operandos; los vectores y las firmas se crean después
+NSCALAR = len(_types)
 
 # Set of valid typenames
 typenames = { 'int', 'float', 'bool' }
 
+
+def vector(elem):
+  return _intern(('vector', elem.id), elem.name + '[]', elem=elem)
+
+
+def function(params, result=None):
+  # result None: el tipo de retorno aún no se conoce
+  params = tuple(params)
+  name = '(' + ', '.join(p.name for p in params) + ')' + (f' -> {result.name}' if result else '')
+  return _intern(('function', tuple(p.id for p in params), result and result.id), name,
+                 params=params, result=result)
+
+
+def type_by_id(ident):
+  return _types[ident]
+
+
+def lookup_type(name):
+  # Tipo de un nombre: 'int', 'float', 'bool', 'string' o un vector
+  # como 'int[]'. None si no existe.
+  if name is None:
+    return None
+  if name.endswith('[]'):
+    elem = lookup_type(name[:-2])
+    return vector(elem) if elem is not None and elem.id < NSCALAR else None
+  dtype = _interned.get(name)
+  return dtype if dtype is not None and dtype.id < NSCALAR else None
+
+
 # Table of all supported binary operations and result types
 _binary_ops = {
   # Integer operations
@@ -66,22 +155,46 @@ _unary_ops = {
   ('not', 'bool') : 'bool',
 }
 
-def lookup_type(name):
-  # Given the name of a primitive type, this looks up the
-  # appropriate "type" object here.  For starting out, types are
-  # just names, but later on they could be more advanced objects.
-  if name in typenames:
-    return name
-  else:
-    return None
+# Operadores con su id (índice en las matrices)
+BINARY_OPS = ('+', '-', '*', '/', '<', '<=', '>', '>=', '==', '!=', 'and', 'or')
+UNARY_OPS  = ('+', '-', 'not')
+BINARY_IDS = { op: k for k, op in enumerate(BINARY_OPS) }
+UNARY_IDS  = { op: k for k, op in enumerate(UNARY_OPS) }
+
+
+def _binary_matrix():
+  # BINARY[(op * NSCALAR + left) * NSCALAR + right] -> Type o None
+  matrix = [None] * (len(BINARY_OPS) * NSCALAR * NSCALAR)
+  for (op, left, right), result in _binary_ops.items():
+    matrix[(BINARY_IDS[op] * NSCALAR + _interned[left].id) * NSCALAR + _interned[right].id] = _interned[result]
+  return tuple(matrix)
+
+
+def _unary_matrix():
+  # UNARY[op * NSCALAR + operand] -> Type o None
+  matrix = [None] * (len(UNARY_OPS) * NSCALAR)
+  for (op, expr), result in _unary_ops.items():
+    matrix[UNARY_IDS[op] * NSCALAR + _interned[expr].id] = _interned[result]
+  return tuple(matrix)
+
+
+BINARY = _binary_matrix()
+UNARY  = _unary_matrix()
+
 
 def check_binary_op(op, left, right):
   # Check if a binary operation is allowed or not.  Returns the
   # result type or None if not supported.
-  return _binary_ops.get((op, left, right))
+  k = BINARY_IDS.get(op)
+  if k is None or left is None or right is None or left.id >= NSCALAR or right.id >= NSCALAR:
+    return None
+  return BINARY[(k * NSCALAR + left.id) * NSCALAR + right.id]
+
 
 def check_unary_op(op, expr):
   # Check if a unary operation is allowed or not. Returns the result
   # type or None if not supported.
-  return _unary_ops.get((op, expr))
-
+  k = UNARY_IDS.get(op)
+  if k is None or expr is None or expr.id >= NSCALAR:
+    return None
+  return UNARY[k * NSCALAR + expr.id]
@@ -0,0 +1,901 @@
+# vm.py
+'''
+Máquina virtual de registros para PL0
+=====================================
+El AST ya revisado por Checker se compila (Compiler) a un bytecode
+compacto: cada función es un objeto Code cuyo código es un array de
+enteros con instrucciones de tres direcciones (opcode, a, b, c) sobre
+los registros del marco. VM ejecuta ese bytecode con un ciclo de
+despacho sobre los opcodes y una pila de marcos explícita (las llamadas
+no usan la recursión de Python).
+
+Funciones anidadas: la VM mantiene un display, display[d] es el marco
+de la función activa de profundidad d cuyas variables usan las
+funciones anidadas (Code.display). UPLOAD/UPSTORE acceden a esas
+variables con un solo índice, sin recorrer enlaces estáticos; sólo las
+funciones con variables capturadas actualizan el display al entrar y
+salir.
+
+Semántica:
+
+* Los enteros se dividen truncando hacia cero.
+* Los vectores son arrays tipados ('q' para int, 'd' para float) que se
+  pasan por referencia; los índices se comprueban al ejecutar.
+* and/or se evalúan en cortocircuito.
+* Una función sin return devuelve 0 (o 0.0).
+* write escribe el valor sin salto de línea (los float con %.15g), print
+  escribe la cadena tal cual y read lee el siguiente valor de la entrada.
+'''
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+import sys
+
+from model_ast import *
+from ircode    import Op, has_call
+from regalloc  import AllocReport, VM_MACHINE, allocate
+
+
+# Opcodes. Cada instrucción ocupa cuatro posiciones del código: opcode y
+# tres operandos (a, b, c). OPERANDS indica qué es cada operando:
+# r registro, l posición en el código, f índice de función, k índice en
+# strings, i valor inmediato y - sin uso.
+OPERANDS = {
+  'MOV':    'rr-',    # a := b
+  'ADD':    'rrr',    # a := b + c
+  'SUB':    'rrr',
+  'MUL':    'rrr',
+  'DIVI':   'rrr',
+  'DIVF':   'rrr',
+  'NEG':    'rr-',    # a := -b
+  'ITOF':   'rr-',
+  'FTOI':   'rr-',
+  'LOADV':  'rrr',    # a := b[c]
+  'STOREV': 'rrr',    # a[b] := c
+  'JLT':    'rrl',    # si a < b saltar a c
+  'JLE':    'rrl',
+  'JGT':    'rrl',
+  'JGE':    'rrl',
+  'JEQ':    'rrl',
+  'JNE':    'rrl',
+  'JUMP':   'l--',
+  'CALL':   'rfr',    # a := f(b)(c, c+1, ...)
+  'RET':    'r--',
+  'NEWVEC': 'rri',    # a := vector de b elementos (float si c)
+  'READ':   'ri-',    # a := siguiente valor de la entrada (float si b)
+  'WRITE':  'ri-',
+  'PRINT':  'k--',
+  'UPLOAD':  'rii',   # a := display[b][c]
+  'UPSTORE': 'iir',   # display[a][b] := c
+}
+OPNAMES = tuple(OPERANDS)
+(MOV, ADD, SUB, MUL, DIVI, DIVF, NEG, ITOF, FTOI, LOADV, STOREV,
+ JLT, JLE, JGT, JGE, JEQ, JNE, JUMP, CALL, RET, NEWVEC, READ,
+ WRITE, PRINT, UPLOAD, UPSTORE) = range(len(OPNAMES))
+
+ARITH   = { '+': ADD, '-': SUB, '*': MUL }
+BRANCH  = { '<': JLT, '<=': JLE, '>': JGT, '>=': JGE, '==': JEQ, '!=': JNE }
+NEGATE  = { '<': '>=', '<=': '>', '>': '<=', '>=': '<', '==': '!=', '!=': '==' }
+
+# Mientras se compila una función, los temporales y las constantes se
+# numeran aparte y al terminar se reubican después de las variables
+TEMP_BASE  = 1 << 20
+CONST_BASE = 1 << 21
+
+MAX_DEPTH = 100_000
+
+
+class CompileError(Exception):
+  '''
+  El programa usa algo que el compilador de bytecode no soporta.
+  '''
+  pass
+
+
+class VMError(Exception):
+  '''
+  Error al ejecutar el programa (índice fuera de rango, división por
+  cero, fin de la entrada en read...).
+  '''
+  pass
+
+
+class Code:
+  '''
+  Bytecode de una función. Los registros del marco son, en orden: los
+  parámetros, las variables locales, los temporales y las constantes;
+  init tiene el valor inicial de cada registro a partir de los
+  parámetros. depth es la profundidad de anidamiento y display indica
+  si el marco se publica en el display (lo usan funciones anidadas).
+  '''
+  def __init__(self, name, nparams, rtype='int', depth=0):
+    self.name    = name
+    self.nparams = nparams
+    self.rtype   = rtype
+    self.depth   = depth
+    self.display = False
+    self.code    = array('i')
+    self.init    = []
+    self.strings = []
+    self.nvars   = 0
+    self.consts  = 0
+
+  @property
+  def nregs(self):
+    return len(self.init)
+
+  def instructions(self):
+    # Código decodificado en tuplas (op, a, b, c) para el ciclo de la VM
+    code = self.code
+    return [tuple(code[pc:pc + 4]) for pc in range(0, len(code), 4)]
+
+
+class Bytecode:
+  '''
+  Programa compilado: una lista de Code y el índice de main.
+  '''
+  def __init__(self, functions, main):
+    self.functions = functions
+    self.main = main
+    self.regalloc = None        # AllocReport si viene de Lowering
+
+  def function(self, name):
+    for code in self.functions:
+      if code.name == name:
+        return code
+    return None
+
+
+@dataclass(slots=True)
+class Symbol:
+  kind   : str          # 'var' o 'func'
+  index  : int          # registro o índice de la función
+  type   : str
+  vector : bool = False
+  owner  : Code = None  # función donde se declaró
+
+
+class Scope:
+
+  def __init__(self, owner=None, parent=None):
+    self.owner = owner
+    self.parent = parent
+    self.names = {}
+
+  def get(self, name):
+    scope = self
+    while scope is not None:
+      sym = scope.names.get(name)
+      if sym is not None:
+        return sym
+      scope = scope.parent
+    return None
+
+
+# ---------------------------------------------------------------------
+#  Compilador AST -> bytecode
+# ---------------------------------------------------------------------
+
+class Compiler(Visitor):
+
+  def __init__(self):
+    self.functions = []
+    self.code = None
+    self.loops = []
+
+  @classmethod
+  def compile(cls, ast):
+    vis = cls()
+    main = ast.accept(vis, Scope())
+    return Bytecode(vis.functions, main)
+
+  # Emisión de código
+
+  def emit(self, op, a=0, b=0, c=0):
+    code = self.code.code
+    code.extend((op, a, b, c))
+    return len(code) - 4
+
+  def here(self):
+    # Número de la siguiente instrucción
+    return len(self.code.code) // 4
+
+  def patch(self, positions, target=None):
+    # positions son instrucciones de salto; el destino es el último
+    # operando con tipo 'l'
+    code = self.code.code
+    if target is None:
+      target = self.here()
+    for pos in positions:
+      code[pos + OPERANDS[OPNAMES[code[pos]]].index('l') + 1] = target
+
+  def temp(self):
+    self.ntemps += 1
+    self.maxtemps = max(self.maxtemps, self.ntemps)
+    return TEMP_BASE + self.ntemps - 1
+
+  def const(self, value):
+    key = (type(value), value)
+    reg = self.consts.get(key)
+    if reg is None:
+      reg = self.consts[key] = CONST_BASE + len(self.consts)
+    return reg
+
+  def relocate(self):
+    # Ubica temporales y constantes después de las variables
+    fn = self.code
+    code, nvars = fn.code, fn.nvars
+    for pc in range(0, len(code), 4):
+      kinds = OPERANDS[OPNAMES[code[pc]]]
+      for k, kind in enumerate(kinds, start=pc + 1):
+        if kind == 'r' and code[k] >= CONST_BASE:
+          code[k] += nvars + self.maxtemps - CONST_BASE
+        elif kind == 'r' and code[k] >= TEMP_BASE:
+          code[k] += nvars - TEMP_BASE
+    fn.init.extend(0 for _ in range(self.maxtemps))
+    fn.init.extend(value for (_, value) in self.consts)
+    fn.consts = len(self.consts)
+
+  def variable(self, name, scope):
+    sym = scope.get(name)
+    if sym is None or sym.kind != 'var':
+      raise CompileError(f'Variable {name} not found')
+    if sym.owner is not self.code:
+      sym.owner.display = True
+    return sym
+
+  def load(self, sym, dst=None):
+    # Registro con el valor de sym (de una función externa, por el display)
+    if sym.owner is self.code:
+      return sym.index
+    reg = self.target(dst)
+    self.emit(UPLOAD, reg, sym.owner.depth, sym.index)
+    return reg
+
+  def store(self, sym, reg):
+    if sym.owner is self.code:
+      if reg != sym.index:
+        self.emit(MOV, sym.index, reg)
+    else:
+      self.emit(UPSTORE, sym.owner.depth, sym.index, reg)
+
+  def declare_function(self, n, scope):
+    index = len(self.functions)
+    self.functions.append(None)
+    scope.names[n.id] = Symbol('func', index, n.dtype.type or 'int')
+    return index
+
+  # Declaraciones
+
+  def visit(self, n: Program, scope: Scope):
+    for func in n.functions:
+      self.declare_function(func, scope)
+    for func in n.functions:
+      func.accept(self, scope)
+    main = scope.get('main')
+    if main is None or main.kind != 'func':
+      raise CompileError('Main function not found')
+    return main.index
+
+  def visit(self, n: Function, scope: Scope):
+    sym = scope.names[n.id]
+    saved = (self.code, getattr(self, 'consts', None),
+             getattr(self, 'ntemps', 0), getattr(self, 'maxtemps', 0))
+    depth = saved[0].depth + 1 if saved[0] is not None else 0
+    self.code = Code(n.id, len(n.parameters), sym.type, depth)
+    self.consts, self.ntemps, self.maxtemps = {}, 0, 0
+    self.functions[sym.index] = self.code
+    env = Scope(self.code, scope)
+    for param in n.parameters:
+      self.local(param, env)
+    nested = []
+    for var in n.variables:
+      if isinstance(var, Function):
+        self.declare_function(var, env)
+        nested.append(var)
+      else:
+        self.local(var, env)
+    self.code.nvars = len(self.code.init)
+    for var in n.variables:
+      if isinstance(var, VectorVar):
+        self.ntemps = 0
+        vec = env.names[var.id]
+        size = self.expr(var.size, env, 'int')
+        self.emit(NEWVEC, vec.index, size, vec.type == 'float')
+    for stmt in n.statements:
+      self.ntemps = 0
+      stmt.accept(self, env)
+    self.emit(RET, self.const(0.0 if self.code.rtype == 'float' else 0))
+    self.relocate()
+    for func in nested:
+      func.accept(self, env)
+    self.code, self.consts, self.ntemps, self.maxtemps = saved
+
+  def local(self, var, env):
+    slot = len(self.code.init)
+    vector = isinstance(var, VectorVar)
+    dtype = var.type.type
+    if var.id in env.names:
+      raise CompileError(f'Symbol {var.id} already defined')
+    env.names[var.id] = Symbol('var', slot, dtype, vector, self.code)
+    self.code.init.append(None if vector else (0.0 if dtype == 'float' else 0))
+
+  # Sentencias
+
+  def visit(self, n: Assign, scope: Scope):
+    sym = self.variable(n.loct.id, scope)
+    if isinstance(n.loct, Vector):
+      index = self.expr(n.loct.index, scope, 'int')
+      value = self.expr(n.expr, scope, sym.type)
+      self.emit(STOREV, self.load(sym), index, value)
+    elif sym.owner is self.code:
+      self.expr(n.expr, scope, sym.type, sym.index)
+    else:
+      self.store(sym, self.expr(n.expr, scope, sym.type))
+
+  def visit(self, n: OneStmt, scope: Scope):
+    if n.key == 'print':
+      self.code.strings.append(n.value)
+      self.emit(PRINT, len(self.code.strings) - 1)
+    elif n.key == 'write':
+      reg, dtype = n.value.accept(self, scope, None)
+      self.emit(WRITE, reg, dtype == 'float')
+    elif n.key == 'read':
+      sym = self.variable(n.value.id, scope)
+      if isinstance(n.value, Vector):
+        index = self.expr(n.value.index, scope, 'int')
+        value = self.temp()
+        self.emit(READ, value, sym.type == 'float')
+        self.emit(STOREV, self.load(sym), index, value)
+      elif sym.owner is self.code:
+        self.emit(READ, sym.index, sym.type == 'float')
+      else:
+        value = self.temp()
+        self.emit(READ, value, sym.type == 'float')
+        self.store(sym, value)
+    elif n.key == 'return':
+      self.emit(RET, self.expr(n.value, scope, self.code.rtype))
+
+  def visit(self, n: DualStmt, scope: Scope):
+    if n.keyLeft == 'while':
+      # El ciclo evalúa la condición al final: un solo salto por vuelta
+      start = self.emit(JUMP)
+      top = self.here()
+      self.loops.append([])
+      n.right.accept(self, scope)
+      breaks = self.loops.pop()
+      self.patch([start])
+      self.ntemps = 0
+      self.patch(n.left.accept(self, scope, True), top)
+      self.patch(breaks)
+    else:
+      skip = n.left.accept(self, scope, False)
+      n.right.accept(self, scope)
+      self.patch(skip)
+
+  def visit(self, n: TripleStmt, scope: Scope):
+    orelse = n.left.accept(self, scope, False)
+    n.middle.accept(self, scope)
+    end = self.emit(JUMP)
+    self.patch(orelse)
+    n.right.accept(self, scope)
+    self.patch([end])
+
+  def visit(self, n: Grouping, scope: Scope):
+    for stmt in n.expr:
+      self.ntemps = 0
+      stmt.accept(self, scope)
+
+  def visit(self, n: Single, scope: Scope):
+    if n.key == 'break':
+      if not self.loops:
+        raise CompileError('break outside of a loop')
+      self.loops[-1].append(self.emit(JUMP))
+
+  # Condiciones: devuelven los saltos que se toman cuando la condición
+  # vale jump_if (para enlazarlos luego con patch)
+
+  def visit(self, n: Relation, scope: Scope, jump_if: bool):
+    if n.rel in ('and', 'or'):
+      if (n.rel == 'and') != jump_if:
+        return n.left.accept(self, scope, jump_if) + n.right.accept(self, scope, jump_if)
+      skip = n.left.accept(self, scope, not jump_if)
+      jumps = n.right.accept(self, scope, jump_if)
+      self.patch(skip)
+      return jumps
+    left, right, _ = self.operands(n.left, n.right, scope)
+    rel = n.rel if jump_if else NEGATE[n.rel]
+    return [self.emit(BRANCH[rel], left, right)]
+
+  def visit(self, n: Not, scope: Scope, jump_if: bool):
+    return n.rel.accept(self, scope, not jump_if)
+
+  # Expresiones: devuelven (registro, tipo). Si dst no es None, el
+  # resultado se deja en el registro dst.
+
+  def expr(self, n, scope, dtype, dst=None):
+    # Compila n y lo convierte a dtype si es necesario
+    reg, etype = n.accept(self, scope, dst)
+    if etype != dtype:
+      conv = dst if dst is not None else self.temp()
+      self.emit(ITOF if dtype == 'float' else FTOI, conv, reg)
+      return conv
+    if dst is not None and reg != dst:
+      self.emit(MOV, dst, reg)
+      return dst
+    return reg
+
+  def operands(self, left, right, scope):
+    lreg, ltype = left.accept(self, scope, None)
+    if lreg < TEMP_BASE and has_call(right):
+      # Una llamada puede cambiar la variable (desde una función anidada):
+      # se usa su valor de antes
+      copy = self.temp()
+      self.emit(MOV, copy, lreg)
+      lreg = copy
+    rreg, rtype = right.accept(self, scope, None)
+    if ltype == rtype:
+      return lreg, rreg, ltype
+    if ltype == 'int':
+      lreg = self.convert(lreg)
+    else:
+      rreg = self.convert(rreg)
+    return lreg, rreg, 'float'
+
+  def convert(self, reg):
+    conv = self.temp()
+    self.emit(ITOF, conv, reg)
+    return conv
+
+  def target(self, dst):
+    return dst if dst is not None else self.temp()
+
+  def visit(self, n: Integer, scope: Scope, dst):
+    return self.const(n.value), 'int'
+
+  def visit(self, n: Float, scope: Scope, dst):
+    return self.const(n.value), 'float'
+
+  def visit(self, n: Ident, scope: Scope, dst):
+    sym = self.variable(n.id, scope)
+    return self.load(sym, dst), sym.type
+
+  def visit(self, n: Vector, scope: Scope, dst):
+    sym = self.variable(n.id, scope)
+    vec = self.load(sym)
+    index = self.expr(n.index, scope, 'int')
+    reg = self.target(dst)
+    self.emit(LOADV, reg, vec, index)
+    return reg, sym.type
+
+  def visit(self, n: Binary, scope: Scope, dst):
+    left, right, dtype = self.operands(n.left, n.right, scope)
+    reg = self.target(dst)
+    if n.op == '/':
+      self.emit(DIVI if dtype == 'int' else DIVF, reg, left, right)
+    else:
+      self.emit(ARITH[n.op], reg, left, right)
+    return reg, dtype
+
+  def visit(self, n: TypeCast, scope: Scope, dst):
+    return self.expr(n.expr, scope, n.op, dst), n.op
+
+  def visit(self, n: Unary, scope: Scope, dst):
+    value, dtype = n.expr.accept(self, scope, None)
+    if n.op != '-':
+      return value, dtype
+    reg = self.target(dst)
+    self.emit(NEG, reg, value)
+    return reg, dtype
+
+  def visit(self, n: Call, scope: Scope, dst=None):
+    sym = scope.get(n.id)
+    if sym is None or sym.kind != 'func':
+      raise CompileError(f'Function {n.id} not found')
+    # Los argumentos van en temporales consecutivos
+    args = [self.temp() for _ in n.expr]
+    for arg, reg in zip(n.expr, args):
+      value, _ = arg.accept(self, scope, reg)
+      if value != reg:
+        self.emit(MOV, reg, value)
+    reg = self.target(dst)
+    self.emit(CALL, reg, sym.index, args[0] if args else 0)
+    return reg, sym.type
+
+
+# ---------------------------------------------------------------------
+#  Traducción del código intermedio (ircode) a bytecode
+# ---------------------------------------------------------------------
+
+IR_OPS = {
+  Op.MOV: MOV, Op.ADDI: ADD, Op.SUBI: SUB, Op.MULI: MUL, Op.DIVI: DIVI,
+  Op.ADDF: ADD, Op.SUBF: SUB, Op.MULF: MUL, Op.DIVF: DIVF,
+  Op.NEGI: NEG, Op.NEGF: NEG, Op.ITOF: ITOF, Op.FTOI: FTOI,
+  Op.LOADV: LOADV, Op.STOREV: STOREV, Op.NEWVEC: NEWVEC, Op.RET: RET,
+}
+IR_BRANCH = { Op.LT: '<', Op.LE: '<=', Op.GT: '>', Op.GE: '>=', Op.EQ: '==', Op.NE: '!=' }
+
+
+class Lowering:
+  '''
+  Traduce un IRProgram (posiblemente optimizado) a Bytecode. Los
+  registros del IR se asignan a los del marco por barrido lineal
+  (regalloc.py), así dos valores que no están vivos a la vez comparten
+  registro; después vienen los registros de argumentos de las llamadas
+  y las constantes. Una relación seguida del
+  BR que la usa se traduce a un único salto condicional, los JUMP al
+  bloque siguiente se omiten y los JUMP a un bloque corto que termina en
+  una condición (la de un while) se reemplazan por una copia del bloque.
+  Las variables capturadas por funciones anidadas tienen un registro
+  fijo del marco, al que UPLOAD/UPSTORE llegan por el display.
+  '''
+  # Tamaño máximo de un bloque de condición que se copia
+  MAX_COPY = 6
+
+  def __init__(self, program):
+    self.program = program
+    self.code = None
+    self.captured = {}          # función -> {registro del IR: del marco}
+
+  @classmethod
+  def lower(cls, program):
+    vis = cls(program)
+    vis.report = AllocReport(VM_MACHINE)
+    functions = [vis.function(func) for func in program.functions]
+    bytecode = Bytecode(functions, program.main)
+    bytecode.regalloc = vis.report
+    return bytecode
+
+  def function(self, func):
+    self.func = func
+    self.zero, self.one = func.const(0), func.const(1)
+    calls = [i.c for i in func.instructions() if i.op is Op.CALL]
+    self.uses = Counter(r for i in func.instructions() for r in i.uses())
+    self.labels = func.block_map()
+    self.patches = []
+    args = self.arguments(func)
+    alloc = allocate(func, VM_MACHINE, exclude=args)
+    self.report.add(alloc.stats)
+
+    # Marco: registros asignados, variables capturadas, argumentos y
+    # constantes. Los argumentos llegan a los registros 0..nparams-1: un
+    # parámetro capturado se queda en el suyo y los registros asignados
+    # saltan esas posiciones (así los demás parámetros también quedan en
+    # el suyo)
+    fixed = sorted(k for k in range(func.nparams) if k in func.captured)
+    position = [p for p in range(alloc.nphys + len(fixed)) if p not in fixed]
+    self.rename = { reg: position[iv.phys] for reg, iv in alloc.intervals.items() }
+    self.rename.update((k, k) for k in fixed)
+    frame = alloc.nphys + len(fixed)
+    init = [0] * frame
+    for reg in sorted(func.captured - set(fixed)):
+      self.rename[reg] = frame
+      init.append(0)
+      frame += 1
+    for reg in alloc.zeroed | func.captured:
+      dtype = func.regtypes[reg]
+      init[self.rename[reg]] = None if dtype.endswith('[]') else 0.0 if dtype == 'float' else 0
+    self.captured[func.index] = { reg: self.rename[reg] for reg in func.captured }
+    self.argbase = frame
+    self.constbase = self.argbase + max(calls, default=0)
+    self.rename.update((reg, self.argbase + k) for reg, k in args.items())
+
+    code = self.code = Code(func.qualname, func.nparams, func.rtype, func.depth)
+    code.display = bool(func.captured)
+    code.nvars = func.nvars
+    code.strings = self.program.strings
+    code.init = init
+    code.init.extend(0 for _ in range(self.constbase - self.argbase))
+    code.init.extend(func.consts)
+    code.consts = len(func.consts)
+
+    starts = {}
+    for pos, block in enumerate(func.blocks):
+      starts[block.label] = self.here()
+      following = func.blocks[pos + 1].label if pos + 1 < len(func.blocks) else None
+      self.block(block.instrs, following)
+
+    # Las etiquetas de los saltos emitidos son números de bloque del IR
+    for pos in self.patches:
+      k = pos + OPERANDS[OPNAMES[code.code[pos]]].index('l') + 1
+      code.code[k] = starts[code.code[k]]
+    return code
+
+  def reg(self, operand):
+    if operand < 0:
+      return self.constbase + ~operand
+    return self.rename[operand]
+
+  def outer(self, func, levels, reg):
+    # (profundidad, registro del marco) de reg de la función levels
+    # niveles afuera
+    owner = func
+    for _ in range(levels):
+      owner = owner.parent
+    return owner.depth, self.captured[owner.index][reg]
+
+  def arguments(self, func):
+    # Los temporales que sólo se usan como argumento y se calculan
+    # después de la llamada anterior se calculan directamente en el
+    # registro del argumento (así ARG no necesita un MOV): temporal ->
+    # número de argumento
+    rename = {}
+    for block in func.blocks:
+      defined = set()
+      for instr in block.instrs:
+        if instr.op is Op.ARG:
+          value = instr.b
+          if value >= func.nvars and value in defined and self.uses[value] == 1:
+            rename[value] = instr.a
+        elif instr.op is Op.CALL:
+          defined.clear()
+        dst = instr.defs()
+        if dst is not None:
+          defined.add(dst)
+    return rename
+
+  def fused(self, instrs, k):
+    # instrs[k] es una relación que sólo usa el BR siguiente
+    return (k + 1 < len(instrs) and instrs[k].op in IR_BRANCH and instrs[k + 1].op is Op.BR
+            and instrs[k + 1].a == instrs[k].a and self.uses[instrs[k].a] == 1)
+
+  def block(self, instrs, following):
+    reg = self.reg
+    k = 0
+    while k < len(instrs):
+      op, a, b, c = instrs[k].op, instrs[k].a, instrs[k].b, instrs[k].c
+      if op in IR_BRANCH and self.fused(instrs, k):
+        self.branch(IR_BRANCH[op], reg(b), reg(c), instrs[k + 1].b, instrs[k + 1].c, following)
+        k += 1
+      elif op in IR_OPS:
+        kinds = OPERANDS[OPNAMES[IR_OPS[op]]]
+        self.emit(IR_OPS[op], *(reg(v) if kind == 'r' else v for kind, v in zip(kinds, (a, b, c))))
+      elif op in IR_BRANCH:
+        # Relación usada como valor: a := 1 y, si no se cumple, a := 0
+        self.emit(MOV, reg(a), reg(self.one))
+        self.emit(BRANCH[IR_BRANCH[op]], reg(b), reg(c), self.here() + 2)
+        self.emit(MOV, reg(a), reg(self.zero))
+      elif op is Op.BR:
+        self.branch('!=', reg(a), reg(self.zero), b, c, following)
+      elif op is Op.JUMP:
+        target = self.labels[a].instrs
+        if a == following:
+          pass
+        elif len(target) <= self.MAX_COPY and self.fused(target, len(target) - 2):
+          # Salto a la condición de un ciclo: se evalúa aquí mismo
+          self.block(target, following)
+        else:
+          self.patches.append(self.emit(JUMP, a))
+      elif op is Op.ARG:
+        if reg(b) != self.argbase + a:
+          self.emit(MOV, self.argbase + a, reg(b))
+      elif op is Op.CALL:
+        self.emit(CALL, reg(a), b, self.argbase)
+      elif op is Op.READI or op is Op.READF:
+        self.emit(READ, reg(a), op is Op.READF)
+      elif op is Op.WRITEI or op is Op.WRITEF:
+        self.emit(WRITE, reg(a), op is Op.WRITEF)
+      elif op is Op.PRINT:
+        self.emit(PRINT, a)
+      elif op is Op.UPLOAD:
+        self.emit(UPLOAD, reg(a), *self.outer(self.func, b, c))
+      elif op is Op.UPSTORE:
+        self.emit(UPSTORE, *self.outer(self.func, a, b), reg(c))
+      else:
+        raise CompileError(f'{op.name}: not supported by the VM')
+      k += 1
+
+  def here(self):
+    return len(self.code.code) // 4
+
+  def emit(self, op, a=0, b=0, c=0):
+    self.code.code.extend((op, a, b, c))
+    return len(self.code.code) - 4
+
+  def branch(self, rel, left, right, true, false, following):
+    # Salta a true si se cumple rel y a false si no
+    if false == following:
+      self.patches.append(self.emit(BRANCH[rel], left, right, true))
+    elif true == following:
+      self.patches.append(self.emit(BRANCH[NEGATE[rel]], left, right, false))
+    else:
+      self.patches.append(self.emit(BRANCH[rel], left, right, true))
+      self.patches.append(self.emit(JUMP, false))
+
+
+# ---------------------------------------------------------------------
+#  Máquina virtual
+# ---------------------------------------------------------------------
+
+def read_tokens(stream):
+  for line in stream:
+    yield from line.split()
+
+
+# Operaciones que pueden fallar, compartidas por los motores (py,
+# closure, ast): cada una informa su propio VMError
+
+def read_value(tokens, is_float):
+  # Siguiente número de la entrada (tokens de read_tokens)
+  token = next(tokens, None)
+  if token is None:
+    raise VMError('read: end of input')
+  try:
+    return float(token) if is_float else int(token)
+  except ValueError:
+    raise VMError('read: invalid number') from None
+
+
+def float_to_int(x):
+  try:
+    return int(x)
+  except OverflowError:
+    raise VMError('float to int overflow') from None
+  except ValueError:
+    raise VMError('float to int of nan') from None
+
+
+def int_to_float(x):
+  try:
+    return float(x)
+  except OverflowError:
+    raise VMError('int to float overflow') from None
+
+
+class VM:
+
+  def __init__(self, program, stdin=None, stdout=None):
+    self.program = program
+    self.input = read_tokens(stdin if stdin is not None else sys.stdin)
+    self.stdout = stdout if stdout is not None else sys.stdout
+    self.decoded = [fn.instructions() for fn in program.functions]
+    self.depth = 1 + max((fn.depth for fn in program.functions), default=0)
+    self.steps = 0
+
+  def run(self, name='main', *args):
+    if name == 'main':
+      index = self.program.main
+    else:
+      index = self.program.functions.index(self.program.function(name))
+    return self.execute(index, list(args))
+
+  def execute(self, index, args):
+    functions = self.program.functions
+    decoded = self.decoded
+    fn = functions[index]
+    code = decoded[index]
+    R = args + fn.init[len(args):]
+    frames = []
+    display = [None] * self.depth
+    saved = []                  # display[depth] anterior de cada marco publicado
+    if fn.display:
+      display[fn.depth] = R
+    write = self.stdout.write
+    input = self.input
+    pc = 0
+    steps = 0
+
+    while True:
+      op, a, b, c = code[pc]
+      pc += 1
+      steps += 1
+
+      if op == ADD:
+        R[a] = R[b] + R[c]
+      elif op == JLT:
+        if R[a] < R[b]:
+          pc = c
+      elif op == LOADV:
+        i = R[c]
+        try:
+          if i < 0:
+            raise IndexError
+          R[a] = R[b][i]
+        except IndexError:
+          raise VMError('Vector index out of range') from None
+      elif op == MOV:
+        R[a] = R[b]
+      elif op == SUB:
+        R[a] = R[b] - R[c]
+      elif op == STOREV:
+        i = R[b]
+        try:
+          if i < 0:
+            raise IndexError
+          R[a][i] = R[c]
+        except IndexError:
+          raise VMError('Vector index out of range') from None
+        except OverflowError:
+          raise VMError('Vector element overflow') from None
+      elif op == JUMP:
+        pc = a
+      elif op == JGE:
+        if R[a] >= R[b]:
+          pc = c
+      elif op == JLE:
+        if R[a] <= R[b]:
+          pc = c
+      elif op == JGT:
+        if R[a] > R[b]:
+          pc = c
+      elif op == JEQ:
+        if R[a] == R[b]:
+          pc = c
+      elif op == JNE:
+        if R[a] != R[b]:
+          pc = c
+      elif op == MUL:
+        R[a] = R[b] * R[c]
+      elif op == CALL:
+        callee = functions[b]
+        n = callee.nparams
+        frames.append((fn, code, pc, R, a))
+        if len(frames) > MAX_DEPTH:
+          raise VMError('Call stack overflow')
+        R = R[c:c + n] + callee.init[n:]
+        fn, code, pc = callee, decoded[b], 0
+        if fn.display:
+          saved.append(display[fn.depth])
+          display[fn.depth] = R
+      elif op == RET:
+        value = R[a]
+        if fn.display:
+          display[fn.depth] = saved.pop() if saved else None
+        if not frames:
+          self.steps += steps
+          return value
+        fn, code, pc, R, a = frames.pop()
+        R[a] = value
+      elif op == DIVI:
+        x, y = R[b], R[c]
+        if not y:
+          raise VMError('Division by zero')
+        q = abs(x) // abs(y)
+        R[a] = q if (x < 0) == (y < 0) else -q
+      elif op == DIVF:
+        try:
+          R[a] = R[b] / R[c]
+        except ZeroDivisionError:
+          raise VMError('Division by zero') from None
+      elif op == NEG:
+        R[a] = -R[b]
+      elif op == ITOF:
+        R[a] = int_to_float(R[b])
+      elif op == FTOI:
+        R[a] = float_to_int(R[b])
+      elif op == NEWVEC:
+        size = R[b]
+        if size < 0:
+          raise VMError('Negative vector size')
+        R[a] = array('d' if c else 'q', bytes(8 * size))
+      elif op == WRITE:
+        write('%.15g' % R[a] if b else str(R[a]))
+      elif op == PRINT:
+        write(fn.strings[a])
+      elif op == READ:
+        R[a] = read_value(input, b)
+      elif op == UPLOAD:
+        R[a] = display[b][c]
+      elif op == UPSTORE:
+        display[a][b] = R[c]
+      else:
+        raise VMError(f'Bad opcode {op}')
+
+
+def disassemble(fn):
+  '''
+  Listado legible del bytecode de una función.
+  '''
+  lines = [f'{fn.name}/{fn.nparams}  vars={fn.nvars} regs={fn.nregs}']
+  for pc, (op, a, b, c) in enumerate(fn.instructions()):
+    name = OPNAMES[op]
+    args = []
+    for kind, value in zip(OPERANDS[name], (a, b, c)):
+      if kind == 'r':
+        args.append(f'r{value}' if value < fn.nregs - fn.consts else repr(fn.init[value]))
+      elif kind == 'k':
+        args.append(repr(fn.strings[value]))
+      elif kind != '-':
+        args.append(str(value))
+    lines.append(f'  {pc:5} {name:7} {", ".join(args)}')
+  return '\n'.join(lines)